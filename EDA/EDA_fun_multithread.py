@@ -1,7 +1,13 @@
 import numpy as np
+import os
 from scipy.stats import kendalltau
 from sklearn import linear_model
 import pandas as pd
+import sys
+
+# Panel functions of model features (src)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
+from custom_features import delta_open_interest as panel_delta_open_interest
 
 
 def delta_open_interest(input_dict):
@@ -23,51 +29,43 @@ def delta_open_interest(input_dict):
     # Bookkeeping variables
     output_msg = []
 
-    # Extract previous day's open interest & rename
-    former_df = options_df[options_df["date"] == date_1].copy()
-    former_df.rename(columns={"open interest": "open interest 1",
-                              "volume": "volume 1"}, inplace=True)
-
-    # Remove options that expire before the next data date
-    former_df = former_df[former_df["expiration date"] >= date_2]
+    # Outer join as some options were newly created and some disappear (all open contracts were exercised etc.)
+    # Open interest & volume of missing options are 0
+    joined_df = panel_delta_open_interest(options_df[options_df["date"].isin([date_1, date_2])],
+                                          lags=[1], how="outer",
+                                          contract_cols=["expiration date", "tag", "adj strike"],
+                                          latter_cols=["open interest", "volume"])
 
-    # Extract following day's open interest & rename
-    latter_df = options_df[options_df["date"] == date_2].copy()
-    latter_df.drop(columns=["year", "date"], inplace=True)
-    latter_df.rename(columns={"open interest": "open interest 2",
-                              "volume": "volume 2"}, inplace=True)
+    column_names = {"open interest": "open interest 1",
+                    "volume": "volume 1",
+                    "latter open interest": "open interest 2",
+                    "latter volume": "volume 2"}
 
-    # Outer join as some options were newly created and some disappear (all open contracts were exercised etc.)
-    joined_df = former_df.merge(right=latter_df,
-                                on=["expiration date", "tag", "adj strike"],
-                                how="outer")
+    joined_df.rename(columns=column_names, inplace=True)
 
     # See if there are entirely new / missing exp dates
-    na_df = joined_df[joined_df.isna().any(axis=1)]
+    na_df = joined_df[joined_df["_merge"] != "both"]
     na_exp_dates = np.unique(na_df["expiration date"])
 
     for exp_date in na_exp_dates:
         na_exp_date_df = na_df[na_df["expiration date"] == exp_date]
         if na_exp_date_df.shape[0] == joined_df[joined_df["expiration date"] == exp_date].shape[0]:
-            if all(na_exp_date_df["volume 2"].isna()) & any(na_exp_date_df["volume 1"] != 0):
+            if all(na_exp_date_df["_merge"] == "left_only") & any(na_exp_date_df["volume 1"] != 0):
                 output_msg.append(
                     f"WARNING: Exp date: {exp_date} options are missing from {date_2} (previously present on {date_1})")
             # elif any(na_exp_date_df["volume 2"] != 0):
             #     output_msg.append(
             #         f"Exp date: {exp_date} options are added on {date_2} (they were not present in {date_1})")
 
-    # Fill NANs (occur when new options appear or existing options disappear)
-    joined_df["date"].fillna(value=date_1, inplace=True)
+    # Fill NANs (occur when new options appear)
     joined_df["year"] = joined_df["year"].fillna(value=year).astype(int)
-
-    joined_df[["volume 1", "volume 2", "open interest 1", "open interest 2"]] = \
-        joined_df[["volume 1", "volume 2", "open interest 1", "open interest 2"]].fillna(value=0)
-
-    # Get change in open interest
-    joined_df["delta interest"] = joined_df["open interest 2"] - joined_df["open interest 1"]
+    joined_df["volume 1"] = joined_df["volume 1"].fillna(value=0)
 
     joined_df["abs delta"] = np.abs(joined_df["delta interest"])
 
+    joined_df = joined_df[[column_names.get(col, col) for col in options_df.columns] +
+                          ["open interest 2", "volume 2", "delta interest", "abs delta"]]
+
     # Sanity check
     assert joined_df[joined_df.isna().any(axis=1)].empty, "There are NANs present in joined DataFrame!"
 
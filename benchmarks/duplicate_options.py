@@ -0,0 +1,146 @@
+import numpy as np
+import os
+import pandas as pd
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from preprocess_functions import set_option_dtypes
+from preprocess_functions.preprocess_funs_multithread import format_options
+
+# Benchmark duplicate option resolution (`format_options`) on a synthetic duplicate-heavy day:
+#   - Raw day options of a single ticker, a share of the option keys have error duplicates (same key,
+#     different open interest / ask price) and true duplicates
+#   - Compare against the previous per-key loop: kept options must be identical
+
+
+def create_day_options(num_exp_dates, num_strikes, dup_ratio, seed=0):
+    """
+    Create raw options of one ticker on one day, with error & true duplicates.
+
+    :param num_exp_dates: number of expiration dates (int)
+    :param num_strikes: number of strikes per expiration date & option type (int)
+    :param dup_ratio: share of option keys that have duplicates (float)
+    :param seed: random seed (int)
+    :return: day_options_df: raw options (DataFrame)
+    """
+
+    rng = np.random.default_rng(seed)
+    underlying_price = 100.0
+
+    exp_dates = pd.bdate_range("2020-01-17", periods=num_exp_dates, freq="W-FRI")
+    strikes = underlying_price + 2.5 * (np.arange(num_strikes) - num_strikes // 2)
+
+    option_grid = pd.MultiIndex.from_product([exp_dates, strikes, ["call", "put"]])
+    [exp_grid, strike_grid, tag_grid] = [option_grid.get_level_values(n) for n in range(3)]
+
+    day_options_df = pd.DataFrame({"symbol": "XYZ",
+                                   "underlyingprice": underlying_price,
+                                   "optionkey": [f"XYZ{e:%y%m%d}{t[0].upper()}{k:08.2f}"
+                                                 for e, k, t in zip(exp_grid, strike_grid, tag_grid)],
+                                   "putcall": np.array(tag_grid),
+                                   "expirationdate": exp_grid.strftime("%m/%d/%Y"),
+                                   "datadate": "01/15/2020",
+                                   "strikeprice": np.array(strike_grid),
+                                   "lastprice": rng.uniform(0.1, 20, exp_grid.shape[0]).round(2),
+                                   "bidprice": rng.uniform(0.1, 20, exp_grid.shape[0]).round(2),
+                                   "bidsize": rng.integers(0, 50, exp_grid.shape[0]),
+                                   "askprice": rng.uniform(0.1, 20, exp_grid.shape[0]).round(2),
+                                   "asksize": rng.integers(0, 50, exp_grid.shape[0]),
+                                   "volume": rng.integers(-5, 60, exp_grid.shape[0]),
+                                   "openinterest": rng.integers(0, 500, exp_grid.shape[0])})
+
+    # Error duplicates (different open interest & ask price), some with tied ask prices
+    error_dup_df = day_options_df.sample(frac=dup_ratio, random_state=seed)
+    error_dup_df = error_dup_df.assign(openinterest=error_dup_df["openinterest"] + 3,
+                                       askprice=np.where(rng.random(error_dup_df.shape[0]) < 0.1,
+                                                         error_dup_df["askprice"],
+                                                         error_dup_df["askprice"] + rng.normal(0, 1,
+                                                                                               error_dup_df.shape[0])))
+
+    # True duplicates
+    true_dup_df = day_options_df.sample(frac=dup_ratio / 4, random_state=seed + 1)
+
+    day_options_df = pd.concat([day_options_df, error_dup_df, true_dup_df], ignore_index=True)
+
+    return day_options_df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def legacy_format_options(options_df, ticker, day, output_msg):
+    """
+    Per option key loop that `format_options` replaced (reference for kept options).
+    """
+    options_df["symbol"] = options_df["symbol"].str.upper()
+    options_df["datadate"] = pd.to_datetime(options_df["datadate"]).dt.date
+    options_df["expirationdate"] = pd.to_datetime(options_df["expirationdate"]).dt.date
+    options_df["putcall"] = options_df["putcall"].str.lower()
+    options_df["volume"] = np.abs(options_df["volume"])
+
+    options_df.drop_duplicates(subset=["optionkey", "openinterest"], keep="first",
+                               ignore_index=True, inplace=True)
+
+    dup_options_filter = options_df.duplicated(subset=["expirationdate", "putcall", "strikeprice"],
+                                               keep=False)
+
+    if dup_options_filter.any():
+        output_msg.append(f"Duplicate {ticker} option data found in {day}!")
+        nodup_options = options_df[~dup_options_filter]
+        dup_options = options_df[dup_options_filter]
+        kept_dup_list = []
+
+        for option_key in list(set(dup_options["optionkey"])):
+            temp_dup = dup_options[dup_options["optionkey"] == option_key].copy()
+            if (temp_dup["putcall"] == "call").all():
+                temp_dup["moneyness"] = temp_dup["underlyingprice"] - temp_dup["askprice"] - temp_dup["strikeprice"]
+            else:
+                temp_dup["moneyness"] = temp_dup["strikeprice"] - temp_dup["askprice"] - temp_dup["underlyingprice"]
+
+            kept_dup_list.append(
+                temp_dup[temp_dup["moneyness"] == temp_dup["moneyness"].min()].drop(columns="moneyness"))
+
+        options_df = pd.concat([nodup_options] + kept_dup_list)
+
+    options_df = options_df[options_df["datadate"] <= options_df["expirationdate"]]
+    options_df = options_df.drop(columns=["optionkey", "symbol", "underlyingprice"])
+    options_df = options_df.rename(columns={"datadate": "date", "expirationdate": "expiration date",
+                                            "putcall": "tag", "strikeprice": "strike price",
+                                            "askprice": "ask price", "asksize": "ask size",
+                                            "bidprice": "bid price", "bidsize": "bid size",
+                                            "lastprice": "last price", "openinterest": "open interest"})
+
+    return options_df.sort_values(by=["expiration date", "strike price", "tag"], ignore_index=True)
+
+
+if __name__ == "__main__":
+    # User defined parameters
+    num_repeats = 3
+
+    for [num_exp_dates, num_strikes, dup_ratio] in [[20, 50, 0.2], [40, 100, 0.5], [50, 100, 0.8]]:
+        day_options_df = create_day_options(num_exp_dates=num_exp_dates, num_strikes=num_strikes,
+                                            dup_ratio=dup_ratio)
+
+        timing_dict = dict()
+        output_dict = dict()
+
+        for name, my_function in [["grouped", format_options], ["legacy loop", legacy_format_options]]:
+            timing_list = []
+
+            for _ in range(num_repeats):
+                start_time = time.time()
+                output_dict[name] = my_function(options_df=day_options_df.copy(), ticker="XYZ", day="benchmark",
+                                                output_msg=[])
+                timing_list.append(time.time() - start_time)
+
+            timing_dict[name] = np.min(timing_list)
+
+        # Sanity check. Kept options must be identical (legacy loop output in compact option schema)
+        sort_cols = list(output_dict["grouped"].columns)
+        pd.testing.assert_frame_equal(
+            output_dict["grouped"].sort_values(by=sort_cols, ignore_index=True),
+            set_option_dtypes(output_dict["legacy loop"][sort_cols]).sort_values(by=sort_cols, ignore_index=True))
+
+        print(f"{day_options_df.shape[0]} options ({round(dup_ratio * 100)}% keys duplicated): "
+              f"grouped {round(timing_dict['grouped'], 4)} seconds, "
+              f"legacy loop {round(timing_dict['legacy loop'], 4)} seconds "
+              f"({round(timing_dict['legacy loop'] / timing_dict['grouped'], 1)}x)")
@@ -0,0 +1,41 @@
+from logger import initialize_logger
+import os
+from parallel import configure_executors
+from pathlib import Path
+from preprocess_functions import ingest_options
+import time
+
+# This script does:
+#   1. Convert raw (full market) daily option files into a columnar store (Parquet), sorted by symbol.
+#      Later P3 runs read only the row groups of the requested ticker instead of re-parsing every CSV.
+#   2. On subsequent runs, only new (or modified) raw files are converted.
+
+
+if __name__ == "__main__":
+    # Ensure working directory path is correct
+    while os.path.split(os.getcwd())[-1] != "Options-Project":
+        os.chdir(os.path.dirname(os.getcwd()))
+
+    # Parallelism of pool steps: "process", "thread" or "serial" (profiling) backend, workers (all cores if None)
+    parallel_settings = {"backend": "process", "num_workers": None}
+
+    option_data_path = "data/options_data/"
+    option_store_path = "data/options_store/"
+
+    # Create store directory if not present
+    Path(option_store_path).mkdir(parents=True, exist_ok=True)
+
+    configure_executors(**parallel_settings)
+
+    # Time script
+    start_time = time.time()
+
+    # Set up logger
+    logger = initialize_logger(logger_name="ingest", save_dir=option_store_path,
+                               file_name="process.log")
+
+    ingest_options(option_data_path=option_data_path,
+                   option_store_path=option_store_path,
+                   logger=logger)
+
+    logger.info(f"Ingested option store - {round(time.time() - start_time, 2)} seconds")
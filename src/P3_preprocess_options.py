@@ -1,18 +1,28 @@
 from logger import initialize_logger
+from market_data import PriceCalendar
 import os
 import pandas as pd
+from parallel import configure_executors
 from pathlib import Path
-from preprocess_functions import read_and_format, remove_split_error_options, adjust_options, \
-    attach_dividends, attach_eod_prices, save_by_year
+from preprocess_functions import ingest_options, read_and_format, remove_split_error_options, enrich_options, \
+    save_by_year, scan_day_files, load_manifest, plan_update, update_by_year, save_manifest
+from storage import TableStore
 import time
 
-# For a given ticker, this script does:
-#   1. Read & filter all data for relevant options, remove duplicates if present.
+# For a given list of tickers, this script does:
+#   0. Ingest new raw option files into the columnar option store (see P3-0_ingest_options.py)
+#   1. Read & filter all data for relevant options, remove duplicates if present. Each day file is read once
+#      for all tickers, options of each ticker are kept in one table sorted by data date.
+# Then for each ticker:
 #   2. Remove error options propagated by splits.
-#   3. Adjust features by cumulative split (e.g. strike price, open interest, etc.)
-#   4. Attach priced in dividends for data & expiration dates. Correct error expiration dates.
-#   5. Attach end of day price for data & expiration dates. Group options into complete & incomplete.
-#   6. Aggregate complete, incomplete, and error options by year and write to disk.
+#   3. Enrich options in whole-table joins:
+#       - Adjust features by cumulative split (e.g. strike price, open interest, etc.)
+#       - Attach priced in dividends for data & expiration dates. Correct error expiration dates.
+#       - Attach end of day price for data & expiration dates. Group options into complete & incomplete.
+#   4. Aggregate complete, incomplete, and error options by year and write to disk (Parquet by default, or CSV).
+#
+# Only new / modified day files are processed if a ticker's processed-files manifest exists (incremental update).
+# Affected year partitions are updated, saved incomplete options are completed as closing prices become available.
 
 
 if __name__ == "__main__":
@@ -21,77 +31,194 @@ if __name__ == "__main__":
         os.chdir(os.path.dirname(os.getcwd()))
 
     # User defined parameters
-    ticker = str(input("Ticker to aggregate option data: ")).upper()
-    print(f"Selected: {ticker}")
+    # Comma separated tickers, or path to a universe file (one ticker per line, `#` for comments)
+    tickers = str(input("Ticker(s) to aggregate option data (comma separated or universe file): ")).strip()
 
-    option_data_path = "data/options_data/"
-    stock_data_path = f"data/adj_close/{ticker}/{ticker}.csv"
-    dividends_data_path = f"data/dividends/{ticker}/{ticker}_ts.csv"
-    save_dir = f"data/adj_options/{ticker}/"
+    if os.path.isfile(tickers):
+        with open(tickers) as f:
+            tickers = [n.split("#")[0].strip().upper() for n in f]
+    else:
+        tickers = [n.strip().upper() for n in tickers.split(",")]
 
-    # Create save directory if not present
-    Path(save_dir).mkdir(parents=True, exist_ok=True)
+    tickers = list(dict.fromkeys([n for n in tickers if n]))
+    print(f"Selected: {tickers}")
 
-    # Time script
-    start_time = time.time()
+    # Reprocess full history, regardless of processed-files manifest
+    full_update = False
 
-    # Set up logger
-    logger = initialize_logger(logger_name="preprocess", save_dir=save_dir,
-                               file_name="process.log")
-
-    # Load end of day prices
-    try:
-        hist_closing_df = pd.read_csv(os.path.abspath(stock_data_path))
-        hist_closing_df["date"] = pd.to_datetime(hist_closing_df["date"]).dt.date
-    except FileNotFoundError:
-        raise SystemExit(f"Security history for {ticker} not found in path: {os.path.abspath(stock_data_path)}")
-
-    # Load dividend data
-    try:
-        dividends_df = pd.read_csv(os.path.abspath(dividends_data_path))
-        dividends_df["date"] = pd.to_datetime(dividends_df["date"]).dt.date
-    except FileNotFoundError:
-        raise SystemExit(f"Dividend data for {ticker} not found in path: {os.path.abspath(dividends_data_path)}")
-
-    # 1
-    options_dict_1 = read_and_format(ticker=ticker,
-                                     option_data_path=option_data_path,
-                                     logger=logger)
+    # Format of saved options: "parquet" or "csv"
+    file_format = "parquet"
 
-    # 2
-    options_dict_2 = remove_split_error_options(options_dict=options_dict_1,
-                                                hist_closing_df=hist_closing_df,
-                                                logger=logger)
+    # Parallelism of pool steps: "process", "thread" or "serial" (profiling) backend, workers (all cores if None)
+    parallel_settings = {"backend": "process", "num_workers": None}
 
-    # 3
-    adjust_options_dict = adjust_options(options_dict=options_dict_2,
-                                         hist_closing_df=hist_closing_df,
-                                         logger=logger)
-
-    options_dict_3 = adjust_options_dict["adj dict"]
-
-    errors_dict = adjust_options_dict["errors dict"]
+    option_data_path = "data/options_data/"
+    option_store_path = "data/options_store/"
+    adj_options_path = "data/adj_options/"
 
-    # 4
-    options_dict_4 = attach_dividends(options_dict=options_dict_3,
-                                      dividends_df=dividends_df,
-                                      logger=logger)
+    # Create save directory if not present
+    Path(adj_options_path).mkdir(parents=True, exist_ok=True)
 
-    # 5
-    options_dict_5 = attach_eod_prices(options_dict=options_dict_4,
-                                       hist_closing_df=hist_closing_df,
-                                       logger=logger)
+    configure_executors(**parallel_settings)
 
-    complete_options_dict = options_dict_5["complete dict"]
+    # Time script
+    start_time = time.time()
 
-    incomplete_options_dict = options_dict_5["incomplete dict"]
+    # Set up logger (shared steps)
+    logger = initialize_logger(logger_name="preprocess", save_dir=adj_options_path,
+                               file_name="process.log")
 
-    # 6
-    save_by_year(complete_dict=complete_options_dict,
-                 incomplete_dict=incomplete_options_dict,
-                 errors_dict=errors_dict,
-                 ticker=ticker,
-                 save_dir=save_dir,
-                 logger=logger)
+    # Load end of day prices & dividends of all tickers (fail before reading any options)
+    hist_closing_dict = dict()
+    dividends_dict = dict()
+
+    for ticker in tickers:
+        stock_data_path = f"data/adj_close/{ticker}/{ticker}.csv"
+        dividends_data_path = f"data/dividends/{ticker}/{ticker}_ts.csv"
+
+        try:
+            hist_closing_df = pd.read_csv(os.path.abspath(stock_data_path))
+            hist_closing_df["date"] = pd.to_datetime(hist_closing_df["date"])
+            hist_closing_dict[ticker] = hist_closing_df
+        except FileNotFoundError:
+            raise SystemExit(f"Security history for {ticker} not found in path: {os.path.abspath(stock_data_path)}")
+
+        try:
+            dividends_df = pd.read_csv(os.path.abspath(dividends_data_path))
+            dividends_df["date"] = pd.to_datetime(dividends_df["date"])
+            dividends_dict[ticker] = dividends_df
+        except FileNotFoundError:
+            raise SystemExit(f"Dividend data for {ticker} not found in path: {os.path.abspath(dividends_data_path)}")
+
+    # 0
+    ingest_options(option_data_path=option_data_path,
+                   option_store_path=option_store_path,
+                   logger=logger)
+
+    # Decide which day files each ticker needs (processed-files manifest)
+    day_files_df = scan_day_files(option_data_path)
+    ticker_logger_dict = dict()
+    manifest_dict = dict()
+    plan_dict = dict()
+
+    for ticker in tickers:
+        save_dir = f"data/adj_options/{ticker}/"
+
+        # Create save directory if not present
+        Path(save_dir).mkdir(parents=True, exist_ok=True)
+
+        # Set up ticker logger
+        ticker_logger_dict[ticker] = initialize_logger(logger_name=f"preprocess_{ticker}", save_dir=save_dir,
+                                                       file_name="process.log")
+
+        manifest_dict[ticker] = load_manifest(save_dir=save_dir)
+
+        if full_update:
+            manifest_dict[ticker] = {"manifest df": manifest_dict[ticker]["manifest df"].iloc[0:0],
+                                     "sections df": manifest_dict[ticker]["sections df"].iloc[0:0]}
+
+        plan_dict[ticker] = plan_update(manifest_df=manifest_dict[ticker]["manifest df"],
+                                        sections_df=manifest_dict[ticker]["sections df"],
+                                        day_files_df=day_files_df,
+                                        hist_closing_df=hist_closing_dict[ticker],
+                                        logger=ticker_logger_dict[ticker])
 
-    logger.info(f"Processed {ticker} options data - {round(time.time() - start_time, 2)} seconds")
+    # 1
+    read_dict = read_and_format(tickers=tickers,
+                                option_data_path=option_data_path,
+                                option_store_path=option_store_path,
+                                day_files=sorted(set().union(*[n["day files"] for n in plan_dict.values()])),
+                                logger=logger)
+
+    for ticker in tickers:
+        ticker_start_time = time.time()
+        save_dir = f"data/adj_options/{ticker}/"
+        ticker_logger = ticker_logger_dict[ticker]
+        manifest_df = manifest_dict[ticker]["manifest df"]
+        sections_df = manifest_dict[ticker]["sections df"]
+        is_full_update = plan_dict[ticker]["full update"]
+        store = TableStore(root=save_dir, file_format=file_format)
+        price_calendar = PriceCalendar(hist_closing_df=hist_closing_dict[ticker],
+                                       dividends_df=dividends_dict[ticker])
+
+        # Start over from an empty manifest
+        if is_full_update:
+            manifest_df = manifest_df.iloc[0:0]
+            sections_df = sections_df.iloc[0:0]
+
+        # Day files (and their dates) planned for this ticker
+        files_dict = {file: date for file, date in read_dict["files dict"][ticker].items()
+                      if file in set(plan_dict[ticker]["day files"])}
+        replace_dates = set(files_dict.values()) | \
+            set(manifest_df[manifest_df["file"].isin(files_dict.keys())]["date"])
+
+        options_df_1 = read_dict["options df"].pop(ticker)
+        options_df_1 = options_df_1[options_df_1["date"].isin(replace_dates)].reset_index(drop=True)
+
+        # Housekeeping
+        sections_dict = dict()
+        complete_options_df = options_df_1.iloc[0:0]
+        incomplete_options_df = options_df_1.iloc[0:0]
+        errors_df = options_df_1.iloc[0:0]
+
+        if (options_df_1.shape[0] == 0) & is_full_update:
+            ticker_logger.warning(f"No {ticker} options found! Skipping")
+            continue
+
+        if options_df_1.shape[0] > 0:
+            # 2
+            options_dict_2 = remove_split_error_options(options_df=options_df_1,
+                                                        hist_closing_df=hist_closing_dict[ticker],
+                                                        logger=ticker_logger)
+
+            sections_dict = options_dict_2["sections dict"]
+
+            # 3
+            options_dict_3 = enrich_options(options_df=options_dict_2["clean df"],
+                                            price_calendar=price_calendar,
+                                            logger=ticker_logger)
+
+            complete_options_df = options_dict_3["complete df"]
+
+            incomplete_options_df = options_dict_3["incomplete df"]
+
+            errors_df = options_dict_3["errors df"]
+
+        # 4. Years whose options are rewritten (all if full update)
+        updated_years = None
+
+        if is_full_update:
+            save_by_year(complete_df=complete_options_df,
+                         incomplete_df=incomplete_options_df,
+                         errors_df=errors_df,
+                         ticker=ticker,
+                         store=store,
+                         logger=ticker_logger)
+        else:
+            update_dict = update_by_year(complete_df=complete_options_df,
+                                         incomplete_df=incomplete_options_df,
+                                         errors_df=errors_df,
+                                         replace_dates=replace_dates,
+                                         manifest_df=manifest_df,
+                                         price_calendar=price_calendar,
+                                         hist_closing_df=hist_closing_dict[ticker],
+                                         ticker=ticker,
+                                         store=store,
+                                         logger=ticker_logger)
+
+            incomplete_options_df = update_dict["incomplete df"]
+            updated_years = update_dict["years"]
+
+        save_manifest(manifest_df=manifest_df,
+                      sections_df=sections_df,
+                      day_files_df=day_files_df,
+                      files_dict=files_dict,
+                      sections_dict=sections_dict,
+                      incomplete_df=incomplete_options_df,
+                      hist_closing_df=hist_closing_dict[ticker],
+                      save_dir=save_dir,
+                      years=updated_years)
+
+        ticker_logger.info(f"Processed {ticker} options data - {round(time.time() - ticker_start_time, 2)} seconds")
+
+    logger.info(f"Processed {len(tickers)} tickers options data - {round(time.time() - start_time, 2)} seconds")
@@ -1,12 +1,14 @@
 from custom_features import CalcCustomInputs
-from greeks import CalcDelta, CalcGamma, CalcVix
+from greeks import CalcDelta, CalcGamma, CalcImpliedVol, CalcTheta, CalcVix, date_work_units, combine_work_units
 from logger import initialize_logger
-import multiprocessing
-from multiprocessing.pool import Pool
+from market_data import PriceCalendar
 import numpy as np
 import os
 import pandas as pd
+from parallel import Executor, CompletionQueue, configure_executors
 from pathlib import Path
+from preprocess_functions import set_option_dtypes
+from storage import TableStore, SharedTables, SharedTask, TableHandle, attach_table
 import time
 
 # For a given ticker, this script does:
@@ -16,11 +18,25 @@ import time
 #           - Skew (when Delta == 0.5)
 #           - ITM spread (width of first ITM quartile)
 #           - OTM spread (width of first OTM quartile)
-#   2. Calculate Gammas based on Deltas (parameterization to be done)
+#   2. Calculate Gammas based on Deltas, in the same pass as Deltas
+#       - Parameterize each call / put Gamma peak & interpolate parameters at the same constant maturities
+#           - Peak point (moneyness ratio of max Gamma)
+#           - Peak height (max Gamma)
+#           - Peak width (full width at half maximum)
 #   3. Calculate VIX (modified version of https://cdn.cboe.com/resources/vix/vixwhite.pdf#page=4) for all
 #      [data date, expiration date] call / put option spreads
 #       - Interpolate each call / put VIX value based on expiration dates at 1, 2, 3, 6 and 12 months constant maturity
-#   4. Calculate custom features using linear regression
+#   4. Solve Black-Scholes implied volatility (IV) of all contracts, with analytic Delta, Gamma, Vega & Theta
+#       - Parameterize each call / put IV smile (quadratic in log moneyness, Vega weighted) & interpolate parameters
+#      at the same constant maturities
+#           - IV at the money
+#           - Skew (slope)
+#           - Curvature
+#   5. Estimate Thetas of all contracts from the change in ask price until the next data date (per business day)
+#       - Parameterize each call / put Theta spread & interpolate parameters at the same constant maturities
+#           - Theta at the money (linearly interpolated at moneyness ratio 0)
+#           - Theta at the money relative to close price
+#   6. Calculate custom features using linear regression
 #       - Years until expiry (YTE) vs. adjusted moneyness ratio (7 models using different weights etc.)
 
 
@@ -39,6 +55,16 @@ if __name__ == "__main__":
     delta_abs_higher_threshold = 0.75
     delta_abs_lower_threshold = 0.25
     delta_abs_reference = 0.5
+    # Gamma peak parameters (empty list to only calculate full Gamma)
+    gamma_parameters = ["gamma_peak_point", "gamma_peak_height", "gamma_peak_width"]
+    # Constant maturities (years) Delta, Gamma, VIX, IV & Theta parameters are interpolated at
+    intervals = [1 / 12, 1 / 6, 1 / 4, 1 / 2, 1]
+    # Greeks are calculated in work units of data dates (rather than years), a few per worker for load balancing
+    units_per_worker = 4
+    # Parallelism of pool steps: "process", "thread" or "serial" (profiling) backend, workers (all cores if None)
+    parallel_settings = {"backend": "process", "num_workers": None}
+    # Format of saved model parameters: "parquet" or "csv"
+    file_format = "parquet"
 
     adj_options_path = f"data/adj_options/{ticker}"
     interest_rate_path = f"data/treasury_yields"
@@ -53,156 +79,214 @@ if __name__ == "__main__":
     # Setup
     logger = initialize_logger(logger_name="Greeks", save_dir=save_dir,
                                file_name=f"{ticker}.log")
-    my_pool = Pool(multiprocessing.cpu_count())
-    output_list = []
+    configure_executors(**parallel_settings)
+    options_store = TableStore(root=adj_options_path)
+    params_store = TableStore(root=save_dir, file_format=file_format)
+    # Year options & Greeks are exchanged with pool workers through shared memory, not pickled
+    shared_tables = SharedTables()
+
+    # Workers are shut down (terminated if a task or save fails) & shared tables removed in any case
+    try:
+        with Executor() as executor:
+            #
+            # Read options and interest rates
+            #
+
+            start_time = time.time()
+            options_input_list = []
+
+            # Options
+            for year in next(os.walk(adj_options_path))[1]:
+                file_list = []
+                for table_name in options_store.names(year):
+                    if table_name.split("_")[-1] in ["complete", "incomplete"]:
+                        # Load
+                        file_df = options_store.read(table_name)
+
+                        # Convert columns to correct format (compact option schema)
+                        file_list.append(set_option_dtypes(file_df, adjusted=True))
+
+                year_df = pd.concat(file_list)
+
+                # All options for given year
+                year_df.sort_values(by=["date", "expiration date", "strike price", "tag"], inplace=True,
+                                    ignore_index=True)
+
+                # Required by all Greeks for constant maturity interpolation
+                year_df["years to exp"] = np.busday_count(
+                    year_df["date"].values.astype("datetime64[D]"),
+                    year_df["expiration date"].values.astype("datetime64[D]")) / num_days_year
+
+                options_input_list.append({"df": shared_tables.publish(year_df, name=f"options_{year}"),
+                                           "year": int(year)})
+
+            # End of day prices, dividends & interest rates
+            price_calendar = PriceCalendar.from_files(ticker=ticker, interest_rate_path=interest_rate_path)
+
+            # Split years into work units of consecutive data dates, of similar size (option rows)
+            option_units = date_work_units(options_input_list, num_units=executor.num_workers * units_per_worker)
+
+            logger.info(f"Read adj options & interest rates - {round(time.time() - start_time, 2)} seconds")
+
+            #
+            # Submit Greeks & custom features
+            #
+
+            # Delta (with Gamma), VIX, IV, Theta & custom features only depend on the options.
+            # Each [metric, year] is saved & released as soon as all its tasks completed.
+            start_time = time.time()
+            completion_queue = CompletionQueue(executor)
+            task_years = dict()
+
+            # Gamma, calculated in the same pass as Delta
+            gamma_initialize_dict = {"parameters": gamma_parameters,
+                                     "intervals": intervals}
+            calculate_gamma = CalcGamma(gamma_initialize_dict)
+
+            # Delta
+            delta_initialize_dict = {"abs_reference_threshold": delta_abs_reference,
+                                     "abs_lower_threshold": delta_abs_lower_threshold,
+                                     "abs_higher_threshold": delta_abs_higher_threshold,
+                                     "intervals": intervals,
+                                     "gamma": calculate_gamma}
+            calculate_delta = CalcDelta(delta_initialize_dict)
+
+            # VIX
+            vix_initialize_dict = {"price_calendar": price_calendar,
+                                   "intervals": intervals}
+            calculate_vix = CalcVix(vix_initialize_dict)
+
+            # Implied volatility
+            iv_initialize_dict = {"price_calendar": price_calendar,
+                                  "intervals": intervals,
+                                  "num_days_year": num_days_year}
+            calculate_iv = CalcImpliedVol(iv_initialize_dict)
+
+            for n, unit_dict in enumerate(option_units):
+                completion_queue.add(("Delta", n), SharedTask(calculate_delta.run, shared_tables.path), unit_dict)
+                completion_queue.add(("VIX", n), SharedTask(calculate_vix.run, shared_tables.path), unit_dict)
+                completion_queue.add(("IV", n), SharedTask(calculate_iv.run, shared_tables.path), unit_dict)
+
+                # Delta tasks also output Gamma
+                task_years.update({(metric, n): unit_dict["year"] for metric in ["Delta", "Gamma", "VIX", "IV"]})
+
+            # Theta & custom features
+            theta_initialize_dict = {"intervals": intervals}
+            calculate_theta = CalcTheta(theta_initialize_dict)
+            calculate_custom = CalcCustomInputs()
+
+            # Options of each year & following year (first date of following year is paired with last date of year)
+            options_dict = {n["year"]: n["df"] for n in options_input_list}
+            years = sorted(options_dict.keys())
+            next_year_dict = dict(zip(years[:-1], years[1:]))
+
+            # Work units in date order (output messages are logged in task order)
+            for n, unit_dict in enumerate(sorted(option_units, key=lambda x: (x["year"], x["dates"][0]))):
+                # Theta of each data date from the following data date, all contracts at once
+                completion_queue.add(("Theta", n), SharedTask(calculate_theta.run, shared_tables.path),
+                               {**unit_dict, "next df": options_dict.get(next_year_dict.get(unit_dict["year"]))})
+
+                # Calculate change in open interest & fit linear models of consecutive date pairs,
+                # (date_0, date_1), (date_1, date_2), ... pairs are generated in the worker
+                completion_queue.add(("custom", n), SharedTask(calculate_custom.run_pairs, shared_tables.path),
+                               {**unit_dict, "next df": options_dict.get(next_year_dict.get(unit_dict["year"]))})
+
+                # Theta & features are dated by the former date
+                task_years.update({(metric, n): unit_dict["year"] for metric in ["Theta", "custom"]})
+
+            logger.info(f"Submit Greeks & custom features - {round(time.time() - start_time, 2)} seconds")
+
+            #
+            # Collect, log messages & save data
+            #
 
-    #
-    # Read options and interest rates
-    #
+            # Number of outputs (tasks) of each [metric, year]
+            remaining_dict = dict()
+            for key in task_years.keys():
+                remaining_dict[(key[0], task_years[key])] = remaining_dict.get((key[0], task_years[key]), 0) + 1
 
-    start_time = time.time()
-    options_input_list = []
-    rates_dict = dict()
+            # Number of years of each metric
+            remaining_years = dict()
+            for [metric, _] in remaining_dict.keys():
+                remaining_years[metric] = remaining_years.get(metric, 0) + 1
+
+            # Outputs of each [metric, year], until all its tasks completed
+            collected_dict = dict()
+            # Delta, VIX, IV, Theta & custom years pending on options of each year (Theta & custom features also use
+            # options of next year)
+            options_users_dict = {year: 5 for year in years}
+            for year in next_year_dict.values():
+                options_users_dict[year] += 2
+
+            for [task, n], task_output in completion_queue.as_completed():
+                # Delta tasks also output Gamma
+                metric_outputs = [[task, task_output]]
+                if "Gamma" in task_output.keys():
+                    metric_outputs.append(["Gamma", task_output.pop("Gamma")])
+
+                for [metric, output_dict] in metric_outputs:
+                    year = task_years[(metric, n)]
+
+                    collected_dict.setdefault((metric, year), dict())[n] = output_dict
+                    remaining_dict[(metric, year)] -= 1
+
+                    if remaining_dict[(metric, year)] > 0:
+                        continue
+
+                    # All tasks of [metric, year] completed, in task order
+                    unit_list = [unit_dict for _, unit_dict in sorted(collected_dict.pop((metric, year)).items())]
+
+                    if metric == "custom":
+                        for unit_dict in unit_list:
+                            [logger.info(my_message) for my_message in unit_dict["output_msg"]]
+
+                        year_list = calculate_custom.group_by_year([attach_table(unit_dict["df"])
+                                                                    for unit_dict in unit_list])
+
+                        # Nothing to save if year has no date pairs
+                        year_dict = year_list[0] if year_list else {"name": calculate_custom.name}
+                    else:
+                        year_dict = combine_work_units(unit_list)[0]
 
-    # Options
-    for year in next(os.walk(adj_options_path))[1]:
-        year_df = pd.DataFrame()
-        for file in os.listdir(os.path.join(adj_options_path, year)):
-            if file.split("_")[-1] in ["complete.csv", "incomplete.csv"]:
-                # Load
-                file_df = pd.read_csv(os.path.join(adj_options_path, year, file))
+                        # Log messages if any
+                        [logger.info(my_message) for my_message in year_dict["output_msg"]]
 
-                # Convert columns to correct format
-                file_df["date"] = pd.to_datetime(file_df["date"]).dt.date
-                file_df["expiration date"] = pd.to_datetime(file_df["expiration date"]).dt.date
+                    # Save parameters
+                    metric_type = year_dict["name"]
 
-                year_df = pd.concat([year_df, file_df])
+                    for table in ["full df", "param df"]:
+                        if table in year_dict.keys():
+                            params_store.write(year_dict[table],
+                                               os.path.join(metric_type, ticker,
+                                                            f"{ticker}_{year}_{metric_type}_{table.split()[0]}"))
 
-        # All options for given year
-        year_df.sort_values(by=["date", "expiration date", "strike price", "tag"], inplace=True, ignore_index=True)
+                    # Release shared tables. Options are Delta, VIX, IV, Theta & custom inputs
+                    release_list = list(unit_list)
 
-        # Required by all Greeks for constant maturity interpolation
-        year_df["years to exp"] = np.busday_count(list(year_df["date"]),
-                                                  list(year_df["expiration date"])) / num_days_year
+                    if metric in ["Delta", "VIX", "IV", "Theta", "custom"]:
+                        option_years = [year]
 
-        options_input_list.append({"df": year_df, "year": int(year)})
+                        if (metric in ["Theta", "custom"]) and (year in next_year_dict.keys()):
+                            option_years.append(next_year_dict[year])
 
-    # Interest rates
-    for filename in next(os.walk(interest_rate_path))[2]:
-        if filename.split(".")[-1] == "csv":
+                        for option_year in option_years:
+                            options_users_dict[option_year] -= 1
 
-            filename_short = filename.split(".")[0]
+                            if options_users_dict[option_year] == 0:
+                                release_list.extend([n for n in options_input_list if n["year"] == option_year])
 
-            if filename_short == "1_Month":
-                ratio = round(1 / 12, 8)
-            elif filename_short == "3_Month":
-                ratio = 1 / 4
-            elif filename_short == "6_Month":
-                ratio = 1 / 2
-            elif filename_short == "1_Year":
-                ratio = 1
-            elif filename_short == "2_Year":
-                ratio = 2
-            elif filename_short == "3_Year":
-                ratio = 3
-            elif filename_short == "5_Year":
-                ratio = 5
-            else:
-                continue
+                    for unit_dict in release_list:
+                        for value in unit_dict.values():
+                            if isinstance(value, TableHandle):
+                                shared_tables.release(value)
 
-            rate_df = pd.read_csv(os.path.join(interest_rate_path, filename))
+                    del year_dict, unit_list, release_list
 
-            # Convert columns to correct format
-            rate_df["date"] = pd.to_datetime(rate_df["date"]).dt.date
+                    remaining_years[metric] -= 1
 
-            rates_dict[ratio] = rate_df
+                    if remaining_years[metric] == 0:
+                        logger.info(f"Calculate & save {metric} - {round(time.time() - start_time, 2)} seconds")
 
-    logger.info(f"Read adj options & interest rates - {round(time.time() - start_time, 2)} seconds")
-
-    #
-    # Delta
-    #
-
-    start_time = time.time()
-    delta_initialize_dict = {"abs_reference_threshold": delta_abs_reference,
-                             "abs_lower_threshold": delta_abs_lower_threshold,
-                             "abs_higher_threshold": delta_abs_higher_threshold}
-
-    calculate_delta = CalcDelta(delta_initialize_dict)
-    Delta_list = my_pool.map(calculate_delta.run, options_input_list)
-    output_list.append(Delta_list)
-
-    logger.info(f"Calculate Delta - {round(time.time() - start_time, 2)} seconds")
-
-    #
-    # Gamma
-    #
-
-    start_time = time.time()
-
-    calculate_gamma = CalcGamma()
-    Gamma_list = my_pool.map(calculate_gamma.run, Delta_list)
-    output_list.append(Gamma_list)
-
-    logger.info(f"Calculate Gamma - {round(time.time() - start_time, 2)} seconds")
-
-    #
-    # VIX
-    #
-
-    start_time = time.time()
-    vix_initialize_dict = {"rates_dict": rates_dict}
-
-    calculate_vix = CalcVix(vix_initialize_dict)
-    vix_list = my_pool.map(calculate_vix.run, options_input_list)
-    output_list.append(vix_list)
-
-    logger.info(f"Calculate VIX - {round(time.time() - start_time, 2)} seconds")
-
-    #
-    # Custom features
-    #
-
-    start_time = time.time()
-
-    calculate_custom = CalcCustomInputs()
-    # Group options into (date_0, date_1), (date_1, date_2), ... (date_n-1, date_n)
-    pairs_list = calculate_custom.group_date_pairs(options_input_list)
-    # Calculate change in open interest & fit linear models
-    custom_feat_list = my_pool.map(calculate_custom.run, pairs_list)
-    # Group day into year
-    output_list.append(calculate_custom.group_by_year([n["df"] for n in custom_feat_list]))
-
-    logger.info(f"Calculate custom features - {round(time.time() - start_time, 2)} seconds")
-
-    #
-    # Log messages & save data
-    #
-
-    start_time = time.time()
-
-    # Log messages
-    for metric in output_list:
-        for year_dict in metric:
-            if "output_msg" in year_dict.keys():
-                # Log messages if any
-                [logger.info(my_message) for my_message in year_dict["output_msg"]]
-
-    for date_dict in custom_feat_list:
-        [logger.info(my_message) for my_message in date_dict["output_msg"]]
-
-    # Save parameters
-    for metric in output_list:
-        for year_dict in metric:
-            metric_type = year_dict["name"]
-
-            Path(os.path.join(save_dir, metric_type, ticker)).mkdir(parents=True, exist_ok=True)
-
-            for n in ["full df", "param df"]:
-                if n in year_dict.keys():
-                    year_dict[n].to_csv(
-                        path_or_buf=os.path.join(save_dir, metric_type, ticker,
-                                                 f"{ticker}_{year_dict['year']}_{metric_type}_{n.split()[0]}.csv"),
-                        index=False)
-
-    logger.info(f"Log messages & save data - {round(time.time() - start_time, 2)} seconds")
+        executor.log_timing(logger)
+    finally:
+        shared_tables.close()
@@ -1 +1,2 @@
+from .open_interest import delta_open_interest
 from .custom_inputs import CalcCustomInputs
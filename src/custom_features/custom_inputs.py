@@ -1,6 +1,50 @@
+from custom_features import delta_open_interest
+from greeks import unit_options
 import numpy as np
 import pandas as pd
-from sklearn import linear_model
+
+
+def weighted_least_squares(x, y, weights, group_index, num_groups):
+    """
+    Closed-form weighted least squares fit of y = slope * x + intercept, for all groups at once:
+
+    slope = sum(w * (x - x_mean) * (y - y_mean)) / sum(w * (x - x_mean)^2)
+    intercept = y_mean - slope * x_mean
+
+    where x_mean & y_mean are weighted means of the group. If x is constant within a group,
+    slope is 0 and intercept is the weighted mean of y (minimum norm solution).
+
+    :param x: feature (np.array)
+    :param y: target (np.array)
+    :param weights: sample weights (np.array)
+    :param group_index: group of every sample, 0 to num_groups - 1 (np.array)
+    :param num_groups: number of groups (int)
+    :return: [slope, intercept] of every group, NaN if weights of group sum to 0 (list of np.array)
+    """
+
+    weight_sum = np.bincount(group_index, weights=weights, minlength=num_groups)
+    has_weight = weight_sum > 0
+    weight_sum = np.where(has_weight, weight_sum, 1)
+
+    # Weighted means
+    x_mean = np.bincount(group_index, weights=weights * x, minlength=num_groups) / weight_sum
+    y_mean = np.bincount(group_index, weights=weights * y, minlength=num_groups) / weight_sum
+
+    # Centered weighted sums
+    x_centered = x - x_mean[group_index]
+    y_centered = y - y_mean[group_index]
+
+    sum_xx = np.bincount(group_index, weights=weights * x_centered * x_centered, minlength=num_groups)
+    sum_xy = np.bincount(group_index, weights=weights * x_centered * y_centered, minlength=num_groups)
+
+    # Constant feature (up to rounding)
+    is_constant = sum_xx <= np.finfo(float).eps * np.bincount(group_index, weights=weights * x * x,
+                                                               minlength=num_groups)
+
+    slope = np.where(is_constant, 0, sum_xy / np.where(is_constant, 1, sum_xx))
+    intercept = y_mean - slope * x_mean
+
+    return [np.where(has_weight, slope, np.nan), np.where(has_weight, intercept, np.nan)]
 
 
 class CalcCustomInputs:
@@ -11,88 +55,92 @@ class CalcCustomInputs:
                            "strike price", "adj moneyness ratio", "ask price",
                            "open interest", "volume"]
 
-        # Linear models to fit
-        self.models = ["baseline", "sign",
-                       "doi", "volume", "price",
-                       "doi*price", "volume*price"]
+        # Linear models of "years to exp" to fit: [name, target, sample weights (product of columns, unweighted if empty)]
+        # Models of "signed moneyness ratio" are not defined without change in open interest
+        self.models = [["baseline", "adj moneyness ratio", []],
+                       ["sign", "signed moneyness ratio", []],
+                       ["doi", "signed moneyness ratio", ["abs delta interest"]],
+                       ["volume", "signed moneyness ratio", ["volume"]],
+                       ["price", "signed moneyness ratio", ["ask price"]],
+                       ["doi*price", "signed moneyness ratio", ["abs delta interest", "ask price"]],
+                       ["volume*price", "signed moneyness ratio", ["volume", "ask price"]]]
 
         # Model param column names
         self.param_names = []
-        for m in self.models:
+        for [m, _, _] in self.models:
             self.param_names.extend([f"{m}_slope", f"{m}_intercept"])
 
         self.cols_output = ["date", "tag"] + self.param_names
 
-    def group_date_pairs(self, input_list):
+    def date_pairs(self, delta_df):
         """
-        TODO: Make function parallel, deal with edge cases (last date of year) separately
+        Lazily generate consecutive data date pairs (date_0, date_1), (date_1, date_2), ... of the change in open
+        interest (see `delta_open_interest`). Rows of a pair are a slice of the table (not copied).
 
-        :param input_list: list of aggregated option spreads for given year
-        :return: [{joined_df, date_0, date_1}, {joined_df, date_1, date_2} etc.] (list)
+        :param delta_df: change in open interest between consecutive data dates, sorted by "date" (DataFrame)
+        :return: generator of {df, former date, latter date} (dict)
         """
-        # Unpack
-        year_list = sorted([n["year"] for n in input_list])
-
-        output_list = []
-
-        for year in year_list:
-            year_df = [n["df"] for n in input_list if n["year"] == year][0].copy()
-
-            year_df = self.get_input_cols(year_df)
 
-            dates = sorted(set(year_df["date"]))
+        # Rows of every former date [start, end)
+        [former_dates, date_start] = np.unique(delta_df["date"].values, return_index=True)
+        date_end = np.append(date_start[1:], delta_df.shape[0])
 
-            for date_0 in dates:
-                # Find the following date
-                try:
-                    date_1 = np.min([n for n in dates if n > date_0])
+        for n in range(former_dates.shape[0]):
+            yield {"df": delta_df.iloc[date_start[n]:date_end[n]],
+                   "former date": pd.Timestamp(former_dates[n]),
+                   "latter date": pd.Timestamp(delta_df["latter date"].values[date_start[n]])}
 
-                    # Option spread of date_0 + date_1
-                    output_df = year_df[year_df["date"].isin([date_0, date_1])].reset_index(drop=True)
+    def get_input_cols(self, options_df):
+        # Compute additional columns
+        adj_moneyness = ((options_df["date close"] - options_df["date div"]) -
+                         (options_df["strike price"] - options_df["exp date div"]))
 
-                except ValueError:
-                    # If next year is available
-                    if year < np.max(year_list):
-                        next_year_df = [n["df"] for n in input_list if n["year"] == (year + 1)][0]
+        # Opposite for put options
+        adj_moneyness = adj_moneyness.where(options_df["tag"] != "put", -adj_moneyness)
 
-                        next_year_df = self.get_input_cols(next_year_df)
+        options_df = options_df.assign(**{"adj moneyness ratio": adj_moneyness / options_df["date close"]})
 
-                        # Get first date of next year
-                        date_1 = np.min(next_year_df["date"])
+        return options_df[self.cols_input]
 
-                        # Option spreads of date_0 + date_1
-                        output_df = year_df[year_df["date"] == date_0].append(
-                            next_year_df[next_year_df["date"] == date_1], ignore_index=True)
+    def run_pairs(self, input_dict):
+        """
+        Calculate change in open interest for all consecutive data date pairs of a work unit at once,
+        then run each pair (see `date_pairs`).
 
-                    # If no next year, skip
-                    else:
-                        continue
+        :param input_dict: {df, next df (None if last year), year, dates} (dict)
+        :return: {name, year, df, output_msg} (dict)
+        """
 
-                output_list.append({"df": output_df, "former date": date_0, "latter date": date_1})
+        # Housekeeping
+        output_list = []
+        msg_list = []
 
-        # Done for all data dates in all years
-        return output_list
+        options_df = self.get_input_cols(unit_options(year_df=input_dict["df"],
+                                                      next_year_df=input_dict["next df"],
+                                                      dates=input_dict.get("dates")))
 
-    def get_input_cols(self, year_df):
-        # Compute additional columns
-        year_df["adj moneyness"] = ((year_df["date close"] - year_df["date div"]) -
-                                    (year_df["strike price"] - year_df["exp date div"]))
+        # Outer join, contracts missing from either date are needed for sanity checks
+        delta_df = delta_open_interest(options_df, lags=[1], how="outer")
 
-        # Opposite for put options
-        year_df.loc[year_df["tag"] == "put", "adj moneyness"] = \
-            -year_df.loc[year_df["tag"] == "put", "adj moneyness"]
+        for pair_dict in self.date_pairs(delta_df):
+            pair_output = self.run(pair_dict)
 
-        year_df["adj moneyness ratio"] = year_df["adj moneyness"] / year_df["date close"]
+            output_list.append(pair_output["df"])
+            msg_list.extend(pair_output["output_msg"])
 
-        year_df = year_df[self.cols_input]
+        if output_list:
+            output_df = pd.concat(output_list, ignore_index=True)
+        else:
+            output_df = pd.DataFrame(columns=self.cols_output)
 
-        return year_df
+        return {"name": self.name, "year": input_dict["year"], "df": output_df, "output_msg": msg_list}
 
     def run(self, input_dict):
         """
-        - Calculate change in open interest (OI) between two dates. Remove options that expire day of.
+        - Change in open interest (OI) between two dates is calculated beforehand (see `delta_open_interest`).
+          Options that expire day of are removed.
 
-        - Fit linear regression models of "years till expiry" vs. various metrics.
+        - Fit weighted linear regression models of "years till expiry" vs. various metrics (see `self.models`).
             1. years until expiry (YTE) vs. adjusted moneyness ratio - (baseline)
             2. YTE vs. adj. moneyness ratio * delta OI sign
             3. YTE vs. adj. moneyness ratio * delta OI sign weighted by |delta interest|
@@ -103,12 +151,12 @@ class CalcCustomInputs:
 
         Note: Open interest is recorded at start of date (proven in EDA).
 
-        :param input_dict: {options_df, date_0, date_1} (dict)
+        :param input_dict: {df (change in OI of date_0, outer join), date_0, date_1} (dict)
         :return: {df, output_msg}
         """
 
         # Unpack
-        options_df = input_dict["df"]
+        delta_df = input_dict["df"]
         t_0 = input_dict["former date"]
         t_1 = input_dict["latter date"]
 
@@ -116,47 +164,33 @@ class CalcCustomInputs:
         self.output_msg = []
 
         # Sanity check
-        if np.busday_count(t_0, t_1) > 2:
-            self.output_msg.append(f"{self.name} - time between data dates [{t_0}, {t_1}] > 2 business days!")
+        if np.busday_count(np.datetime64(t_0, "D"), np.datetime64(t_1, "D")) > 2:
+            self.output_msg.append(f"{self.name} - "
+                                   f"time between data dates [{t_0:%Y-%m-%d}, {t_1:%Y-%m-%d}] > 2 business days!")
 
         #
-        # Calculate change in open interest
+        # Change in open interest
         #
 
-        # Filter for data date_0 and exp date >= date_1
-        df_0 = options_df[(options_df["date"] == t_0) &
-                          (options_df["expiration date"] >= t_1)].copy()
-        df_0.rename(columns={"open interest": "open interest 0"}, inplace=True)
-        exp_dates_0 = set(np.unique(df_0["expiration date"]))
-
-        # Filter for data date_1 & select needed columns
-        df_1 = options_df[options_df["date"] == t_1].copy()
-        df_1 = df_1[["expiration date", "tag", "strike price", "open interest"]]
-        df_1.rename(columns={"open interest": "open interest 1"}, inplace=True)
-        exp_dates_1 = set(np.unique(df_1["expiration date"]))
+        # Options of date_0 (exp date >= date_1) & date_1
+        exp_dates_0 = set(delta_df.loc[delta_df["_merge"] != "right_only", "expiration date"])
+        exp_dates_1 = set(delta_df.loc[delta_df["_merge"] != "left_only", "expiration date"])
 
         # Sanity check
         missing_exp_dates = exp_dates_0 - exp_dates_1
         if missing_exp_dates:
             self.output_msg.append(f"{self.name} - "
-                                   f"(date: {t_0}) - "
-                                   f"Exp dates: {missing_exp_dates} missing from {t_1}")
+                                   f"(date: {t_0:%Y-%m-%d}) - "
+                                   f"Exp dates: {sorted(f'{n:%Y-%m-%d}' for n in missing_exp_dates)} "
+                                   f"missing from {t_1:%Y-%m-%d}")
 
         # Not right join because we need "ask price" of date_0
         # Not left join because dropped exp dates are usually errors
-        df = df_0.merge(right=df_1,
-                        on=["expiration date", "tag", "strike price"],
-                        how="inner")
+        df = delta_df[delta_df["_merge"] == "both"]
 
-        # Get change in open interest
-        df["delta interest"] = df["open interest 1"] - df["open interest 0"]
-        df["oi sign"] = np.sign(df["delta interest"])
-
-        # Get EOD open interest
-        df.rename(columns={"open interest 1": "EOD open interest"}, inplace=True)
-
-        # Drop unneeded columns
-        df.drop(columns=["expiration date", "strike price", "open interest 0"], inplace=True)
+        # Get EOD open interest & drop unneeded columns
+        df = df.rename(columns={"latter open interest": "EOD open interest"})
+        df = df.drop(columns=["expiration date", "strike price", "open interest", "latter date", "lag", "_merge"])
 
         # Sanity check
         assert df[df.isna().any(axis=1)].empty, "There are NaNs present in joined DataFrame!"
@@ -165,86 +199,55 @@ class CalcCustomInputs:
         # Fit Models
         #
 
-        output_list = []
+        tags = ["call", "put"]
+
+        # Filter for volume or delta open interest != 0
+        df_model = df[(df["delta interest"] != 0) | (df["volume"] != 0)]
 
         # Fit separate models for call and put spreads
-        for tag in ["call", "put"]:
+        tag_index = pd.Categorical(df_model["tag"], categories=tags).codes
+
+        years = df_model["years to exp"].values
+        has_delta_interest = np.bincount(tag_index, weights=(df_model["delta interest"] != 0),
+                                         minlength=len(tags)) > 0
 
-            # Filter for volume or delta open interest != 0 & tag
-            df_model = df[(df["tag"] == tag) & ((df["delta interest"] != 0) | (df["volume"] != 0))]
-            model_params = []
+        model_columns = {"adj moneyness ratio": df_model["adj moneyness ratio"].values,
+                         "signed moneyness ratio": (df_model["adj moneyness ratio"] * df_model["oi sign"]).values,
+                         "abs delta interest": np.abs(df_model["delta interest"].values),
+                         "volume": df_model["volume"].values,
+                         "ask price": df_model["ask price"].values}
 
+        param_list = []
+
+        for [m, target, weight_cols] in self.models:
+            weights = np.ones(years.shape[0])
+            for col in weight_cols:
+                weights = weights * model_columns[col]
+
+            [slope, intercept] = weighted_least_squares(x=years, y=model_columns[target], weights=weights,
+                                                        group_index=tag_index, num_groups=len(tags))
+
+            if target == "signed moneyness ratio":
+                [slope, intercept] = [np.where(has_delta_interest, n, np.nan) for n in [slope, intercept]]
+
+            param_list.extend([slope, intercept])
+
+        output_list = []
+
+        for n, tag in enumerate(tags):
             # Edge case 1
-            if df_model.empty:
+            if not np.any(tag_index == n):
                 self.output_msg.append(f"{self.name} - "
-                                       f"(date: {t_0}, tag: {tag}) - "
+                                       f"(date: {t_0:%Y-%m-%d}, tag: {tag}) - "
                                        f"No options with 'delta interest' or 'volume' != 0")
 
-                model_params = [np.nan] * len(self.param_names)
-
             # Edge case 2
-            elif all(df_model["delta interest"] == 0):
+            elif not has_delta_interest[n]:
                 self.output_msg.append(f"{self.name} - "
-                                       f"(date: {t_0}, tag: {tag}) - "
+                                       f"(date: {t_0:%Y-%m-%d}, tag: {tag}) - "
                                        f"No options with 'delta interest' != 0")
 
-                for m in self.models:
-                    if m == "baseline":
-                        model = linear_model.LinearRegression().fit(X=df_model[["years to exp"]],
-                                                                    y=df_model["adj moneyness ratio"])
-
-                        model_params.extend([float(model.coef_), float(model.intercept_)])
-                    else:
-                        model_params.extend([np.nan, np.nan])
-
-            # Ideal
-            else:
-                for m in self.models:
-                    if m == "baseline":
-                        model = linear_model.LinearRegression().fit(
-                            X=df_model[["years to exp"]],
-                            y=df_model["adj moneyness ratio"]
-                        )
-                    elif m == "sign":
-                        model = linear_model.LinearRegression().fit(
-                            X=df_model[["years to exp"]],
-                            y=df_model["adj moneyness ratio"] * df_model["oi sign"]
-                        )
-                    elif m == "doi":
-                        model = linear_model.LinearRegression().fit(
-                            X=df_model[["years to exp"]],
-                            y=df_model["adj moneyness ratio"] * df_model["oi sign"],
-                            sample_weight=np.abs(df_model["delta interest"])
-                        )
-                    elif m == "volume":
-                        model = linear_model.LinearRegression().fit(
-                            X=df_model[["years to exp"]],
-                            y=df_model["adj moneyness ratio"] * df_model["oi sign"],
-                            sample_weight=df_model["volume"]
-                        )
-                    elif m == "price":
-                        model = linear_model.LinearRegression().fit(
-                            X=df_model[["years to exp"]],
-                            y=df_model["adj moneyness ratio"] * df_model["oi sign"],
-                            sample_weight=df_model["ask price"]
-                        )
-                    elif m == "doi*price":
-                        model = linear_model.LinearRegression().fit(
-                            X=df_model[["years to exp"]],
-                            y=df_model["adj moneyness ratio"] * df_model["oi sign"],
-                            sample_weight=np.abs(df_model["delta interest"] * df_model["ask price"])
-                        )
-                    # volume*price
-                    else:
-                        model = linear_model.LinearRegression().fit(
-                            X=df_model[["years to exp"]],
-                            y=df_model["adj moneyness ratio"] * df_model["oi sign"],
-                            sample_weight=df_model["volume"] * df_model["ask price"]
-                        )
-
-                    model_params.extend([float(model.coef_), float(model.intercept_)])
-
-            output_list.append([t_0, tag] + [round(n, 6) for n in model_params])
+            output_list.append([t_0, tag] + [round(float(params[n]), 6) for params in param_list])
 
         output_df = pd.DataFrame(output_list, columns=(["date", "tag"] + self.param_names))
 
@@ -255,6 +258,12 @@ class CalcCustomInputs:
         # Housekeeping
         output_list = []
 
+        # Work units without date pairs (e.g. last date of data)
+        input_list = [n for n in input_list if not n.empty]
+
+        if not input_list:
+            return output_list
+
         # Group all date dfs into single df
         df_combined = pd.concat(input_list)
 
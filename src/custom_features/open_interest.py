@@ -0,0 +1,42 @@
+from greeks import lag_join
+import numpy as np
+
+
+def delta_open_interest(options_df, lags=(1,), how="inner", contract_cols=("expiration date", "tag", "strike price"),
+                        latter_cols=("open interest",)):
+    """
+    Change in open interest of every contract between data dates t and t + lag (lag in trading dates, i.e. rank of
+    data date), for all data dates of the table at once (see `lag_join`). Contracts expiring before t + lag are
+    removed from t.
+
+    Join semantics (as `pd.merge` of the two dates on `contract_cols`, duplicate contracts are joined many-to-many):
+        - "inner": contracts present on both dates
+        - "outer": also contracts only present on t ("left_only") or t + lag ("right_only"), see "_merge" column.
+                   Open interest (& other latter columns) of the missing date is 0, other columns of t are NaN.
+
+    Note: Open interest is recorded at start of date, open interest of t + 1 is end of day open interest of t.
+
+    :param options_df: options of data dates, one row per [date, contract] (DataFrame)
+    :param lags: trading date lags, e.g. [1, 5, 20] (list)
+    :param how: "inner" or "outer" (str)
+    :param contract_cols: columns identifying a contract (list)
+    :param latter_cols: columns of t + lag to add, prefixed by "latter" (list)
+    :return: rows of t (DataFrame: options_df columns, "latter date", "lag", latter columns,
+             "delta interest", "oi sign", "_merge" if outer), sorted by lag & data date
+    """
+
+    # Sanity check
+    assert "open interest" in latter_cols, "Open interest of latter date is required!"
+
+    output_df = lag_join(options_df, lags=lags, how=how, contract_cols=contract_cols, latter_cols=latter_cols,
+                         fill_value=0)
+
+    # Open interest of contracts missing on t is 0
+    if how == "outer":
+        output_df["open interest"] = output_df["open interest"].fillna(0).astype(options_df["open interest"].dtype)
+
+    # Get change in open interest
+    output_df["delta interest"] = output_df["latter open interest"] - output_df["open interest"]
+    output_df["oi sign"] = np.sign(output_df["delta interest"])
+
+    return output_df
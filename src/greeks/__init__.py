@@ -2,3 +2,7 @@ from .greeks_base_class import GreeksBase
 from .delta import CalcDelta
 from .gamma import CalcGamma
 from .vix import CalcVix
+from .work_units import date_work_units, combine_work_units, unit_options
+from .contract_panel import lag_join
+from .theta import CalcTheta
+from .implied_vol import CalcImpliedVol, black_scholes, implied_volatility
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+
+def lag_join(options_df, lags=(1,), how="inner", contract_cols=("expiration date", "tag", "strike price"),
+             latter_cols=("ask price",), fill_value=np.nan):
+    """
+    Join every contract on data date t with the same contract on t + lag (lag in trading dates, i.e. rank of
+    data date), for all data dates of the table at once. Contracts expiring before t + lag are removed from t.
+
+    Join semantics (as `pd.merge` of the two dates on `contract_cols`, duplicate contracts are joined many-to-many):
+        - "inner": contracts present on both dates
+        - "outer": also contracts only present on t ("left_only") or t + lag ("right_only"), see "_merge" column.
+                   Latter columns of contracts missing on t + lag are `fill_value`, columns of t (other than
+                   `contract_cols`) of contracts missing on t are NaN.
+
+    :param options_df: options of data dates, one row per [date, contract] (DataFrame)
+    :param lags: trading date lags, e.g. [1, 5, 20] (list)
+    :param how: "inner" or "outer" (str)
+    :param contract_cols: columns identifying a contract (list)
+    :param latter_cols: columns of t + lag to add, prefixed by "latter" (list)
+    :param fill_value: value of missing contracts (outer join)
+    :return: rows of t (DataFrame: options_df columns, "latter date", "lag", latter columns, "_merge" if outer),
+             sorted by lag & data date
+    """
+
+    # Sanity check
+    assert how in ["inner", "outer"], "Join must be 'inner' or 'outer'!"
+
+    # Housekeeping
+    contract_cols = list(contract_cols)
+    latter_names = {col: f"latter {col}" for col in latter_cols}
+    output_list = []
+
+    # Trading date rank & contract of every row
+    [dates, date_rank] = np.unique(options_df["date"].values, return_inverse=True)
+    contract_id = options_df.groupby(contract_cols, sort=False, observed=True).ngroup().values
+
+    # Key of every [contract, date], contract rows are consecutive in sorted keys
+    row_key = contract_id.astype(np.int64) * dates.shape[0] + date_rank
+    key_order = np.argsort(row_key, kind="stable")
+    sorted_key = row_key[key_order]
+
+    expiration_dates = options_df["expiration date"].values
+
+    for lag in lags:
+        # Rows of same contract on t + lag (sorted keys [start, end))
+        has_latter_date = date_rank + lag < dates.shape[0]
+        latter_date = dates[np.minimum(date_rank + lag, dates.shape[0] - 1)]
+
+        match_start = np.searchsorted(sorted_key, row_key + lag, side="left")
+        num_matches = np.where(has_latter_date,
+                               np.searchsorted(sorted_key, row_key + lag, side="right") - match_start, 0)
+
+        # Remove options that expire before t + lag
+        is_former = has_latter_date & (expiration_dates >= latter_date)
+
+        if how == "inner":
+            is_former = is_former & (num_matches > 0)
+
+        former_rows = np.flatnonzero(is_former)
+
+        # One row per matched [t, t + lag] rows (once if not matched)
+        num_rows = np.maximum(num_matches[former_rows], 1)
+        pair_rows = np.repeat(former_rows, num_rows)
+        match_offset = np.arange(pair_rows.shape[0]) - np.repeat(np.cumsum(num_rows) - num_rows, num_rows)
+
+        is_matched = num_matches[pair_rows] > 0
+        latter_rows = key_order[np.minimum(match_start[pair_rows] + match_offset, sorted_key.shape[0] - 1)]
+
+        lag_df = options_df.iloc[pair_rows].reset_index(drop=True)
+        lag_df["latter date"] = latter_date[pair_rows]
+        lag_df["lag"] = lag
+
+        for col, name in latter_names.items():
+            values = options_df[col].values[latter_rows]
+            lag_df[name] = np.where(is_matched, values, fill_value) if how == "outer" else values
+
+        if how == "outer":
+            lag_df["_merge"] = np.where(is_matched, "both", "left_only")
+
+            # Contracts only present on t + lag
+            is_paired = np.zeros(options_df.shape[0], dtype=bool)
+            is_paired[latter_rows[is_matched]] = True
+
+            new_rows = np.flatnonzero(~is_paired & (date_rank >= lag))
+
+            new_df = options_df.iloc[new_rows][contract_cols].reset_index(drop=True)
+            new_df["date"] = dates[date_rank[new_rows] - lag]
+            new_df["latter date"] = options_df["date"].values[new_rows]
+            new_df["lag"] = lag
+
+            for col, name in latter_names.items():
+                new_df[name] = options_df[col].values[new_rows]
+
+            new_df["_merge"] = "right_only"
+
+            lag_df = pd.concat([lag_df, new_df], ignore_index=True)
+
+        # Rows of each data date, present on t first
+        output_list.append(lag_df.iloc[np.argsort(lag_df["date"].values, kind="stable")].reset_index(drop=True))
+
+    output_df = pd.concat(output_list, ignore_index=True)
+
+    if how == "outer":
+        output_df["_merge"] = pd.Categorical(output_df["_merge"], categories=["left_only", "right_only", "both"])
+
+    return output_df
@@ -11,258 +11,263 @@ class CalcDelta(GreeksBase):
         self.abs_lower = input_dict["abs_lower_threshold"]
         self.abs_higher = input_dict["abs_higher_threshold"]
         self.parameters = ["delta_reference_point", "delta_itm_spread", "delta_otm_spread"]
+        # Constant maturities to interpolate at (optional)
+        self.intervals = input_dict.get("intervals", self.intervals)
+        # Gamma calculated in the same pass (optional, see `CalcGamma.calc_from_delta`)
+        self.calculate_gamma = input_dict.get("gamma")
         self.cols_input = ["date", "expiration date", "years to exp", "tag",
                            "strike price", "ask price", "date close",
                            "date div", "exp date div"]
         self.cols_output_full = ["date", "expiration date", "years to exp", "tag",
                                  "strike midpoint", "moneyness", "moneyness ratio", "adj moneyness", "Delta"]
 
-        # Housekeeping for class functions
-        self.moneyness_df = None
-
     def run(self, input_dict):
         """
-        TODO: Make function parallel at date level rather than year. Option spread size increased ~10x from 2005 to 2021
+        Calculate for all data dates of year, or only those of a work unit (see `date_work_units`).
 
-        :param input_dict: {year_df, year}
-        :return: dict {name, year, param df, full df, output_msg}
+        :param input_dict: {year_df, year, (dates)}
+        :return: dict {name, year, param df, full df, output_msg, (Gamma: dict {name, year, ...})}
         """
 
         # Unpack
         year_df = input_dict["df"][self.cols_input]
         year = input_dict["year"]
 
-        # Housekeeping
-        full_delta_list = []
-        param_delta_list = []
+        # Work unit of data dates
+        if "dates" in input_dict.keys():
+            year_df = year_df[year_df["date"].isin(input_dict["dates"])]
 
         # Flush output messages if class object is reused
         self.output_msg = []
 
-        for date in list(set(year_df["date"])):
-            # date
-            self.date = date
-            df1 = year_df[year_df["date"] == date]
-            # Housekeeping
-            date_param_list = []
+        # Time till expiry is 0. Delta should be step function. Skip
+        year_df = year_df[year_df["date"] != year_df["expiration date"]]
 
-            for exp_date in list(set(df1["expiration date"])):
-                # Time till expiry is 0. Delta should be step function. Skip
-                if date == exp_date:
-                    continue
+        # Delta of all [date, exp date, tag] option spreads
+        [full_delta_df, chain_dict] = self.calc_full_delta(year_df)
 
-                # date + exp date
-                self.exp_date = exp_date
-                df2 = df1[df1["expiration date"] == exp_date]
-                self.years_to_exp = float(np.unique(df2["years to exp"]))
+        # All [date, exp date] call & put spreads, with years to expiry
+        spreads_df = year_df.drop_duplicates(subset=["date", "expiration date"])[
+            ["date", "expiration date", "years to exp"]].sort_values(by=["date", "expiration date"])
+        spreads_df = spreads_df.merge(pd.DataFrame({"tag": ["call", "put"]}), how="cross")
 
-                for tag in ["call", "put"]:
-                    # date + exp date + tag
-                    self.tag = tag
-                    df3 = df2[df2["tag"] == tag].copy()
+        # Moneyness ratio at different Delta thresholds, of all spreads at once
+        abs_thresholds = [self.abs_lower, self.abs_reference, self.abs_higher]
+        [threshold_moneyness, found] = self.get_moneyness_ratios(full_delta_df=full_delta_df,
+                                                                 chain_dict=chain_dict,
+                                                                 spreads_df=spreads_df,
+                                                                 abs_thresholds=abs_thresholds)
 
-                    # Calculate Delta values at midpoints
-                    df3["Delta"] = ((df3["ask price"] - df3["ask price"].shift(periods=1)) /
-                                    -(df3["strike price"] - df3["strike price"].shift(periods=1))).round(6)
+        # Derive parameters using the moneyness ratios at different thresholds
+        delta_parameters_dict = self.get_parameters(input_dict=dict(zip(abs_thresholds, threshold_moneyness.T)))
+        spreads_df = spreads_df.assign(**delta_parameters_dict)
 
-                    df3["strike midpoint"] = ((df3["strike price"] +
-                                               df3["strike price"].shift(periods=1)) / 2).round(6)
+        # Spreads where threshold could not be bracketed
+        date_msg_list = []
+        spread_list = list(zip(spreads_df["date"], spreads_df["expiration date"], spreads_df["tag"]))
 
-                    df3["moneyness"] = df3["date close"] - df3["strike midpoint"]
-                    df3["adj moneyness"] = ((df3["date close"] - df3["date div"]) -
-                                            (df3["strike midpoint"] - df3["exp date div"]))
+        for [spread_index, threshold_index] in np.argwhere(~found):
+            [date, exp_date, tag] = spread_list[spread_index]
+            date_msg_list.append([date, f"{self.name} - "
+                                        f"(data date: {date:%Y-%m-%d}, exp date: {exp_date:%Y-%m-%d}, tag: {tag}) - "
+                                        f"cannot interpolate |threshold|: {abs_thresholds[threshold_index]} "
+                                        f"moneyness ratio"])
 
-                    if tag == "put":
-                        df3["moneyness"] = -df3["moneyness"]
-                        df3["adj moneyness"] = -df3["adj moneyness"]
+        # Interpolate parameters to set intervals (1 month, 2 months, etc.), all data dates at once
+        [param_delta_df, interval_msg_list] = self.interpolate_intervals(param_df=spreads_df,
+                                                                         parameters=self.parameters)
 
-                    df3["moneyness ratio"] = df3["moneyness"] / df3["date close"]
+        # Messages of each data date: thresholds, then intervals
+        date_msg_list = sorted(date_msg_list + interval_msg_list, key=lambda x: x[0])
+        self.output_msg.extend([msg for [_, msg] in date_msg_list])
 
-                    # Drop empty row from "shift" operation
-                    df3.dropna(inplace=True)
+        # Gamma from the same sorted Delta table, not regrouped
+        gamma_dict = None
+        if self.calculate_gamma is not None:
+            gamma_dict = self.calculate_gamma.calc_from_delta(full_delta_df=full_delta_df, chain_dict=chain_dict,
+                                                              spreads_df=spreads_df, year=year)
 
-                    full_delta_list.append(df3[self.cols_output_full])
+        # Create full DataFrame
+        full_delta_df = full_delta_df[self.cols_output_full]
 
-                    # Get moneyness ratio at different Delta thresholds
-                    threshold_moneyness_dict = self.get_moneyness_ratios(
-                        df=df3,
-                        abs_thresholds=[self.abs_lower, self.abs_reference, self.abs_higher])
+        # Sort
+        param_delta_df.sort_values(by=["date", "interval", "tag"], inplace=True, ignore_index=True)
+        full_delta_df = full_delta_df.sort_values(by=["date", "expiration date", "strike midpoint", "tag"],
+                                                  ignore_index=True)
 
-                    # Derive parameters using the moneyness ratios at different thresholds
-                    delta_parameters_dict = self.get_parameters(input_dict=threshold_moneyness_dict)
+        output_dict = {"name": self.name, "year": year,
+                       "param df": param_delta_df, "full df": full_delta_df, "output_msg": self.output_msg}
 
-                    # Append to list
-                    for key in delta_parameters_dict:
-                        date_param_list.append([self.date, self.exp_date, self.years_to_exp, self.tag,
-                                                key, delta_parameters_dict[key]])
+        if gamma_dict is not None:
+            output_dict["Gamma"] = gamma_dict
 
-            # All Delta params for data date
-            date_df = pd.DataFrame(date_param_list,
-                                   columns=["date", "expiration date", "years to exp", "tag",
-                                            "parameter", "moneyness ratio"])
+        return output_dict
 
-            date_df = date_df.pivot(index=["date", "expiration date", "years to exp", "tag"],
-                                    columns="parameter",
-                                    values="moneyness ratio").reset_index(drop=False)
+    def calc_full_delta(self, year_df):
+        """
+        Delta at strike midpoints of all [date, exp date, tag] option spreads, in one pass over the presorted table.
+        Differences are taken between consecutive strikes of a spread, the first strike of each spread is dropped.
 
-            # Interpolate parameters to set intervals (1 month, 2 months, etc.)
-            date_delta_df = self.interpolate_intervals(date_df=date_df,
-                                                       parameters=self.parameters,
-                                                       date=self.date)
+        :param year_df: options, `cols_input` (DataFrame)
+        :return: [full_delta_df: `cols_input` + Delta columns, sorted by [date, exp date, tag, strike midpoint]
+                  (DataFrame),
+                  chain_dict: {(date, exp date, tag): [start, end] rows of spread in full_delta_df} (dict)]
+        """
 
-            param_delta_list.append(date_delta_df)
+        # Sort each spread by strike, spreads one after another
+        df = year_df.sort_values(by=["date", "expiration date", "tag", "strike price"], ignore_index=True)
 
-        # Create parameter / full DataFrames
-        param_delta_df = pd.concat(param_delta_list)
-        full_delta_df = pd.concat(full_delta_list)
+        # First strike of each spread
+        chain_cols = ["date", "expiration date", "tag"]
+        chain_start = df[chain_cols].ne(df[chain_cols].shift(periods=1)).any(axis=1).values
 
-        # Sort
-        param_delta_df.sort_values(by=["date", "interval", "tag"], inplace=True, ignore_index=True)
-        full_delta_df.sort_values(by=["date", "expiration date", "strike midpoint", "tag"], inplace=True,
-                                  ignore_index=True)
+        strike = df["strike price"].values.astype(np.float64)
+        ask = df["ask price"].values.astype(np.float64)
 
-        return {"name": self.name, "year": year,
-                "param df": param_delta_df, "full df": full_delta_df, "output_msg": self.output_msg}
+        # Previous strike of same spread, NaN for first strike
+        prev_strike = np.concatenate([[np.nan], strike[:-1]])
+        prev_ask = np.concatenate([[np.nan], ask[:-1]])
+        prev_strike[chain_start] = np.nan
+        prev_ask[chain_start] = np.nan
 
-    def get_moneyness_ratios(self, df, abs_thresholds):
-        # Housekeeping
-        cand_0 = None
-        cand_1 = None
-        necessary_columns = ["moneyness ratio", "Delta"]
-        output_dict = dict()
+        # Calculate Delta values at midpoints
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df["Delta"] = np.round((ask - prev_ask) / -(strike - prev_strike), 6)
 
-        # Local copy
-        self.moneyness_df = df[necessary_columns].copy()
-
-        # Flip put curve to be monotonically increasing
-        if self.tag == "put":
-            self.moneyness_df["Delta"] = -self.moneyness_df["Delta"]
-
-        # Max / min moneyness ratios
-        max_moneyness = np.max(self.moneyness_df["moneyness ratio"])
-        min_moneyness = np.min(self.moneyness_df["moneyness ratio"])
-
-        for i in abs_thresholds:
-            for j in ["pre", "post"]:
-
-                cand = self.find_next_candidate(cand_type=j, threshold=i,
-                                                min_moneyness=min_moneyness,
-                                                max_moneyness=max_moneyness)
-
-                # If no suitable option exists (spread is too narrow etc.), n is empty DataFrame
-                if cand.empty:
-                    if j == "pre":
-                        cand_0 = np.nan
-                    else:
-                        cand_1 = np.nan
-
-                # If suitable candidate exist, cand is a Series
-                else:
-                    # Find options neighbouring cand
-                    n_0, n_1 = self.find_neighbours(poi=cand)
-
-                    # n is considered valid if monotonically increasing with immediate neighbours
-                    while not (cand["Delta"] >= n_0["Delta"]) & (n_1["Delta"] >= cand["Delta"]):
-                        # Find next best candidate
-                        if j == "pre":
-                            cand = self.find_next_candidate(cand_type=j, threshold=i,
-                                                            min_moneyness=min_moneyness,
-                                                            max_moneyness=cand["moneyness ratio"])
-                        else:
-                            cand = self.find_next_candidate(cand_type=j, threshold=i,
-                                                            min_moneyness=cand["moneyness ratio"],
-                                                            max_moneyness=max_moneyness)
-
-                        # No more valid candidates
-                        if cand.empty:
-                            cand = np.nan
-                            break
-                        else:
-                            # New neighbours
-                            n_0, n_1 = self.find_neighbours(poi=cand)
-
-                    # Found appropriate options
-                    if j == "pre":
-                        cand_0 = cand
-                    else:
-                        cand_1 = cand
-
-            # Obtained upper & lower bound for threshold
-            if pd.isna([cand_0, cand_1]).any():
-                self.output_msg.append(f"{self.name} - "
-                                       f"(data date: {self.date}, exp date: {self.exp_date}, tag: {self.tag}) - "
-                                       f"cannot interpolate |threshold|: {i} moneyness ratio")
-                threshold_moneyness = np.nan
-
-            # Ideal case
-            else:
-                # Linearly interpolate moneyness ratio at threshold
-                delta_0 = cand_0["Delta"]
-                moneyness_0 = cand_0["moneyness ratio"]
-
-                delta_1 = cand_1["Delta"]
-                moneyness_1 = cand_1["moneyness ratio"]
-
-                threshold_moneyness = (moneyness_1 * (i - delta_0) + moneyness_0 * (delta_1 - i)) / (delta_1 - delta_0)
-
-            # Add threshold moneyness ratio to output
-            if self.tag == "put":
-                actual_threshold = -i
-            else:
-                actual_threshold = i
-
-            output_dict[actual_threshold] = round(threshold_moneyness, 8)
+        df["strike midpoint"] = np.round((strike + prev_strike) / 2, 6)
 
-        return output_dict
+        df["moneyness"] = df["date close"] - df["strike midpoint"]
+        df["adj moneyness"] = ((df["date close"] - df["date div"]) -
+                               (df["strike midpoint"] - df["exp date div"]))
+
+        # Put moneyness is reversed
+        put_filter = (df["tag"] == "put").values
+        df.loc[put_filter, "moneyness"] = -df.loc[put_filter, "moneyness"]
+        df.loc[put_filter, "adj moneyness"] = -df.loc[put_filter, "adj moneyness"]
+
+        df["moneyness ratio"] = df["moneyness"] / df["date close"]
+
+        # Drop empty row from "shift" (first strike of each spread), and incomplete rows
+        df = df[df.notna().all(axis=1).values].reset_index(drop=True)
+
+        # Rows of each spread
+        return [df, self.chain_rows(df, chain_cols)]
+
+    def get_moneyness_ratios(self, full_delta_df, chain_dict, spreads_df, abs_thresholds):
+        """
+        Moneyness ratio at each |Delta| threshold, of every spread (see `threshold_moneyness_ratios`).
+        Put Delta curves are flipped to be increasing.
+
+        :param full_delta_df: see `calc_full_delta` (DataFrame)
+        :param chain_dict: see `calc_full_delta` (dict)
+        :param spreads_df: [date, expiration date, tag] of spreads, including ones without Delta rows (DataFrame)
+        :param abs_thresholds: |Delta| thresholds (list)
+        :return: [moneyness ratios, found: threshold bracketed] per [spread, threshold] (list of np.array)
+        """
+
+        # Housekeeping
+        threshold_moneyness = np.full([spreads_df.shape[0], len(abs_thresholds)], np.nan)
+        found = np.zeros([spreads_df.shape[0], len(abs_thresholds)], dtype=bool)
 
-    def find_next_candidate(self, cand_type, threshold, min_moneyness, max_moneyness):
-        # Not on edges
-        cand = self.moneyness_df[(self.moneyness_df["moneyness ratio"] > min_moneyness) &
-                                 (self.moneyness_df["moneyness ratio"] < max_moneyness)].sort_values(
-            by="moneyness ratio", ascending=True)
+        delta = full_delta_df["Delta"].values.copy()
+        delta[(full_delta_df["tag"] == "put").values] *= -1
 
-        if cand_type == "pre":
-            cand = cand[cand["Delta"] <= threshold]
-            if not cand.empty:
-                # Max moneyness & below threshold & not on edges
-                cand = cand.iloc[-1, :]
-        else:
-            cand = cand[(cand["Delta"] > threshold)]
-            if not cand.empty:
-                # Min moneyness & above threshold & not on edges
-                cand = cand.iloc[0, :]
+        chain_start = np.array(sorted([start for [start, _] in chain_dict.values()]), dtype=np.int64)
 
-        return cand
+        [chain_moneyness, chain_found] = threshold_moneyness_ratios(
+            moneyness_ratio=full_delta_df["moneyness ratio"].values, delta=delta,
+            chain_start=chain_start, thresholds=abs_thresholds)
 
-    def find_neighbours(self, poi):
-        n_0 = self.moneyness_df[self.moneyness_df["moneyness ratio"] < poi["moneyness ratio"]].sort_values(
-            by="moneyness ratio", ascending=True).iloc[-1, :]
+        # Spreads with Delta rows
+        spread_start = np.array([chain_dict.get(key, [-1, -1])[0] for key in
+                                 zip(spreads_df["date"], spreads_df["expiration date"], spreads_df["tag"])])
+        spread_filter = spread_start >= 0
+        chain_index = np.searchsorted(chain_start, spread_start[spread_filter])
 
-        n_1 = self.moneyness_df[self.moneyness_df["moneyness ratio"] > poi["moneyness ratio"]].sort_values(
-            by="moneyness ratio", ascending=True).iloc[0, :]
+        threshold_moneyness[spread_filter] = chain_moneyness[chain_index]
+        found[spread_filter] = chain_found[chain_index]
 
-        return n_0, n_1
+        return [threshold_moneyness, found]
 
     def get_parameters(self, input_dict):
+        """
+        :param input_dict: {|Delta| threshold: moneyness ratios} (dict)
+        :return: {parameter: values} (dict)
+        """
+
         # Housekeeping
         output_dict = dict()
 
-        if self.tag == "put":
-            [reference, lower, higher] = [-self.abs_reference, -self.abs_lower, -self.abs_higher]
-        else:
-            [reference, lower, higher] = [self.abs_reference, self.abs_lower, self.abs_higher]
-
         # Sanity check
-        assert all([n in input_dict.keys() for n in [reference, lower, higher]])
+        assert all([n in input_dict.keys() for n in [self.abs_reference, self.abs_lower, self.abs_higher]])
 
         # Calculate parameters
         if "delta_reference_point" in self.parameters:
-            output_dict["delta_reference_point"] = input_dict[reference]
+            output_dict["delta_reference_point"] = input_dict[self.abs_reference]
 
         if "delta_otm_spread" in self.parameters:
-            output_dict["delta_otm_spread"] = input_dict[reference] - input_dict[lower]
+            output_dict["delta_otm_spread"] = input_dict[self.abs_reference] - input_dict[self.abs_lower]
 
         if "delta_itm_spread" in self.parameters:
-            output_dict["delta_itm_spread"] = input_dict[higher] - input_dict[reference]
+            output_dict["delta_itm_spread"] = input_dict[self.abs_higher] - input_dict[self.abs_reference]
 
         return output_dict
+
+
+def threshold_moneyness_ratios(moneyness_ratio, delta, chain_start, thresholds):
+    """
+    Linearly interpolate the moneyness ratio at Delta thresholds, for many Delta curves (chains) at once.
+
+    For each chain & threshold, the bracketing options are:
+        - pre: max moneyness ratio option with Delta <= threshold
+        - post: min moneyness ratio option with Delta > threshold
+    considering only valid options: not on the edges (min / max moneyness ratio of chain), and Delta monotonically
+    increasing with its immediate neighbours. Moneyness ratios are assumed distinct within a chain.
+
+    :param moneyness_ratio: moneyness ratios, chains one after another (np.array)
+    :param delta: Delta (flipped to be increasing for puts) (np.array)
+    :param chain_start: first row of each chain, ascending (np.array)
+    :param thresholds: Delta thresholds (list)
+    :return: [moneyness ratio at thresholds, found: pre & post exist] of shape [chains, thresholds] (list of np.array)
+    """
+
+    # Housekeeping
+    num_rows = moneyness_ratio.shape[0]
+    threshold_moneyness = np.full([chain_start.shape[0], len(thresholds)], np.nan)
+    found = np.zeros([chain_start.shape[0], len(thresholds)], dtype=bool)
+
+    if num_rows == 0:
+        return [threshold_moneyness, found]
+
+    # Sort each chain by moneyness ratio
+    chain_id = np.repeat(np.arange(chain_start.shape[0]), np.diff(np.append(chain_start, num_rows)))
+    order = np.lexsort((moneyness_ratio, chain_id))
+    moneyness_ratio = moneyness_ratio[order]
+    delta = delta[order]
+
+    # Edges of each chain
+    chain_end = np.append(chain_start[1:], num_rows) - 1
+    not_edge = ((moneyness_ratio > moneyness_ratio[chain_start][chain_id]) &
+                (moneyness_ratio < moneyness_ratio[chain_end][chain_id]))
+
+    # Monotonically increasing with immediate neighbours (local monotonicity mask, computed once)
+    delta_prev = delta[np.maximum(np.arange(num_rows) - 1, 0)]
+    delta_next = delta[np.minimum(np.arange(num_rows) + 1, num_rows - 1)]
+    valid = not_edge & (delta >= delta_prev) & (delta_next >= delta)
+
+    positions = np.arange(num_rows)
+
+    for n, threshold in enumerate(thresholds):
+        # Last valid option below (or at) threshold, first valid option above threshold
+        pre = np.maximum.reduceat(np.where(valid & (delta <= threshold), positions, -1), chain_start)
+        post = np.minimum.reduceat(np.where(valid & (delta > threshold), positions, num_rows), chain_start)
+
+        found[:, n] = (pre >= 0) & (post < num_rows)
+
+        [delta_0, moneyness_0] = [delta[pre[found[:, n]]], moneyness_ratio[pre[found[:, n]]]]
+        [delta_1, moneyness_1] = [delta[post[found[:, n]]], moneyness_ratio[post[found[:, n]]]]
+
+        threshold_moneyness[found[:, n], n] = np.round(
+            (moneyness_1 * (threshold - delta_0) + moneyness_0 * (delta_1 - threshold)) / (delta_1 - delta_0), 8)
+
+    return [threshold_moneyness, found]
@@ -1,11 +1,17 @@
 from greeks import GreeksBase
+import numpy as np
 import pandas as pd
 
 
 class CalcGamma(GreeksBase):
-    def __init__(self):
+    def __init__(self, input_dict=None):
         super().__init__()
+        input_dict = input_dict or dict()
         self.name = "Gamma"
+        # Gamma peak parameters (none to only calculate full Gamma)
+        self.parameters = input_dict.get("parameters", ["gamma_peak_point", "gamma_peak_height", "gamma_peak_width"])
+        # Constant maturities to interpolate at (optional)
+        self.intervals = input_dict.get("intervals", self.intervals)
         self.cols_input = ["date", "expiration date", "years to exp", "tag",
                            "strike midpoint", "moneyness", "moneyness ratio", "adj moneyness", "Delta"]
         self.cols_output_full = ["date", "expiration date", "tag",
@@ -13,55 +19,209 @@ class CalcGamma(GreeksBase):
 
     def run(self, input_dict):
         """
-        TODO: Make function parallel at date level rather than year. Option spread size increased ~10x from 2005 to 2021
+        Calculate for all data dates of year, or only those of a work unit (see `date_work_units`).
+        Gamma is usually calculated together with Delta instead (see `CalcDelta`, `calc_from_delta`).
 
-        :param input_dict: {year_df, year}
-        :return: dict {name, year, full df, output_msg}
+        :param input_dict: {Delta full df, year, (dates)}
+        :return: dict {name, year, (param df), full df, output_msg}
         """
 
         # Unpack needed keys from Delta
         year_df = input_dict["full df"][self.cols_input]
         year = input_dict["year"]
 
-        # Housekeeping
-        full_gamma_list = []
+        # Work unit of data dates
+        if "dates" in input_dict.keys():
+            year_df = year_df[year_df["date"].isin(input_dict["dates"])]
+
+        # Sort each spread by strike, spreads one after another
+        year_df = year_df.sort_values(by=["date", "expiration date", "tag", "strike midpoint"], ignore_index=True)
+
+        spreads_df = year_df.drop_duplicates(subset=["date", "expiration date", "tag"])[
+            ["date", "expiration date", "years to exp", "tag"]].reset_index(drop=True)
+
+        return self.calc_from_delta(full_delta_df=year_df, chain_dict=self.chain_rows(year_df),
+                                    spreads_df=spreads_df, year=year)
+
+    def calc_from_delta(self, full_delta_df, chain_dict, spreads_df, year):
+        """
+        Gamma of all spreads from their Delta, in one pass over the sorted Delta table. Parameterize each
+        Gamma peak & interpolate parameters to set intervals.
+
+        :param full_delta_df: Delta, spreads one after another sorted by strike (see `CalcDelta.calc_full_delta`)
+                              (DataFrame)
+        :param chain_dict: {(date, exp date, tag): [start, end] rows of spread} (dict)
+        :param spreads_df: [date, expiration date, years to exp, tag] of spreads to parameterize (DataFrame)
+        :param year: year of data dates (int)
+        :return: dict {name, year, (param df), full df, output_msg}
+        """
 
         # Flush output messages if class object is reused
         self.output_msg = []
 
-        for date in list(set(year_df["date"])):
-            # date
-            self.date = date
-            df1 = year_df[year_df["date"] == date]
+        chain_start = np.array(sorted([start for [start, _] in chain_dict.values()]), dtype=np.int64)
+
+        # Gamma of all spreads, with spread of each row
+        [full_gamma_df, gamma_chain] = self.calc_full_gamma(full_delta_df=full_delta_df, chain_start=chain_start)
+
+        output_dict = {"name": self.name, "year": year}
+
+        if self.parameters:
+            # Gamma peak of every spread
+            [peak_values, found] = peak_parameters(moneyness_ratio=full_gamma_df["moneyness ratio"].values,
+                                                   gamma=full_gamma_df["Gamma"].values,
+                                                   chain_index=gamma_chain, num_chains=chain_start.shape[0])
+
+            spread_start = np.array([chain_dict.get(key, [-1, -1])[0] for key in
+                                     zip(spreads_df["date"], spreads_df["expiration date"],
+                                         spreads_df["tag"].astype(str))], dtype=np.int64)
+            spread_filter = spread_start >= 0
+            chain_index = np.searchsorted(chain_start, spread_start[spread_filter])
+
+            param_values = np.full([spreads_df.shape[0], peak_values.shape[1]], np.nan)
+            param_values[spread_filter] = peak_values[chain_index]
 
-            for exp_date in list(set(df1["expiration date"])):
-                # date + exp date
-                self.exp_date = exp_date
-                df2 = df1[df1["expiration date"] == exp_date]
+            spread_found = np.zeros(spreads_df.shape[0], dtype=bool)
+            spread_found[spread_filter] = found[chain_index]
 
-                for tag in ["call", "put"]:
-                    # date + exp date + tag
-                    self.tag = tag
-                    df3 = df2[df2["tag"] == tag].copy()
+            peak_cols = ["gamma_peak_point", "gamma_peak_height", "gamma_peak_width"]
+            spreads_df = spreads_df.assign(**{param: param_values[:, peak_cols.index(param)]
+                                              for param in self.parameters})
 
-                    df3["Gamma"] = ((df3["Delta"] - df3["Delta"].shift(periods=1)) /
-                                    -(df3["strike midpoint"] - df3["strike midpoint"].shift(periods=1))).round(6)
+            # Spreads where half maximum of peak could not be bracketed
+            date_msg_list = []
 
-                    for metric in ["strike midpoint", "moneyness", "moneyness ratio", "adj moneyness"]:
-                        df3[metric] = ((df3[metric] +
-                                        df3[metric].shift(periods=1)) / 2).round(6)
+            for [date, exp_date, tag] in spreads_df[["date", "expiration date", "tag"]][~spread_found].values:
+                date = pd.Timestamp(date)
+                date_msg_list.append([date, f"{self.name} - "
+                                            f"(data date: {date:%Y-%m-%d}, exp date: {exp_date:%Y-%m-%d}, "
+                                            f"tag: {tag}) - cannot interpolate peak width"])
 
-                    # Drop empty row from "shift" operation
-                    df3.dropna(inplace=True)
+            # Interpolate parameters to set intervals (1 month, 2 months, etc.), all data dates at once
+            [param_gamma_df, interval_msg_list] = self.interpolate_intervals(param_df=spreads_df,
+                                                                             parameters=self.parameters)
 
-                    full_gamma_list.append(df3[self.cols_output_full])
+            # Messages of each data date: peaks, then intervals
+            date_msg_list = sorted(date_msg_list + interval_msg_list, key=lambda x: x[0])
+            self.output_msg.extend([msg for [_, msg] in date_msg_list])
 
-        # Create parameter / full DataFrames
-        full_gamma_df = pd.concat(full_gamma_list)
+            param_gamma_df.sort_values(by=["date", "interval", "tag"], inplace=True, ignore_index=True)
+            output_dict["param df"] = param_gamma_df
 
         # Sort
-        full_gamma_df.sort_values(by=["date", "expiration date", "strike midpoint", "tag"], inplace=True,
-                                  ignore_index=True)
+        full_gamma_df = full_gamma_df[self.cols_output_full].sort_values(
+            by=["date", "expiration date", "strike midpoint", "tag"], ignore_index=True)
+
+        output_dict.update({"full df": full_gamma_df, "output_msg": self.output_msg})
+
+        return output_dict
+
+    def calc_full_gamma(self, full_delta_df, chain_start):
+        """
+        Gamma at midpoints of consecutive Delta strike midpoints, of all spreads at once.
+        Midpoints of moneyness columns are taken as well, the first row of each spread is dropped.
+
+        :param full_delta_df: Delta, spreads one after another sorted by strike (DataFrame)
+        :param chain_start: first row of each spread, ascending (np.array)
+        :return: [full_gamma_df: `cols_output_full` in Delta row order (DataFrame),
+                  spread (index of `chain_start`) of each row (np.array)]
+        """
+
+        num_rows = full_delta_df.shape[0]
+
+        # First row of each spread has no previous strike
+        is_first = np.zeros(num_rows, dtype=bool)
+        is_first[chain_start] = True
+
+        def previous(values):
+            prev_values = np.concatenate([[np.nan], values[:-1]])
+            prev_values[is_first] = np.nan
+            return prev_values
+
+        delta = full_delta_df["Delta"].values.astype(np.float64)
+        strike = full_delta_df["strike midpoint"].values.astype(np.float64)
+
+        df = full_delta_df[["date", "expiration date", "tag"]].copy()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df["Gamma"] = np.round((delta - previous(delta)) / -(strike - previous(strike)), 6)
+
+        for metric in ["strike midpoint", "moneyness", "moneyness ratio", "adj moneyness"]:
+            values = full_delta_df[metric].values.astype(np.float64)
+            df[metric] = np.round((values + previous(values)) / 2, 6)
+
+        chain_index = np.repeat(np.arange(chain_start.shape[0]), np.diff(np.append(chain_start, num_rows)))
+
+        # Drop empty row from "shift" (first strike of each spread), and incomplete rows
+        keep_filter = df.notna().all(axis=1).values
+
+        return [df[keep_filter].reset_index(drop=True), chain_index[keep_filter]]
+
+
+def peak_parameters(moneyness_ratio, gamma, chain_index, num_chains):
+    """
+    Parameterize the Gamma peak of many Gamma curves (chains) at once:
+        - peak point: moneyness ratio of max Gamma (first if tied)
+        - peak height: max Gamma
+        - peak width: full width at half maximum, moneyness ratio distance between the points closest to the peak
+                      (on each side) where Gamma falls to half of max Gamma, linearly interpolated
+
+    Only finite Gamma values are considered, chains without a positive max have no peak.
+
+    :param moneyness_ratio: moneyness ratios, chains one after another in strike order (np.array)
+    :param gamma: Gamma (np.array)
+    :param chain_index: chain of each row, ascending (np.array)
+    :param num_chains: number of chains (int)
+    :return: [[peak point, peak height, peak width] of shape [chains, 3],
+              found: half maximum bracketed on both sides of peak, of shape [chains]] (list of np.array)
+    """
+
+    # Housekeeping
+    peak_values = np.full([num_chains, 3], np.nan)
+    found = np.zeros(num_chains, dtype=bool)
+
+    finite_filter = np.isfinite(gamma)
+    [moneyness_ratio, gamma, chain_index] = [moneyness_ratio[finite_filter], gamma[finite_filter],
+                                             chain_index[finite_filter]]
+
+    if gamma.shape[0] == 0:
+        return [peak_values, found]
+
+    num_rows = gamma.shape[0]
+    positions = np.arange(num_rows)
+
+    # Chains with rows & their first row
+    [chains, chain_start] = np.unique(chain_index, return_index=True)
+    row_chain = np.searchsorted(chains, chain_index)
+
+    # Peak of each chain
+    height = np.maximum.reduceat(gamma, chain_start)
+    peak = np.minimum.reduceat(np.where(gamma == height[row_chain], positions, num_rows), chain_start)
+    has_peak = height > 0
+
+    # Closest point at or below half maximum before & after peak
+    below_half = gamma <= (height / 2)[row_chain]
+    before = np.maximum.reduceat(np.where(below_half & (positions < peak[row_chain]), positions, -1), chain_start)
+    after = np.minimum.reduceat(np.where(below_half & (positions > peak[row_chain]), positions, num_rows),
+                                chain_start)
+
+    chain_found = has_peak & (before >= 0) & (after < num_rows)
+
+    # Interpolate half maximum crossing between the point & its neighbour towards the peak
+    [before, after] = [before[chain_found], after[chain_found]]
+    half = height[chain_found] / 2
+
+    cross_before = moneyness_ratio[before] + ((half - gamma[before]) * (moneyness_ratio[before + 1] -
+                                                                       moneyness_ratio[before]) /
+                                              (gamma[before + 1] - gamma[before]))
+    cross_after = moneyness_ratio[after] + ((half - gamma[after]) * (moneyness_ratio[after - 1] -
+                                                                    moneyness_ratio[after]) /
+                                            (gamma[after - 1] - gamma[after]))
+
+    peak_values[chains[has_peak], 0] = np.round(moneyness_ratio[peak[has_peak]], 8)
+    peak_values[chains[has_peak], 1] = np.round(height[has_peak], 6)
+    peak_values[chains[chain_found], 2] = np.round(np.abs(cross_after - cross_before), 8)
+
+    found[chains[chain_found]] = True
 
-        return {"name": self.name, "year": year,
-                "full df": full_gamma_df, "output_msg": self.output_msg}
+    return [peak_values, found]
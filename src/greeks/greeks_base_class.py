@@ -14,60 +14,147 @@ class GreeksBase:
         self.years_to_exp = None
         self.tag = None
 
-    def interpolate_intervals(self, date_df, parameters, date):
+        # End of day prices & interest rates (Greeks that discount, see `get_interest_rate`)
+        self.price_calendar = None
+
+        # Constant maturities (years) parameters are interpolated at
+        self.intervals = [1 / 12, 1 / 6, 1 / 4, 1 / 2, 1]
+
+    @staticmethod
+    def chain_rows(df, chain_cols=("date", "expiration date", "tag")):
+        """
+        Rows of each option chain (spread) of a table sorted by chain.
+
+        :param df: options, chains one after another (DataFrame)
+        :param chain_cols: columns identifying a chain (list)
+        :return: chain_dict: {(date, exp date, tag): [start, end] rows of chain} (dict)
+        """
+
+        chain_cols = list(chain_cols)
+        chain_start = np.flatnonzero(df[chain_cols].ne(df[chain_cols].shift(periods=1)).any(axis=1).values)
+        chain_end = np.append(chain_start[1:], df.shape[0])
+
+        return {(date, exp_date, str(tag)): [start, end] for date, exp_date, tag, start, end in
+                zip(df[chain_cols[0]].iloc[chain_start], df[chain_cols[1]].iloc[chain_start],
+                    df[chain_cols[2]].iloc[chain_start], chain_start, chain_end)}
+
+    def interpolate_intervals(self, param_df, parameters, dates=None):
         """
-        Interpolate metrics at standardized intervals from expiration dates present.
-        Linear interpolation using two values closest to point of interest (x).
+        Interpolate metrics at standardized intervals (`self.intervals`) from expiration dates present,
+        for all data dates at once. Linear interpolation using two values closest to point of interest (x).
 
         f(n) = f(n_0) * ((n_1 - n)/(n_1 - n_0)) + f(n_1) * ((n - n_0)/(n_1 - n_0))
 
-        thresholds used:
+        Each [date, tag] is sorted by years to expiry once, n_0 & n_1 are found by counting expiries <= n.
+        Expiries with a missing parameter value are ignored. Default intervals:
         - 1 month (1/12 year)
         - 2 months (1/6)
         - 3 months (1/4)
         - 6 months (1/2)
         - 1 year (1)
+
+        :param param_df: parameters of each [date, expiration date, tag] (DataFrame)
+        :param parameters: parameter columns to interpolate (list)
+        :param dates: data dates to output, dates of `param_df` if None (list)
+        :return: [output_df: [date, interval, tag, parameters...] (DataFrame),
+                  date_msg_list: [[date, message], ...] in date order (list)]
         """
-        output_list = []
 
-        for param in parameters:
+        assert all(n in param_df.columns for n in ["date", "years to exp", "tag"] + parameters), "Missing columns!"
+
+        # Housekeeping
+        tags = ["call", "put"]
+        intervals = sorted(self.intervals)
+
+        if dates is None:
+            dates = param_df["date"]
+        dates = np.unique(np.asarray(dates, dtype="datetime64[ns]"))
+
+        # Output grid [date, interval, tag], sorted
+        [date_grid, interval_grid, tag_grid] = [n.ravel() for n in np.meshgrid(
+            np.arange(dates.shape[0]), np.arange(len(intervals)), np.arange(len(tags)), indexing="ij")]
 
-            assert all(n in date_df.columns for n in ["date", "years to exp", "tag", param]), "Missing columns!"
+        output_df = pd.DataFrame({"date": dates[date_grid],
+                                  "interval": np.round(np.array(intervals), 4)[interval_grid],
+                                  "tag": np.array(tags, dtype=object)[tag_grid]})
 
-            df1 = date_df[["date", "years to exp", "tag", param]].copy()
+        # Cannot interpolate: [date, parameter, tag, interval] indices
+        missing_list = []
 
-            df1.dropna(inplace=True)
+        for param_index, param in enumerate(parameters):
+            df = param_df[["date", "years to exp", "tag", param]].dropna()
+            df = df[df["tag"].isin(tags) & df["date"].isin(dates)]
 
-            for tag in ["call", "put"]:
+            # Group of each row: [date, tag], rows sorted by years to expiry within group
+            group = (np.searchsorted(dates, df["date"].values) * len(tags) +
+                     np.searchsorted(np.array(tags), df["tag"].astype(str).values))
+            order = np.lexsort((df["years to exp"].values, group))
+            [group, years, values] = [group[order], df["years to exp"].values[order], df[param].values[order]]
 
-                df2 = df1[df1["tag"] == tag]
+            # Rows of each group
+            group_count = np.bincount(group, minlength=dates.shape[0] * len(tags))
+            group_start = np.cumsum(group_count) - group_count
 
-                for n in [1 / 12, 1 / 6, 1 / 4, 1 / 2, 1]:
+            param_values = np.full([dates.shape[0], len(intervals), len(tags)], np.nan)
 
-                    n_0 = np.max(df2[df2["years to exp"] <= n]["years to exp"])
-                    n_1 = np.min(df2[df2["years to exp"] > n]["years to exp"])
+            for interval_index, n in enumerate(intervals):
+                # Number of expiries <= n in group. n_0 is the last of them, n_1 the next one
+                count_0 = np.bincount(group, weights=(years <= n), minlength=group_count.shape[0]).astype(np.int64)
+                found = (count_0 > 0) & (count_0 < group_count)
 
-                    if pd.isna([n_0, n_1]).any():
+                index_0 = (group_start + count_0 - 1)[found]
+                index_1 = (group_start + count_0)[found]
 
-                        self.output_msg.append(f"{self.name} - "
-                                               f"(date: {date}, tag: {tag}, target: {round(n, 6)} year) - "
-                                               f"cannot interpolate {param}")
+                [n_0, n_1] = [years[index_0], years[index_1]]
+                [param_0, param_1] = [values[index_0], values[index_1]]
 
-                        param_weighted = np.nan
-                    else:
-                        param_0 = float(df2[df2["years to exp"] == n_0][param].values)
-                        param_1 = float(df2[df2["years to exp"] == n_1][param].values)
+                interval_values = np.full(group_count.shape[0], np.nan)
+                interval_values[found] = np.round((param_0 * (n_1 - n) + param_1 * (n - n_0)) / (n_1 - n_0), 6)
+
+                param_values[:, interval_index, :] = interval_values.reshape(dates.shape[0], len(tags))
+
+                for group_index in np.flatnonzero(~found):
+                    missing_list.append([group_index // len(tags), param_index, group_index % len(tags),
+                                         interval_index])
+
+            output_df[param] = param_values.ravel()
+
+        # Parameter columns in alphabetical order
+        output_df = output_df[["date", "interval", "tag"] + sorted(parameters)]
+        output_df.columns.name = "parameter"
+
+        # Messages in date, parameter, tag, interval order
+        date_msg_list = []
+
+        for [date_index, param_index, tag_index, interval_index] in sorted(missing_list):
+            date = pd.Timestamp(dates[date_index])
+            date_msg_list.append([date, f"{self.name} - "
+                                        f"(date: {date:%Y-%m-%d}, tag: {tags[tag_index]}, "
+                                        f"target: {round(intervals[interval_index], 6)} year) - "
+                                        f"cannot interpolate {parameters[param_index]}"])
+
+        return [output_df, date_msg_list]
+
+    def get_interest_rate(self, dates, years_to_exp):
+        """
+        Interest rate of each [date, years to expiry], interpolated on the yield curve of the price calendar
+        (`self.price_calendar`, see `YieldCurve.rate`).
+
+        :param dates: data dates (np.array)
+        :param years_to_exp: years until expiry (np.array)
+        :return: interest rates (np.array)
+        """
 
-                        param_weighted = round((param_0 * (n_1 - n) + param_1 * (n - n_0)) / (n_1 - n_0), 6)
+        tenors = self.price_calendar.yield_curve.tenors
 
-                    # Add interpolated metric to list
-                    output_list.append([date, param, round(n, 4), tag, param_weighted])
+        if (years_to_exp >= tenors[-1]).any():
+            raise Exception(f"Unable to interpolate interest rate! Lower bound: {tenors[-1]} Upper bound: nan")
 
-        # Interpolated for all parameters
-        output_df = pd.DataFrame(output_list, columns=["date", "parameter", "interval", "tag", "value"])
+        interest_rate = self.price_calendar.interest_rate(dates, years_to_exp)
 
-        output_df = output_df.pivot(index=["date", "interval", "tag"],
-                                    columns="parameter",
-                                    values="value").reset_index(drop=False)
+        if np.isnan(interest_rate).any():
+            n = np.flatnonzero(np.isnan(interest_rate))[0]
+            raise Exception(f"Unable to find {round(years_to_exp[n], 6)} year interest rate around "
+                            f"{pd.Timestamp(dates[n]):%Y-%m-%d}!")
 
-        return output_df
+        return interest_rate
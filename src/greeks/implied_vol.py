@@ -0,0 +1,340 @@
+from greeks import GreeksBase
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+
+class CalcImpliedVol(GreeksBase):
+    def __init__(self, input_dict):
+        super().__init__()
+        self.name = "IV"
+        self.price_calendar = input_dict["price_calendar"]
+        # Smile parameters: IV at the money, slope & curvature vs. log moneyness
+        self.parameters = ["iv_atm", "iv_skew", "iv_curvature"]
+        # Constant maturities to interpolate at (optional)
+        self.intervals = input_dict.get("intervals", self.intervals)
+        # Business days per year of "years to exp", Theta is per business day
+        self.num_days_year = input_dict.get("num_days_year", 260)
+        # Solver settings (see `implied_volatility`)
+        self.solver_settings = input_dict.get("solver_settings", dict())
+        self.cols_input = ["date", "expiration date", "years to exp", "tag",
+                           "strike price", "ask price", "bid price", "date close",
+                           "date div", "exp date div"]
+        self.cols_output_full = ["date", "expiration date", "years to exp", "tag",
+                                 "strike price", "moneyness ratio", "log moneyness", "option price",
+                                 "iv", "Delta", "Gamma", "Vega", "Theta"]
+
+    def run(self, input_dict):
+        """
+        Black-Scholes implied volatility & analytic Greeks of every contract, for all data dates of year, or only
+        those of a work unit (see `date_work_units`). The smile of each [date, exp date, tag] spread is
+        parameterized & parameters are interpolated to set intervals.
+
+        :param input_dict: {year_df, year, (dates)}
+        :return: dict {name, year, param df, full df, output_msg}
+        """
+
+        # Unpack
+        year_df = input_dict["df"][self.cols_input]
+        year = input_dict["year"]
+
+        # Work unit of data dates
+        if "dates" in input_dict.keys():
+            year_df = year_df[year_df["date"].isin(input_dict["dates"])]
+
+        # Flush output messages if class object is reused
+        self.output_msg = []
+
+        # All data dates (interpolated even if all options expire on data date)
+        dates = year_df["date"]
+
+        # IV undefined if time till expiry is 0. Skip
+        year_df = year_df[year_df["date"] != year_df["expiration date"]]
+
+        # Interest rate of each [date, exp date]
+        exp_dates_df = year_df.drop_duplicates(subset=["date", "expiration date"])[
+            ["date", "expiration date", "years to exp"]].sort_values(by=["date", "expiration date"])
+
+        exp_dates_df["interest rate"] = self.get_interest_rate(dates=exp_dates_df["date"].values,
+                                                               years_to_exp=exp_dates_df["years to exp"].values)
+
+        # IV & Greeks of all contracts at once, spreads one after another sorted by strike
+        full_iv_df = self.calc_full_iv(year_df, exp_dates_df)
+        chain_dict = self.chain_rows(full_iv_df)
+        chain_start = np.array(sorted([start for [start, _] in chain_dict.values()]), dtype=np.int64)
+
+        # Smile of every spread with IV
+        [smile_values, found] = smile_parameters(log_moneyness=full_iv_df["log moneyness"].values,
+                                                 iv=full_iv_df["iv"].values, weights=full_iv_df["Vega"].values,
+                                                 chain_start=chain_start)
+
+        # All [date, exp date] call & put spreads, with years to expiry
+        spreads_df = exp_dates_df[["date", "expiration date", "years to exp"]].merge(
+            pd.DataFrame({"tag": ["call", "put"]}), how="cross")
+
+        spread_start = np.array([chain_dict.get(key, [-1, -1])[0] for key in
+                                 zip(spreads_df["date"], spreads_df["expiration date"], spreads_df["tag"])],
+                                dtype=np.int64)
+        spread_filter = spread_start >= 0
+        chain_index = np.searchsorted(chain_start, spread_start[spread_filter])
+
+        param_values = np.full([spreads_df.shape[0], len(self.parameters)], np.nan)
+        param_values[spread_filter] = smile_values[chain_index]
+
+        spread_found = np.zeros(spreads_df.shape[0], dtype=bool)
+        spread_found[spread_filter] = found[chain_index]
+
+        spreads_df = spreads_df.assign(**{param: param_values[:, n] for n, param in enumerate(self.parameters)})
+
+        # Spreads without enough contracts with IV (3 strikes)
+        date_msg_list = []
+
+        for [date, exp_date, tag] in spreads_df[["date", "expiration date", "tag"]][~spread_found].values:
+            date = pd.Timestamp(date)
+            date_msg_list.append([date, f"{self.name} - "
+                                        f"(data date: {date:%Y-%m-%d}, exp date: {exp_date:%Y-%m-%d}, tag: {tag}) - "
+                                        f"cannot fit smile"])
+
+        # Interpolate parameters to set intervals (1 month, 2 months, etc.), all data dates at once
+        [param_iv_df, interval_msg_list] = self.interpolate_intervals(param_df=spreads_df,
+                                                                      parameters=self.parameters,
+                                                                      dates=dates)
+
+        # Messages of each data date: spreads, then intervals
+        date_msg_list = sorted(date_msg_list + interval_msg_list, key=lambda x: x[0])
+        self.output_msg.extend([msg for [_, msg] in date_msg_list])
+
+        # Sort
+        param_iv_df.sort_values(by=["date", "interval", "tag"], inplace=True, ignore_index=True)
+        full_iv_df = full_iv_df[self.cols_output_full].sort_values(
+            by=["date", "expiration date", "strike price", "tag"], ignore_index=True)
+
+        return {"name": self.name, "year": year,
+                "param df": param_iv_df, "full df": full_iv_df, "output_msg": self.output_msg}
+
+    def calc_full_iv(self, year_df, exp_dates_df):
+        """
+        IV & Greeks of all contracts. Option price is the bid / ask midpoint (ask if no bid), spot is the closing
+        price adjusted for dividends as adjusted moneyness (see `CalcDelta`). Contracts without IV (price outside of
+        no-arbitrage bounds, or not converged) are dropped.
+
+        :param year_df: options, `cols_input` (DataFrame)
+        :param exp_dates_df: [date, expiration date, interest rate] (DataFrame)
+        :return: full_iv_df: `cols_output_full`, spreads one after another sorted by strike (DataFrame)
+        """
+
+        # Sort each spread by strike, spreads one after another
+        df = year_df.sort_values(by=["date", "expiration date", "tag", "strike price"], ignore_index=True)
+        df = df.merge(exp_dates_df[["date", "expiration date", "interest rate"]],
+                      on=["date", "expiration date"], how="left")
+
+        ask = df["ask price"].values.astype(np.float64)
+        bid = df["bid price"].values.astype(np.float64)
+        df["option price"] = np.where(bid > 0, (ask + bid) / 2, ask)
+
+        spot = (df["date close"] - df["date div"] + df["exp date div"]).values
+        strike = df["strike price"].values
+        years = df["years to exp"].values
+        rate = df["interest rate"].values
+        is_call = (df["tag"] == "call").values
+
+        [df["iv"], _] = implied_volatility(price=df["option price"].values, spot=spot, strike=strike, years=years,
+                                           rate=rate, is_call=is_call, **self.solver_settings)
+
+        greeks_dict = black_scholes(spot=spot, strike=strike, years=years, rate=rate, vol=df["iv"].values,
+                                    is_call=is_call, greeks=["Delta", "Gamma", "Vega", "Theta"])
+
+        for greek in ["Delta", "Gamma", "Vega"]:
+            df[greek] = np.round(greeks_dict[greek], 6)
+
+        # Theta per business day
+        df["Theta"] = np.round(greeks_dict["Theta"] / self.num_days_year, 6)
+
+        df["iv"] = np.round(df["iv"], 6)
+
+        df["moneyness ratio"] = (df["date close"] - df["strike price"]) / df["date close"]
+
+        # Put moneyness is reversed
+        put_filter = ~is_call
+        df.loc[put_filter, "moneyness ratio"] = -df.loc[put_filter, "moneyness ratio"]
+
+        # Log of strike to forward price
+        df["log moneyness"] = np.round(np.log(strike / (spot * np.exp(rate * years))), 8)
+
+        return df.loc[df["iv"].notna().values, self.cols_output_full].reset_index(drop=True)
+
+
+def black_scholes(spot, strike, years, rate, vol, is_call, greeks=()):
+    """
+    Black-Scholes price & analytic Greeks of European options, all contracts at once.
+    Greeks are per unit of spot (Delta, Gamma), per 1.0 of volatility (Vega) & per year (Theta).
+
+    :param spot: spot prices (np.array)
+    :param strike: strike prices (np.array)
+    :param years: years until expiry (np.array)
+    :param rate: continuous interest rates (np.array)
+    :param vol: volatilities (np.array)
+    :param is_call: call (True) or put (False) (np.array)
+    :param greeks: Greeks to calculate, of "Delta", "Gamma", "Vega", "Theta" (list)
+    :return: dict {price, Greeks...} (dict of np.array)
+    """
+
+    sqrt_years = np.sqrt(years)
+    discount = np.exp(-rate * years)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = (np.log(spot / strike) + (rate + vol ** 2 / 2) * years) / (vol * sqrt_years)
+    d2 = d1 - vol * sqrt_years
+
+    # Signed for calls (1) & puts (-1)
+    sign = np.where(is_call, 1.0, -1.0)
+
+    output_dict = {"price": sign * (spot * ndtr(sign * d1) - strike * discount * ndtr(sign * d2))}
+
+    density = np.exp(-d1 ** 2 / 2) / np.sqrt(2 * np.pi)
+
+    if "Delta" in greeks:
+        output_dict["Delta"] = ndtr(d1) - (~is_call)
+
+    if "Gamma" in greeks:
+        output_dict["Gamma"] = density / (spot * vol * sqrt_years)
+
+    if "Vega" in greeks:
+        output_dict["Vega"] = spot * density * sqrt_years
+
+    if "Theta" in greeks:
+        output_dict["Theta"] = (-(spot * density * vol) / (2 * sqrt_years) -
+                                sign * rate * strike * discount * ndtr(sign * d2))
+
+    return output_dict
+
+
+def implied_volatility(price, spot, strike, years, rate, is_call, vol_bounds=(1e-4, 10.0), price_tol=1e-6,
+                       max_iter=100):
+    """
+    Black-Scholes implied volatility of all contracts at once. Newton steps on vega, bracketed: every iteration
+    narrows each contract's [low, high] volatility bracket, a bisection step is taken instead where the Newton
+    step leaves the bracket. Contracts drop out of the iteration as they converge (array-level masks).
+
+    Starts from the inflection point of price vs. volatility (Manaster & Koehler), from which Newton steps
+    converge monotonically.
+
+    :param price: option prices (np.array)
+    :param spot: spot prices (np.array)
+    :param strike: strike prices (np.array)
+    :param years: years until expiry (np.array)
+    :param rate: continuous interest rates (np.array)
+    :param is_call: call (True) or put (False) (np.array)
+    :param vol_bounds: [min, max] volatility searched (list)
+    :param price_tol: converged if model price is within tolerance of option price (float)
+    :param max_iter: max iterations (int)
+    :return: [volatilities, NaN if not found (np.array), converged (np.array)] (list)
+    """
+
+    # Housekeeping
+    [price, spot, strike, years, rate] = [np.asarray(n, dtype=np.float64) for n in [price, spot, strike, years, rate]]
+    is_call = np.asarray(is_call, dtype=bool)
+    num_rows = price.shape[0]
+
+    # No-arbitrage bounds of price (volatility 0 & infinite)
+    discount = np.exp(-rate * years)
+    lower = np.where(is_call, np.maximum(spot - strike * discount, 0), np.maximum(strike * discount - spot, 0))
+    upper = np.where(is_call, spot, strike * discount)
+
+    with np.errstate(invalid="ignore"):
+        active = (price > lower) & (price < upper) & (years > 0) & (spot > 0) & (strike > 0)
+
+    low = np.full(num_rows, float(vol_bounds[0]))
+    high = np.full(num_rows, float(vol_bounds[1]))
+
+    vol = np.full(num_rows, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol[active] = np.sqrt(2 * np.abs(np.log(spot[active] / strike[active]) + rate[active] * years[active]) /
+                              years[active])
+    vol[active] = np.clip(vol[active], low[active], high[active])
+
+    converged = np.zeros(num_rows, dtype=bool)
+
+    for _ in range(max_iter):
+        rows = np.flatnonzero(active)
+
+        if rows.shape[0] == 0:
+            break
+
+        bs_dict = black_scholes(spot=spot[rows], strike=strike[rows], years=years[rows], rate=rate[rows],
+                                vol=vol[rows], is_call=is_call[rows], greeks=["Vega"])
+        diff = bs_dict["price"] - price[rows]
+
+        # Price increases with volatility
+        high[rows] = np.where(diff > 0, vol[rows], high[rows])
+        low[rows] = np.where(diff <= 0, vol[rows], low[rows])
+
+        done = np.abs(diff) < price_tol
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = vol[rows] - diff / bs_dict["Vega"]
+
+        in_bracket = np.isfinite(newton) & (newton > low[rows]) & (newton < high[rows])
+
+        vol[rows] = np.where(done, vol[rows], np.where(in_bracket, newton, (low[rows] + high[rows]) / 2))
+
+        converged[rows[done]] = True
+        active[rows[done]] = False
+
+    vol[~converged] = np.nan
+
+    return [vol, converged]
+
+
+def smile_parameters(log_moneyness, iv, weights, chain_start):
+    """
+    Quadratic smile of many spreads (chains) at once, weighted least squares of IV vs. log moneyness (k):
+
+    iv(k) = iv_atm + iv_skew * k + iv_curvature * k^2
+
+    Normal equations of all chains are summed in one pass & solved as a batch.
+
+    :param log_moneyness: log of strike to forward price, chains one after another sorted by strike (np.array)
+    :param iv: implied volatilities (np.array)
+    :param weights: sample weights, e.g. Vega (np.array)
+    :param chain_start: first row of each chain, ascending (np.array)
+    :return: [[iv_atm, iv_skew, iv_curvature] of shape [chains, 3],
+              found: chain has 3 strikes with weight (np.array)] (list of np.array)
+    """
+
+    # Housekeeping
+    num_chains = chain_start.shape[0]
+    smile_values = np.full([num_chains, 3], np.nan)
+    found = np.zeros(num_chains, dtype=bool)
+
+    if log_moneyness.shape[0] == 0:
+        return [smile_values, found]
+
+    is_weighted = weights > 0
+
+    # Distinct strikes (with weight) of each chain
+    is_first = np.zeros(log_moneyness.shape[0], dtype=bool)
+    is_first[chain_start] = True
+    is_new = is_first | (log_moneyness != np.concatenate([[np.nan], log_moneyness[:-1]]))
+
+    weighted_strikes = np.add.reduceat((is_new & is_weighted).astype(np.int64), chain_start)
+    found = weighted_strikes >= 3
+
+    # Weighted sums of k^0..k^4 & iv * k^0..k^2
+    weights = np.where(is_weighted, weights, 0)
+    powers = [np.ones_like(log_moneyness), log_moneyness, log_moneyness ** 2, log_moneyness ** 3,
+              log_moneyness ** 4]
+    k_sums = np.stack([np.add.reduceat(weights * n, chain_start) for n in powers], axis=1)
+    iv_sums = np.stack([np.add.reduceat(weights * iv * n, chain_start) for n in powers[:3]], axis=1)
+
+    # Normal equations [chains, 3, 3] @ coefficients = [chains, 3]
+    normal_matrix = k_sums[:, np.add.outer(np.arange(3), np.arange(3))]
+
+    with np.errstate(invalid="ignore"):
+        found = found & (np.linalg.cond(normal_matrix) < 1 / np.finfo(np.float64).eps)
+
+    if found.any():
+        coefficients = np.linalg.solve(normal_matrix[found], iv_sums[found][:, :, np.newaxis])[:, :, 0]
+        smile_values[found] = np.round(coefficients, 6)
+
+    return [smile_values, found]
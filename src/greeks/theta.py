@@ -0,0 +1,145 @@
+from greeks import GreeksBase, lag_join, unit_options
+import numpy as np
+import pandas as pd
+
+
+class CalcTheta(GreeksBase):
+    def __init__(self, input_dict=None):
+        super().__init__()
+        input_dict = input_dict or dict()
+        self.name = "Theta"
+        self.parameters = ["theta_atm", "theta_atm_ratio"]
+        # Constant maturities to interpolate at (optional)
+        self.intervals = input_dict.get("intervals", self.intervals)
+        self.cols_input = ["date", "expiration date", "years to exp", "tag",
+                           "strike price", "ask price", "date close"]
+        self.cols_output_full = ["date", "expiration date", "years to exp", "tag",
+                                 "strike price", "moneyness ratio", "Theta"]
+
+    def run(self, input_dict):
+        """
+        Estimate Theta of every contract from consecutive data dates (snapshots): change in ask price of the
+        contract until the next data date, per business day. The change in underlying price is not removed.
+
+        Calculate for all data dates of year, or only those of a work unit (see `date_work_units`). The last data
+        date is paired with the first data date of next year (if given).
+
+        :param input_dict: {df, year, (next df), (dates)}
+        :return: dict {name, year, param df, full df, output_msg}
+        """
+
+        # Unpack
+        year = input_dict["year"]
+        next_year_df = input_dict.get("next df")
+
+        options_df = unit_options(year_df=input_dict["df"][self.cols_input],
+                                  next_year_df=None if next_year_df is None else next_year_df[self.cols_input],
+                                  dates=input_dict.get("dates"))
+
+        # Flush output messages if class object is reused
+        self.output_msg = []
+
+        # Ask price of every contract on next data date, all data dates at once
+        full_theta_df = lag_join(options_df, lags=[1], how="inner", latter_cols=["ask price"])
+
+        full_theta_df = self.calc_full_theta(full_theta_df)
+
+        # Sort each spread by moneyness ratio, spreads one after another
+        full_theta_df.sort_values(by=["date", "expiration date", "tag", "moneyness ratio"], inplace=True,
+                                  ignore_index=True)
+        chain_dict = self.chain_rows(full_theta_df)
+
+        # All [date, exp date, tag] spreads with Theta, with years to expiry
+        spreads_df = full_theta_df.drop_duplicates(subset=["date", "expiration date", "tag"])[
+            ["date", "expiration date", "years to exp", "tag"]].reset_index(drop=True)
+
+        # Theta at the money, of all spreads at once
+        chain_start = np.array(sorted([start for [start, _] in chain_dict.values()]), dtype=np.int64)
+        [atm_theta, found] = atm_values(moneyness_ratio=full_theta_df["moneyness ratio"].values,
+                                        values=full_theta_df["Theta"].values, chain_start=chain_start)
+
+        atm_close = full_theta_df["date close"].values[chain_start]
+
+        spreads_df = spreads_df.assign(**{"theta_atm": atm_theta,
+                                          "theta_atm_ratio": np.round(atm_theta / atm_close, 8)})
+
+        # Spreads where at the money could not be bracketed
+        date_msg_list = []
+
+        for [date, exp_date, tag] in spreads_df[["date", "expiration date", "tag"]][~found].values:
+            date = pd.Timestamp(date)
+            date_msg_list.append([date, f"{self.name} - "
+                                        f"(data date: {date:%Y-%m-%d}, exp date: {exp_date:%Y-%m-%d}, tag: {tag}) - "
+                                        f"cannot interpolate at the money"])
+
+        # Interpolate parameters to set intervals (1 month, 2 months, etc.), all data dates at once
+        [param_theta_df, interval_msg_list] = self.interpolate_intervals(param_df=spreads_df,
+                                                                         parameters=self.parameters)
+
+        # Messages of each data date: spreads, then intervals
+        date_msg_list = sorted(date_msg_list + interval_msg_list, key=lambda x: x[0])
+        self.output_msg.extend([msg for [_, msg] in date_msg_list])
+
+        # Sort
+        param_theta_df.sort_values(by=["date", "interval", "tag"], inplace=True, ignore_index=True)
+        full_theta_df = full_theta_df[self.cols_output_full].sort_values(
+            by=["date", "expiration date", "strike price", "tag"], ignore_index=True)
+
+        return {"name": self.name, "year": year,
+                "param df": param_theta_df, "full df": full_theta_df, "output_msg": self.output_msg}
+
+    def calc_full_theta(self, lag_df):
+        """
+        :param lag_df: options with ask price of next data date (see `lag_join`) (DataFrame)
+        :return: `lag_df` with Theta & moneyness ratio columns (DataFrame)
+        """
+
+        # Business days until next data date
+        num_days = np.busday_count(lag_df["date"].values.astype("datetime64[D]"),
+                                   lag_df["latter date"].values.astype("datetime64[D]"))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lag_df["Theta"] = np.round((lag_df["latter ask price"].values - lag_df["ask price"].values) /
+                                       num_days, 6)
+
+        lag_df["moneyness ratio"] = (lag_df["date close"] - lag_df["strike price"]) / lag_df["date close"]
+
+        # Put moneyness is reversed
+        put_filter = (lag_df["tag"] == "put").values
+        lag_df.loc[put_filter, "moneyness ratio"] = -lag_df.loc[put_filter, "moneyness ratio"]
+
+        # Next data date on a weekend / holiday only
+        return lag_df[num_days > 0].reset_index(drop=True)
+
+
+def atm_values(moneyness_ratio, values, chain_start):
+    """
+    Linearly interpolate values at the money (moneyness ratio 0), for many chains at once. Bracketing options are
+    the max moneyness ratio option <= 0 & the min moneyness ratio option > 0 of each chain.
+
+    :param moneyness_ratio: moneyness ratios, chains one after another, sorted within chain (np.array)
+    :param values: values to interpolate, e.g. Theta (np.array)
+    :param chain_start: first row of each chain, ascending (np.array)
+    :return: [values at the money, found: bracketing options exist] of shape [chains] (list of np.array)
+    """
+
+    # Housekeeping
+    num_rows = moneyness_ratio.shape[0]
+    atm = np.full(chain_start.shape[0], np.nan)
+
+    if num_rows == 0:
+        return [atm, np.zeros(chain_start.shape[0], dtype=bool)]
+
+    positions = np.arange(num_rows)
+
+    pre = np.maximum.reduceat(np.where(moneyness_ratio <= 0, positions, -1), chain_start)
+    post = np.minimum.reduceat(np.where(moneyness_ratio > 0, positions, num_rows), chain_start)
+
+    found = (pre >= 0) & (post < num_rows)
+
+    [ratio_0, value_0] = [moneyness_ratio[pre[found]], values[pre[found]]]
+    [ratio_1, value_1] = [moneyness_ratio[post[found]], values[post[found]]]
+
+    atm[found] = np.round((value_0 * ratio_1 - value_1 * ratio_0) / (ratio_1 - ratio_0), 6)
+
+    return [atm, found]
@@ -7,8 +7,10 @@ class CalcVix(GreeksBase):
     def __init__(self, input_dict):
         super().__init__()
         self.name = "VIX"
-        self.rates_dict = input_dict["rates_dict"]
+        self.price_calendar = input_dict["price_calendar"]
         self.parameters = ["vix"]
+        # Constant maturities to interpolate at (optional)
+        self.intervals = input_dict.get("intervals", self.intervals)
         self.cols_input = ["date", "expiration date", "years to exp", "tag",
                            "strike price", "ask price", "date close"]
         self.cols_output_full = ["date", "expiration date", "tag",
@@ -16,9 +18,9 @@ class CalcVix(GreeksBase):
 
     def run(self, input_dict):
         """
-        TODO: Make function parallel at date level rather than year. Option spread size increased ~10x from 2005 to 2021
+        Calculate for all data dates of year, or only those of a work unit (see `date_work_units`).
 
-        :param input_dict: {year_df, year}
+        :param input_dict: {year_df, year, (dates)}
         :return: dict {name, year, param df, full df, output_msg}
         """
 
@@ -26,145 +28,130 @@ class CalcVix(GreeksBase):
         year_df = input_dict["df"][self.cols_input]
         year = input_dict["year"]
 
-        # Housekeeping
-        full_vix_list = []
-        param_vix_list = []
+        # Work unit of data dates
+        if "dates" in input_dict.keys():
+            year_df = year_df[year_df["date"].isin(input_dict["dates"])]
 
         # Flush output messages if class object is reused
         self.output_msg = []
 
-        for date in list(set(year_df["date"])):
-            # date
-            self.date = date
-            df1 = year_df[year_df["date"] == date]
-            self.date_close = float(np.unique(df1["date close"]))
-            # Housekeeping
-            date_param_list = []
+        # Sanity check. One closing price per data date
+        assert (year_df.groupby("date")["date close"].nunique(dropna=False) <= 1).all(), \
+            "Multiple closing prices for a data date!"
 
-            for exp_date in list(set(df1["expiration date"])):
-                # VIX undefined if time till expiry is 0. Skip
-                if date == exp_date:
-                    continue
+        # All data dates (interpolated even if all options expire on data date)
+        dates = year_df["date"]
 
-                # date + exp date
-                self.exp_date = exp_date
-                df2 = df1[df1["expiration date"] == exp_date]
-                self.years_to_exp = float(np.unique(df2["years to exp"]))
+        # VIX undefined if time till expiry is 0. Skip
+        year_df = year_df[year_df["date"] != year_df["expiration date"]]
 
-                exp_interest_rate = self.get_interest_rate()
+        # Interest rate of each [date, exp date]
+        exp_dates_df = year_df.drop_duplicates(subset=["date", "expiration date"])[
+            ["date", "expiration date", "years to exp"]].sort_values(by=["date", "expiration date"])
 
-                for tag in ["call", "put"]:
-                    # date + exp date + tag
-                    self.tag = tag
-                    df3 = df2[df2["tag"] == tag].copy()
+        exp_dates_df["interest rate"] = self.get_interest_rate(dates=exp_dates_df["date"].values,
+                                                               years_to_exp=exp_dates_df["years to exp"].values)
 
-                    df3["moneyness"] = df3["date close"] - df3["strike price"]
+        # VIX contributions of all [date, exp date, tag] option spreads
+        [full_vix_df, vix_sum_dict] = self.calc_full_vix(year_df, exp_dates_df)
 
-                    if self.tag == "put":
-                        df3["moneyness"] = -df3["moneyness"]
+        # Sum of all VIX components to get final VIX value (0 if spread has no contributions)
+        spreads_df = exp_dates_df.merge(pd.DataFrame({"tag": ["call", "put"]}), how="cross")
 
-                    # Get min ITM strike
-                    min_itm = np.min(df3[df3["moneyness"] >= 0]["moneyness"])
+        param_list = [[date, exp_date, years_to_exp, tag,
+                       vix_sum_dict.get((date, exp_date, tag), 0.0) / years_to_exp]
+                      for date, exp_date, years_to_exp, tag in
+                      zip(spreads_df["date"], spreads_df["expiration date"], spreads_df["years to exp"],
+                          spreads_df["tag"])]
 
-                    # Get all OTM & the smallest ITM option
-                    df4 = df3[df3["moneyness"] <= min_itm].copy()
+        # All VIX params of year
+        param_df = pd.DataFrame(param_list, columns=["date", "expiration date", "years to exp", "tag", "vix"])
 
-                    # Set upper bound of ITM strike price to ATM (closing price). Partial contribution
-                    df4.loc[(df4["moneyness"] == min_itm), "strike price"] = self.date_close
+        # Interpolate VIX at set intervals (1 month, 2 months, etc.), all data dates at once
+        [param_vix_df, date_msg_list] = self.interpolate_intervals(param_df=param_df,
+                                                                   parameters=self.parameters,
+                                                                   dates=dates)
+        self.output_msg.extend([msg for [_, msg] in date_msg_list])
 
-                    df4["delta strike"] = df4["strike price"] - df4["strike price"].shift(periods=1)
+        # Sort
+        param_vix_df.sort_values(by=["date", "interval", "tag"], inplace=True, ignore_index=True)
+        full_vix_df = full_vix_df.sort_values(by=["date", "expiration date", "strike midpoint", "tag"],
+                                              ignore_index=True)
 
-                    df4["ask midpoint"] = (df4["ask price"] + df4["ask price"].shift(periods=1)) / 2
+        return {"name": self.name, "year": year,
+                "param df": param_vix_df, "full df": full_vix_df, "output_msg": self.output_msg}
 
-                    df4["vix"] = ((df4["delta strike"] * df4["ask midpoint"] *
-                                   np.exp(exp_interest_rate * self.years_to_exp)) / self.date_close ** 2)
+    def calc_full_vix(self, year_df, exp_dates_df):
+        """
+        VIX contributions of all [date, exp date, tag] option spreads, as grouped array operations over the year.
+        Each spread's strip is all OTM options & the smallest ITM option, whose strike is set to the closing
+        price (partial contribution). Contributions are taken between consecutive strikes of a strip.
+
+        :param year_df: options, `cols_input` (DataFrame)
+        :param exp_dates_df: [date, expiration date, interest rate] (DataFrame)
+        :return: [full_vix_df: `cols_output_full` (DataFrame),
+                  vix_sum_dict: {(date, exp date, tag): sum of VIX contributions} (dict)]
+        """
 
-                    # Only for full df
-                    df4["strike midpoint"] = (df4["strike price"] + df4["strike price"].shift(periods=1)) / 2
+        # Sort each spread by strike, spreads one after another
+        chain_cols = ["date", "expiration date", "tag"]
+        df = year_df.sort_values(by=chain_cols + ["strike price"], ignore_index=True)
+        df = df.merge(exp_dates_df[["date", "expiration date", "interest rate"]],
+                      on=["date", "expiration date"], how="left")
 
-                    # Drop empty row from "shift" operation
-                    df4.dropna(inplace=True)
+        df["moneyness"] = df["date close"] - df["strike price"]
 
-                    full_vix_list.append(df4[self.cols_output_full])
+        put_filter = (df["tag"] == "put").values
+        df.loc[put_filter, "moneyness"] = -df.loc[put_filter, "moneyness"]
 
-                    # Sum of all VIX components to get final VIX value
-                    vix_sum = np.sum(df4["vix"].dropna()) / self.years_to_exp
+        # Get min ITM moneyness of each spread
+        chain_start = np.flatnonzero(df[chain_cols].ne(df[chain_cols].shift(periods=1)).any(axis=1).values)
+        chain_id = np.repeat(np.arange(chain_start.shape[0]), np.diff(np.append(chain_start, df.shape[0])))
 
-                    date_param_list.append([self.date, self.exp_date, self.years_to_exp, self.tag, vix_sum])
+        moneyness = df["moneyness"].values
+        min_itm = np.array([])
+        if df.shape[0] > 0:
+            min_itm = np.minimum.reduceat(np.where(moneyness >= 0, moneyness, np.inf), chain_start)
+            min_itm[np.isinf(min_itm)] = np.nan
 
-            # All VIX params for data date
-            date_df = pd.DataFrame(date_param_list,
-                                   columns=["date", "expiration date", "years to exp", "tag", "vix"])
+        # Get all OTM & the smallest ITM option
+        strip_filter = moneyness <= min_itm[chain_id]
+        df = df[strip_filter].reset_index(drop=True)
 
-            # Interpolate VIX at set intervals (1 month, 2 months, etc.)
-            date_vix_df = self.interpolate_intervals(date_df=date_df,
-                                                     parameters=self.parameters,
-                                                     date=self.date)
+        # Set upper bound of ITM strike price to ATM (closing price). Partial contribution
+        df.loc[(df["moneyness"] == min_itm[chain_id][strip_filter]).values, "strike price"] = df["date close"]
 
-            param_vix_list.append(date_vix_df)
+        # Previous strike of same strip, NaN for first strike
+        strip_start = df[chain_cols].ne(df[chain_cols].shift(periods=1)).any(axis=1).values
 
-        # Create parameter / full DataFrames
-        param_vix_df = pd.concat(param_vix_list)
-        full_vix_df = pd.concat(full_vix_list)
+        strike = df["strike price"].values
+        ask = df["ask price"].values.astype(np.float64)
 
-        # Sort
-        param_vix_df.sort_values(by=["date", "interval", "tag"], inplace=True, ignore_index=True)
-        full_vix_df.sort_values(by=["date", "expiration date", "strike midpoint", "tag"],
-                                inplace=True, ignore_index=True)
+        prev_strike = np.concatenate([[np.nan], strike[:-1]])
+        prev_ask = np.concatenate([[np.nan], ask[:-1]])
+        prev_strike[strip_start] = np.nan
+        prev_ask[strip_start] = np.nan
 
-        return {"name": self.name, "year": year,
-                "param df": param_vix_df, "full df": full_vix_df, "output_msg": self.output_msg}
+        df["delta strike"] = strike - prev_strike
 
-    def get_interest_rate(self):
-        """
-        If the interest rate on dates t_0 and t_1 are f(t_0) and f(t_1), respectively.
-        The linear interpolation of interest rate on date t is:
+        df["ask midpoint"] = (ask + prev_ask) / 2
 
-        f(t) = f(t_0) * ((t_1 - t)/(t_1 - t_0)) + f(t_1) * ((t - t_0)/(t_1 - t_0))
-        """
-        rate_keys = list(self.rates_dict.keys())
-        # For exp dates that expire within 1 month (a.k.a. no lower bound)
-        rate_keys.append(0)
-
-        t0 = np.max([n for n in rate_keys if n <= self.years_to_exp])
-        t1 = np.min([n for n in rate_keys if n > self.years_to_exp])
-
-        if pd.isna([t0, t1]).any():
-            raise Exception(f"Unable to interpolate interest rate! Lower bound: {t0} Upper bound: {t1}")
-
-        # Housekeeping
-        interest_rate = 0
-
-        for t in [t0, t1]:
-            if t != 0:
-                # Interest rate DataFrame of time period chosen
-                df = self.rates_dict[t]
-                dates = list(df["date"])
-
-                # If unable to find rate for data date, interpolate
-                if self.date not in dates:
-                    # Get dates before and after data date
-                    date_0 = self.date
-                    date_1 = self.date
-
-                    while date_0 not in dates:
-                        date_0 = pd.to_datetime(np.busday_offset(date_0, -1)).date()
-
-                    while date_1 not in dates:
-                        date_1 = pd.to_datetime(np.busday_offset(date_1, 1)).date()
-
-                    rate_t = (float(df[df["date"] == date_0]["continuous rate"]) +
-                              float(df[df["date"] == date_1]["continuous rate"])) / 2
-                else:
-                    rate_t = float(df[df["date"] == self.date]["continuous rate"])
-            # If lower bound is 0
-            else:
-                rate_t = 0
-
-            # Add component contribution to total
-            if t == t0:
-                interest_rate = interest_rate + rate_t * ((t1 - self.years_to_exp) / (t1 - t0))
-            elif t == t1:
-                interest_rate = interest_rate + rate_t * ((self.years_to_exp - t0) / (t1 - t0))
-
-        return interest_rate
+        df["vix"] = ((df["delta strike"] * df["ask midpoint"] *
+                      np.exp(df["interest rate"] * df["years to exp"])) / df["date close"].to_numpy(dtype=float) ** 2)
+
+        # Only for full df
+        df["strike midpoint"] = (strike + prev_strike) / 2
+
+        # Drop empty row from "shift" operation
+        df = df[df.notna().all(axis=1).values].reset_index(drop=True)
+
+        # Sum of VIX contributions of each spread
+        chain_start = np.flatnonzero(df[chain_cols].ne(df[chain_cols].shift(periods=1)).any(axis=1).values)
+        chain_end = np.append(chain_start[1:], df.shape[0])
+        vix = df["vix"].values
+
+        vix_sum_dict = {(date, exp_date, str(tag)): np.sum(vix[start:end]) for date, exp_date, tag, start, end in
+                        zip(df["date"].iloc[chain_start], df["expiration date"].iloc[chain_start],
+                            df["tag"].iloc[chain_start], chain_start, chain_end)}
+
+        return [df[self.cols_output_full], vix_sum_dict]
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+from storage import TableHandle, attach_table
+
+# Sort order of reassembled year outputs (same as `run` of each Greek, strike columns of the Greek only)
+sort_columns = {"param df": ["date", "interval", "tag"],
+                "full df": ["date", "expiration date", "strike midpoint", "strike price", "tag"]}
+
+
+def date_work_units(input_list, num_units):
+    """
+    Split year options into work units of consecutive data dates, batched by row count (the cost of a date
+    is proportional to the size of its option spread). Each unit holds about `total rows / num_units` rows,
+    units are returned largest first so the pool starts them early.
+
+    :param input_list: [{df (DataFrame or TableHandle), year}, ...] (list)
+    :param num_units: number of work units to aim for, e.g. a few per worker (int)
+    :return: [{df, year, dates (np.array), rows}, ...] (list)
+    """
+
+    # Row count of every data date, per year
+    count_dict = dict()
+    for n in input_list:
+        year_df = attach_table(n["df"]) if isinstance(n["df"], TableHandle) else n["df"]
+        count_dict[n["year"]] = np.unique(year_df["date"].values, return_counts=True)
+
+    target_rows = max(sum([np.sum(counts) for [_, counts] in count_dict.values()]) / max(num_units, 1), 1)
+
+    output_list = []
+
+    for n in input_list:
+        [dates, counts] = count_dict[n["year"]]
+
+        # Unit of each date, based on rows before it
+        unit_index = ((np.cumsum(counts) - counts) // target_rows).astype(int)
+
+        for i in np.unique(unit_index):
+            output_list.append({"df": n["df"], "year": n["year"], "dates": dates[unit_index == i],
+                                "rows": int(np.sum(counts[unit_index == i]))})
+
+    return sorted(output_list, key=lambda x: -x["rows"])
+
+
+def unit_options(year_df, next_year_df=None, dates=None):
+    """
+    Options of work unit dates & the data date following them (first date of next year after last date of year).
+    A slice of the table (not copied), unless options of next year are needed.
+
+    :param year_df: options of year, sorted by "date" (DataFrame)
+    :param next_year_df: options of next year, sorted by "date" (DataFrame)
+    :param dates: data dates of work unit, all dates if None (np.array)
+    :return: options sorted by "date" (DataFrame)
+    """
+
+    # Sanity check
+    assert year_df["date"].is_monotonic_increasing, "Options must be sorted by date!"
+
+    # Rows of every data date [start, end)
+    [year_dates, date_start] = np.unique(year_df["date"].values, return_index=True)
+    date_end = np.append(date_start[1:], year_df.shape[0])
+
+    selected = np.arange(year_dates.shape[0]) if dates is None else np.flatnonzero(np.isin(year_dates, dates))
+
+    if selected.shape[0] == 0:
+        return year_df.iloc[:0]
+
+    [first, last] = [selected[0], selected[-1]]
+
+    if last + 1 < year_dates.shape[0]:
+        return year_df.iloc[date_start[first]:date_end[last + 1]]
+
+    # If next year is available
+    elif (next_year_df is not None) and (next_year_df.shape[0] > 0):
+        # Get first date of next year
+        date_1 = next_year_df["date"].values[0]
+
+        return pd.concat([year_df.iloc[date_start[first]:],
+                          next_year_df.iloc[:np.searchsorted(next_year_df["date"].values, date_1, side="right")]],
+                         ignore_index=True)
+
+    # If no next year, last date is not paired
+    else:
+        return year_df.iloc[date_start[first]:]
+
+
+def combine_work_units(output_list):
+    """
+    Reassemble outputs of date work units into year outputs.
+
+    :param output_list: [{name, year, param df, full df, output_msg}, ...] (list)
+    :return: [{name, year, param df, full df, output_msg}, ...] one per year, sorted by year (list)
+    """
+
+    year_dict = dict()
+
+    for n in output_list:
+        year_dict.setdefault(n["year"], []).append(n)
+
+    combined_list = []
+
+    for year in sorted(year_dict.keys()):
+        unit_list = [{key: attach_table(value) if isinstance(value, TableHandle) else value
+                      for key, value in n.items()} for n in year_dict[year]]
+
+        # Units in data date order (output messages are logged in date order)
+        unit_list.sort(key=lambda x: x["full df"]["date"].min() if x["full df"].shape[0] > 0 else pd.Timestamp.max)
+
+        combined_dict = {"name": unit_list[0]["name"], "year": year}
+
+        for key, sort_cols in sort_columns.items():
+            if key in unit_list[0].keys():
+                combined_df = pd.concat([n[key] for n in unit_list])
+                combined_dict[key] = combined_df.sort_values(by=[n for n in sort_cols if n in combined_df.columns],
+                                                             ignore_index=True)
+
+        combined_dict["output_msg"] = [msg for n in unit_list for msg in n["output_msg"]]
+
+        combined_list.append(combined_dict)
+
+    return combined_list
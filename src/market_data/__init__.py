@@ -0,0 +1,2 @@
+from .price_calendar import PriceCalendar, read_treasury_yields
+from .yield_curve import YieldCurve, fill_rates
@@ -0,0 +1,193 @@
+import numpy as np
+import os
+import pandas as pd
+from .yield_curve import YieldCurve, fill_rates
+
+# Treasury yield files and their tenor (years)
+treasury_tenors = {"1_Month": round(1 / 12, 8),
+                   "3_Month": 1 / 4,
+                   "6_Month": 1 / 2,
+                   "1_Year": 1,
+                   "2_Year": 2,
+                   "3_Year": 3,
+                   "5_Year": 5}
+
+
+def read_treasury_yields(interest_rate_path):
+    """
+    Read treasury yield files of known tenors.
+
+    :param interest_rate_path: path where treasury yield files are stored (string)
+    :return: rates_dict: {tenor (years): [date, money market yield, continuous rate] (DataFrame)} (dict)
+    """
+
+    rates_dict = dict()
+
+    for filename in next(os.walk(interest_rate_path))[2]:
+        if filename.split(".")[-1] == "csv":
+
+            filename_short = filename.split(".")[0]
+
+            if filename_short not in treasury_tenors.keys():
+                continue
+
+            rate_df = pd.read_csv(os.path.join(interest_rate_path, filename))
+
+            # Convert columns to correct format
+            rate_df["date"] = pd.to_datetime(rate_df["date"]).dt.date
+
+            rates_dict[treasury_tenors[filename_short]] = rate_df
+
+    return rates_dict
+
+
+class PriceCalendar:
+    def __init__(self, hist_closing_df=None, dividends_df=None, rates_dict=None):
+        """
+        Date indexed lookups of end of day prices, priced-in dividends and treasury yields. Built once,
+        every lookup is a hash (scalar) or vectorized (array of dates) join instead of a DataFrame filter.
+
+        Dates can be `datetime.date`, `np.datetime64` or `pd.Timestamp`. Missing dates give NaN.
+
+        :param hist_closing_df: historical end of day prices [date, close, adjustment factor] (DataFrame)
+        :param dividends_df: historical and future end of day priced-in dividends [date, dividend] (DataFrame)
+        :param rates_dict: {tenor (years): [date, continuous rate] (DataFrame)}, see `read_treasury_yields` (dict)
+        """
+
+        # {field: date indexed series}
+        self.series_dict = dict()
+
+        if hist_closing_df is not None:
+            for field in ["close", "adjustment factor"]:
+                if field in hist_closing_df.columns:
+                    self.series_dict[field] = self.to_series(hist_closing_df, field)
+
+        if dividends_df is not None:
+            self.series_dict["dividend"] = self.to_series(dividends_df, "dividend")
+
+        # {tenor: date sorted series of continuous rates}
+        self.rates_dict = dict()
+
+        if rates_dict is not None:
+            for tenor, rate_df in rates_dict.items():
+                self.rates_dict[tenor] = self.to_series(rate_df, "continuous rate").sort_index()
+
+        self.tenors = sorted(self.rates_dict.keys())
+
+        # [date, tenor] rate surface, see `interest_rate`
+        self.yield_curve = YieldCurve(self.rates_dict)
+
+    @classmethod
+    def from_files(cls, ticker, adj_close_path="data/adj_close", dividends_path="data/dividends",
+                   interest_rate_path="data/treasury_yields"):
+        """
+        Build calendar from the saved adjusted close (P1), dividend time series (P1) and treasury yields (P2).
+        Files that are not present are skipped.
+
+        :param ticker: ticker symbol (str)
+        :param adj_close_path: directory of adjusted closing prices (str)
+        :param dividends_path: directory of dividend time series (str)
+        :param interest_rate_path: directory of treasury yields (str)
+        :return: PriceCalendar
+        """
+
+        hist_closing_df = None
+        dividends_df = None
+        rates_dict = None
+
+        if os.path.isfile(os.path.join(adj_close_path, ticker, f"{ticker}.csv")):
+            hist_closing_df = pd.read_csv(os.path.join(adj_close_path, ticker, f"{ticker}.csv"))
+
+        if os.path.isfile(os.path.join(dividends_path, ticker, f"{ticker}_ts.csv")):
+            dividends_df = pd.read_csv(os.path.join(dividends_path, ticker, f"{ticker}_ts.csv"))
+
+        if os.path.isdir(interest_rate_path):
+            rates_dict = read_treasury_yields(interest_rate_path)
+
+        return cls(hist_closing_df=hist_closing_df, dividends_df=dividends_df, rates_dict=rates_dict)
+
+    @staticmethod
+    def to_series(df, field):
+        """
+        :param df: DataFrame with unique dates (DataFrame)
+        :param field: column to look up (str)
+        :return: field values indexed by date (Series)
+        """
+        series = pd.Series(df[field].values.astype(float), index=pd.DatetimeIndex(pd.to_datetime(df["date"])),
+                           name=field)
+
+        # Sanity check
+        assert series.index.is_unique, f"Dates of {field} are not unique!"
+
+        return series
+
+    def get(self, field, dates):
+        """
+        Look up field values of dates.
+
+        :param field: "close", "adjustment factor" or "dividend" (str)
+        :param dates: single date, or array of dates
+        :return: float (single date) or np.array
+        """
+
+        series = self.series_dict[field]
+
+        if np.ndim(dates) == 0:
+            return series.get(pd.Timestamp(dates), np.nan)
+
+        return series.reindex(pd.to_datetime(dates)).values
+
+    def contains(self, field, dates):
+        """
+        Check if field has a value recorded on dates.
+
+        :param field: "close", "adjustment factor" or "dividend" (str)
+        :param dates: single date, or array of dates
+        :return: bool (single date) or np.array
+        """
+
+        series = self.series_dict[field]
+
+        if np.ndim(dates) == 0:
+            return pd.Timestamp(dates) in series.index
+
+        return pd.DatetimeIndex(pd.to_datetime(dates)).isin(series.index)
+
+    def close(self, dates):
+        """End of day closing price of dates, see `get`"""
+        return self.get("close", dates)
+
+    def adjustment_factor(self, dates):
+        """Cumulative split factor of dates, see `get`"""
+        return self.get("adjustment factor", dates)
+
+    def dividend(self, dates):
+        """End of day priced-in dividend of dates, see `get`"""
+        return self.get("dividend", dates)
+
+    def rate(self, dates, tenor):
+        """
+        Continuous rate of treasury tenor on dates. If no rate is recorded on a date, the average
+        of the closest recorded dates before and after is used (NaN if either does not exist).
+
+        :param dates: single date, or array of dates
+        :param tenor: treasury tenor in years, see `treasury_tenors` (float)
+        :return: float (single date) or np.array
+        """
+
+        rates = fill_rates(self.rates_dict[tenor], pd.to_datetime(np.atleast_1d(dates)).values)
+
+        if np.ndim(dates) == 0:
+            return float(rates[0])
+
+        return rates
+
+    def interest_rate(self, dates, years_to_exp):
+        """
+        Continuous rate of dates at years until expiry, interpolated on the yield curve (see `YieldCurve.rate`).
+
+        :param dates: array of dates
+        :param years_to_exp: years until expiry (np.array)
+        :return: np.array
+        """
+        return self.yield_curve.rate(dates, years_to_exp)
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+
+def fill_rates(rate_series, dates):
+    """
+    Rate recorded on dates. If no rate is recorded on a date, the average of the closest recorded dates
+    before and after is used (NaN if either does not exist).
+
+    :param rate_series: rates indexed by date, sorted (Series)
+    :param dates: dates (np.array of datetime64)
+    :return: rates (np.array)
+    """
+
+    rate_dates = rate_series.index.values
+    rate_values = rate_series.values
+
+    if rate_dates.shape[0] == 0:
+        return np.full(dates.shape[0], np.nan)
+
+    # Position of first recorded date >= query date
+    n = np.searchsorted(rate_dates, dates, side="left")
+    n_next = np.minimum(n, rate_dates.shape[0] - 1)
+    n_prev = np.maximum(n - 1, 0)
+
+    is_exact = rate_dates[n_next] == dates
+    is_bounded = (n > 0) & (n < rate_dates.shape[0])
+
+    return np.where(is_exact, rate_values[n_next],
+                    np.where(is_bounded, (rate_values[n_prev] + rate_values[n_next]) / 2, np.nan))
+
+
+class YieldCurve:
+    def __init__(self, rates_dict):
+        """
+        Continuous rate surface, built once: a [calendar date, tenor] grid covering all recorded dates,
+        gaps filled as in `fill_rates`. A 0 year tenor with rate 0 is the lower bound of short maturities.
+
+        :param rates_dict: {tenor (years): continuous rates indexed by date, sorted (Series)} (dict)
+        """
+
+        # Tenors, including 0 year lower bound
+        self.tenors = np.array([0] + sorted(rates_dict.keys()), dtype=float)
+
+        recorded_dates = [n.index.values for n in rates_dict.values() if n.shape[0] > 0]
+
+        if len(recorded_dates) == 0:
+            self.start_date = np.datetime64("NaT", "D")
+            self.grid = np.zeros([0, self.tenors.shape[0]])
+            return
+
+        self.start_date = np.min([n.min() for n in recorded_dates]).astype("datetime64[D]")
+        end_date = np.max([n.max() for n in recorded_dates]).astype("datetime64[D]")
+
+        grid_dates = np.arange(self.start_date, end_date + 1).astype("datetime64[ns]")
+
+        self.grid = np.zeros([grid_dates.shape[0], self.tenors.shape[0]])
+
+        for n, tenor in enumerate(self.tenors[1:]):
+            self.grid[:, n + 1] = fill_rates(rates_dict[tenor], grid_dates)
+
+    def tenor_rates(self, dates):
+        """
+        :param dates: array of dates
+        :return: rate of every tenor on dates, NaN outside of recorded dates (np.array [dates, tenors])
+        """
+
+        day_index = (pd.to_datetime(np.atleast_1d(dates)).values.astype("datetime64[D]") -
+                     self.start_date).astype(np.int64)
+        in_grid = (day_index >= 0) & (day_index < self.grid.shape[0])
+
+        rates = np.full([day_index.shape[0], self.tenors.shape[0]], np.nan)
+        rates[in_grid] = self.grid[day_index[in_grid]]
+
+        return rates
+
+    def rate(self, dates, years_to_exp):
+        """
+        Continuous rate of dates at years until expiry, linearly interpolated between the bracketing tenors
+        t_0 <= t < t_1:
+
+        f(t) = f(t_0) * ((t_1 - t)/(t_1 - t_0)) + f(t_1) * ((t - t_0)/(t_1 - t_0))
+
+        :param dates: array of dates
+        :param years_to_exp: years until expiry (np.array)
+        :return: rates, NaN if not available (beyond largest tenor, or no rates around date) (np.array)
+        """
+
+        years_to_exp = np.atleast_1d(np.asarray(years_to_exp, dtype=float))
+
+        # Tenors bracketing years to expiry
+        n = np.searchsorted(self.tenors, years_to_exp, side="right")
+        in_range = (n > 0) & (n < self.tenors.shape[0])
+        n = np.clip(n, 1, self.tenors.shape[0] - 1)
+
+        [t0, t1] = [self.tenors[n - 1], self.tenors[n]]
+
+        tenor_rates = self.tenor_rates(dates)
+        rows = np.arange(years_to_exp.shape[0])
+
+        interest_rate = np.zeros(years_to_exp.shape[0])
+        interest_rate = interest_rate + tenor_rates[rows, n - 1] * ((t1 - years_to_exp) / (t1 - t0))
+        interest_rate = interest_rate + tenor_rates[rows, n] * ((years_to_exp - t0) / (t1 - t0))
+
+        return np.where(in_range, interest_rate, np.nan)
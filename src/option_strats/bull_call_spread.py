@@ -1,8 +1,7 @@
 import itertools
-import multiprocessing
-from multiprocessing.pool import Pool
 import numpy as np
 import pandas as pd
+from parallel import Executor
 
 
 class BullCallSpread:
@@ -34,7 +33,6 @@ class BullCallSpread:
 
         # Local to function
         input_list = []
-        my_pool = Pool(multiprocessing.cpu_count())
         options_df = options_df[options_df["tag"] == "call"].copy()
 
         # Get inputs
@@ -68,7 +66,8 @@ class BullCallSpread:
                                    "bin_width": pred_pdf_df1.loc[0, "bin width"]})
 
         # Calculate strategy scores
-        results_list = my_pool.map(self.calc_option_pairs, input_list)
+        with Executor() as executor:
+            results_list = executor.map(self.calc_option_pairs, input_list)
 
         # Option pairs with `min pl` < 0 (with risk)
         scores_df1 = pd.concat([n["with risk"] for n in results_list], ignore_index=True)
@@ -101,7 +100,7 @@ class BullCallSpread:
         self.risk_scores_df = scores_df1
         self.no_risk_scores_df = scores_df2
 
-    def eval_model_strategy(self, date_close_df, num_days_year):
+    def eval_model_strategy(self, price_calendar, num_days_year):
         """
         Evaluate the performance of model, given the vertical spread strategy
 
@@ -111,7 +110,7 @@ class BullCallSpread:
         3. Group by data date to calculate cumulative book, realized return and ROI
         4. Group by expiration date to get total book and weighted average annum ROI
 
-        :param date_close_df: Historical close prices
+        :param price_calendar: Historical close prices (PriceCalendar)
         :param num_days_year: Number of days per year, used to get annualized return
         :return: None
         """
@@ -120,14 +119,9 @@ class BullCallSpread:
         # Calculate ROI of option pairs that have capital risk
         #
 
-        pl_df = self.risk_scores_df.merge(date_close_df[["date", "close"]],
-                                          left_on="expiration date", right_on="date",
-                                          how="left", validate="m:1")
+        pl_df = self.risk_scores_df.copy()
 
-        pl_df.drop(columns="date_y", inplace=True)
-
-        pl_df.rename(columns={"date_x": "date",
-                              "close": "exp close"}, inplace=True)
+        pl_df["exp close"] = price_calendar.close(pl_df["expiration date"])
 
         # Gain from lower strike + loss from higher strike per option pair
         pl_df["raw return"] = (np.maximum(pl_df["exp close"] - pl_df["strike 1"], 0) +
@@ -0,0 +1,2 @@
+from .executor import Executor, configure_executors, executor_settings, task_label
+from .completion_queue import CompletionQueue
@@ -0,0 +1,48 @@
+import queue
+
+
+class CompletionQueue:
+    def __init__(self, pool):
+        """
+        Independent pool tasks, submitted as soon as they are added. Outputs are yielded in completion order
+        (see `as_completed`), so they can be saved & released one by one instead of waiting for every task of a stage.
+
+        :param pool: worker pool with `apply_async`, see `Executor` (Executor or multiprocessing Pool)
+        """
+        self.pool = pool
+
+        # Completed tasks (key, output, exception) are put here by the pool's result thread
+        self.done_queue = queue.Queue()
+
+        self.num_pending = 0
+
+    def add(self, key, function, input_value=None):
+        """
+        :param key: unique task key, e.g. ("Delta", 0) (hashable)
+        :param function: task, input -> output (picklable callable)
+        :param input_value: task input
+        :return: None
+        """
+
+        self.pool.apply_async(function, (input_value,),
+                              callback=lambda output: self.done_queue.put((key, output, None)),
+                              error_callback=lambda error: self.done_queue.put((key, None, error)))
+
+        self.num_pending += 1
+
+    def as_completed(self):
+        """
+        Wait for all tasks to complete.
+
+        :return: generator of (key, output) in completion order
+        """
+
+        while self.num_pending > 0:
+            [key, output, error] = self.done_queue.get()
+
+            if error is not None:
+                raise RuntimeError(f"Task {key} failed!") from error
+
+            self.num_pending -= 1
+
+            yield key, output
@@ -0,0 +1,231 @@
+import multiprocessing
+from multiprocessing.pool import Pool, ThreadPool
+import os
+import pandas as pd
+import threading
+import time
+
+# Settings of all executors unless given explicitly, see `configure_executors`
+#   - backend: "process" (worker processes), "thread" (worker threads, no pickling) or "serial" (in-process, profiling)
+#   - num_workers: number of workers, all cores if None
+#   - chunk_size: tasks sent to a worker at once by `map`, pool heuristic if None
+#   - max_tasks_per_child: tasks a worker process runs before it is replaced (frees leaked memory), unlimited if None
+executor_settings = {"backend": "process",
+                     "num_workers": None,
+                     "chunk_size": None,
+                     "max_tasks_per_child": None}
+
+backends = ["process", "thread", "serial"]
+
+
+def configure_executors(**settings):
+    """
+    Change settings of executors created from now on (in this process), e.g. `configure_executors(backend="serial")`.
+
+    :param settings: see `executor_settings`
+    :return: None
+    """
+
+    for key in settings.keys():
+        assert key in executor_settings.keys(), \
+            f"Unknown executor setting: {key}! Choose from {list(executor_settings.keys())}"
+
+    assert settings.get("backend", "process") in backends, f"Unknown backend! Choose from {backends}"
+
+    executor_settings.update(settings)
+
+
+def task_label(function):
+    """
+    :param function: task (callable)
+    :return: name of task, e.g. "CalcDelta.run" (str)
+    """
+
+    # Wrapped tasks, e.g. `SharedTask`
+    while hasattr(function, "function"):
+        function = function.function
+
+    return getattr(function, "__qualname__", type(function).__name__)
+
+
+class TimedTask:
+    def __init__(self, function):
+        """
+        Task that also returns its run time and worker.
+
+        :param function: task, input -> output (picklable callable)
+        """
+        self.function = function
+
+    def __call__(self, input_value):
+        start_time = time.time()
+        output = self.function(input_value)
+
+        return output, time.time() - start_time, f"{os.getpid()}:{threading.get_ident()}"
+
+
+class _SerialResult:
+    """Completed result of a serial task (same interface as `multiprocessing.pool.AsyncResult`)"""
+
+    def __init__(self, output=None, error=None):
+        self.output = output
+        self.error = error
+
+    def ready(self):
+        return True
+
+    def get(self, timeout=None):
+        if self.error is not None:
+            raise self.error
+        return self.output
+
+
+class Executor:
+    def __init__(self, backend=None, num_workers=None, chunk_size=None, max_tasks_per_child=None,
+                 initializer=None, initargs=()):
+        """
+        Managed worker pool. Settings not given are taken from `executor_settings`.
+
+        Use as a context manager (or call `close`), workers are shut down once all tasks completed
+        (terminated on error). Run time of every task is recorded, see `timing_df` & `log_timing`.
+
+        :param backend: "process", "thread" or "serial" (str)
+        :param num_workers: number of workers (int)
+        :param chunk_size: default chunk size of `map` (int)
+        :param max_tasks_per_child: tasks per worker process before it is replaced (int)
+        :param initializer: called with `initargs` once in every worker, e.g. to preload shared data (callable)
+        :param initargs: arguments of `initializer` (tuple)
+        """
+
+        # Unpack
+        self.backend = backend or executor_settings["backend"]
+        self.num_workers = num_workers or self.default_num_workers()
+        self.chunk_size = chunk_size or executor_settings["chunk_size"]
+        max_tasks_per_child = max_tasks_per_child or executor_settings["max_tasks_per_child"]
+
+        assert self.backend in backends, f"Unknown backend: {self.backend}! Choose from {backends}"
+
+        # Housekeeping
+        self.timing_list = []
+
+        if self.backend == "process":
+            self.pool = Pool(self.num_workers, initializer=initializer, initargs=initargs,
+                             maxtasksperchild=max_tasks_per_child)
+        elif self.backend == "thread":
+            self.pool = ThreadPool(self.num_workers, initializer=initializer, initargs=initargs)
+        else:
+            self.pool = None
+            self.num_workers = 1
+
+            if initializer is not None:
+                initializer(*initargs)
+
+    @staticmethod
+    def default_num_workers():
+        """
+        :return: number of workers of executors created with default settings (int)
+        """
+        return executor_settings["num_workers"] or multiprocessing.cpu_count()
+
+    def _record(self, label, timed_output):
+        [output, seconds, worker] = timed_output
+        self.timing_list.append([label, seconds, worker])
+
+        return output
+
+    def map(self, function, input_list, chunk_size=None):
+        """
+        Apply task to every input, outputs in input order.
+
+        :param function: task, input -> output (picklable callable)
+        :param input_list: task inputs (list)
+        :param chunk_size: tasks sent to a worker at once, executor default if None (int)
+        :return: outputs (list)
+        """
+
+        label = task_label(function)
+        chunk_size = chunk_size or self.chunk_size
+
+        if self.pool is None:
+            timed_list = [TimedTask(function)(n) for n in input_list]
+        else:
+            timed_list = self.pool.map(TimedTask(function), input_list, chunksize=chunk_size)
+
+        return [self._record(label, n) for n in timed_list]
+
+    def apply_async(self, function, args=(), callback=None, error_callback=None):
+        """
+        Submit a single task, see `multiprocessing.pool.Pool.apply_async`. Serial tasks run immediately.
+
+        :param function: task, input -> output (picklable callable)
+        :param args: (input,) (tuple)
+        :param callback: called with output (callable)
+        :param error_callback: called with exception (callable)
+        :return: AsyncResult
+        """
+
+        label = task_label(function)
+
+        def record_callback(timed_output):
+            output = self._record(label, timed_output)
+            if callback is not None:
+                callback(output)
+
+        if self.pool is not None:
+            return self.pool.apply_async(TimedTask(function), args, callback=record_callback,
+                                         error_callback=error_callback)
+
+        try:
+            timed_output = TimedTask(function)(*args)
+        except Exception as error:
+            if error_callback is not None:
+                error_callback(error)
+            return _SerialResult(error=error)
+
+        record_callback(timed_output)
+
+        return _SerialResult(output=timed_output[0])
+
+    def timing_df(self):
+        """
+        :return: run time of every completed task (DataFrame: [task, seconds, worker])
+        """
+        return pd.DataFrame(self.timing_list, columns=["task", "seconds", "worker"])
+
+    def log_timing(self, logger):
+        """
+        Log run time summary of each task type.
+
+        :param logger: logger to record system outputs
+        :return: None
+        """
+
+        timing_df = self.timing_df()
+
+        for task, task_df in timing_df.groupby("task", sort=False):
+            logger.info(f"{task} - {task_df.shape[0]} tasks on {task_df['worker'].nunique()} workers "
+                        f"({self.backend}), {round(task_df['seconds'].sum(), 2)} task seconds "
+                        f"(mean {round(task_df['seconds'].mean(), 3)}, max {round(task_df['seconds'].max(), 3)})")
+
+    def close(self):
+        """Wait for submitted tasks to complete & shut down workers"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def terminate(self):
+        """Stop workers immediately"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
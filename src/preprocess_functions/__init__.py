@@ -1,2 +1,5 @@
-from .preprocess_funs import read_and_format, remove_split_error_options, adjust_options, \
-    attach_dividends, attach_eod_prices, save_by_year
+from .preprocess_funs import ingest_options, read_and_format, remove_split_error_options, enrich_options, \
+    save_by_year
+from .preprocess_funs_multithread import date_offsets
+from .incremental_funs import scan_day_files, load_manifest, plan_update, update_by_year, save_manifest
+from .option_schema import tag_dtype, option_dtypes, adjusted_option_dtypes, set_option_dtypes
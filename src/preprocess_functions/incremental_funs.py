@@ -0,0 +1,339 @@
+import numpy as np
+import os
+import pandas as pd
+from .option_schema import set_option_dtypes
+from .preprocess_funs import enrich_options, save_by_year
+import time
+
+
+def scan_day_files(option_data_path):
+    """
+    List all raw day files with their size and modification time.
+
+    :param option_data_path: path where raw option data files are stored (string)
+    :return: day_files_df: [file (relative to `option_data_path`), size, mtime (ns)] (DataFrame)
+    """
+
+    output_list = []
+
+    for year in next(os.walk(option_data_path))[1]:
+        for month in os.listdir(os.path.join(option_data_path, year)):
+            for day in os.listdir(os.path.join(option_data_path, year, month)):
+                day_file = os.path.join(year, month, day)
+                file_stat = os.stat(os.path.join(option_data_path, day_file))
+                output_list.append([day_file, file_stat.st_size, file_stat.st_mtime_ns])
+
+    return pd.DataFrame(output_list, columns=["file", "size", "mtime"])
+
+
+def load_manifest(save_dir):
+    """
+    Load the processed-files manifest and split sections of a ticker. Empty DataFrames if not present.
+
+    Manifest: one row per raw day file included in the saved outputs
+        [file, size, mtime, date, adjustment factor, next exp date]
+        - adjustment factor: cumulative split factor applied to date options (NaN if saved to errors)
+        - next exp date: earliest exp date of incomplete options that can still be completed (NaN if none)
+
+    Split sections: [pre-split date, complete date (date all error options were removed, NaN if not yet)]
+
+    :param save_dir: directory of ticker adjusted options (str)
+    :return: {manifest df, sections df} (dict)
+    """
+
+    manifest_df = pd.DataFrame(columns=["file", "size", "mtime", "date", "adjustment factor", "next exp date"])
+    sections_df = pd.DataFrame(columns=["pre-split date", "complete date"])
+
+    if os.path.isfile(os.path.join(save_dir, "manifest.csv")):
+        manifest_df = pd.read_csv(os.path.join(save_dir, "manifest.csv"))
+
+    if os.path.isfile(os.path.join(save_dir, "split_sections.csv")):
+        sections_df = pd.read_csv(os.path.join(save_dir, "split_sections.csv"))
+
+    # Convert columns to correct format
+    for col in ["date", "next exp date"]:
+        manifest_df[col] = pd.to_datetime(manifest_df[col])
+    for col in ["pre-split date", "complete date"]:
+        sections_df[col] = pd.to_datetime(sections_df[col])
+
+    return {"manifest df": manifest_df, "sections df": sections_df}
+
+
+def plan_update(manifest_df, sections_df, day_files_df, hist_closing_df, logger):
+    """
+    Decide which raw day files have to be (re)processed.
+
+    Full update when:
+        - There is no manifest
+        - Day files previously processed were removed
+        - The cumulative split factor of a processed date changed (new split)
+
+    Otherwise, reprocess:
+        - New or modified day files (size / mtime differ)
+        - Day files of dates that were missing a closing price (saved to errors), but have one now
+        - Day files of split sections whose error options were not completely removed yet (from pre-split date)
+
+    :param manifest_df: processed-files manifest, see `load_manifest` (DataFrame)
+    :param sections_df: split sections, see `load_manifest` (DataFrame)
+    :param day_files_df: current raw day files, see `scan_day_files` (DataFrame)
+    :param hist_closing_df: historical end of day prices (DataFrame)
+    :param logger: logger to record system outputs
+    :return: {full update (bool), day files (list)} (dict)
+    """
+
+    if manifest_df.empty:
+        logger.info("No manifest found! Full update")
+        return {"full update": True, "day files": list(day_files_df["file"])}
+
+    # Removed day files
+    removed_files = set(manifest_df["file"]) - set(day_files_df["file"])
+
+    if removed_files:
+        logger.info(f"{len(removed_files)} processed day files were removed! Full update")
+        return {"full update": True, "day files": list(day_files_df["file"])}
+
+    # Compare split factors used with current ones
+    factor_df = manifest_df.merge(hist_closing_df[["date", "adjustment factor"]], how="left",
+                                  on="date", suffixes=(" old", ""))
+
+    factor_filter = factor_df[["adjustment factor old", "adjustment factor"]].notna().all(axis=1)
+    changed_factor_df = factor_df[factor_filter]
+    changed_factor_df = changed_factor_df[~np.isclose(changed_factor_df["adjustment factor old"],
+                                                      changed_factor_df["adjustment factor"])]
+
+    if not changed_factor_df.empty:
+        logger.info(f"Split factors changed since {np.min(changed_factor_df['date']):%Y-%m-%d}! Full update")
+        return {"full update": True, "day files": list(day_files_df["file"])}
+
+    # Dates that now have closing prices
+    closed_files = set(factor_df[factor_df["adjustment factor old"].isna() &
+                                 factor_df["adjustment factor"].notna()]["file"])
+
+    # New or modified day files
+    files_df = day_files_df.merge(manifest_df[["file", "size", "mtime"]], how="left",
+                                  on="file", suffixes=("", " old"))
+
+    new_files = set(files_df[(files_df["size"] != files_df["size old"]) |
+                             (files_df["mtime"] != files_df["mtime old"])]["file"])
+
+    # Split sections with outstanding error options, reprocess from pre-split date
+    section_files = set()
+    open_sections_df = sections_df[sections_df["complete date"].isna()]
+
+    if not open_sections_df.empty:
+        presplit_date = np.min(open_sections_df["pre-split date"])
+        section_files = set(manifest_df[manifest_df["date"] >= presplit_date]["file"])
+        logger.info(f"Error options from pre-split {presplit_date:%Y-%m-%d} are not completely removed yet! "
+                    f"Reprocessing {len(section_files)} day files")
+
+    day_files = new_files | closed_files | section_files
+
+    # Options of a date are replaced as a whole, include all day files of (re)processed dates
+    replace_dates = manifest_df[manifest_df["file"].isin(day_files)]["date"]
+    day_files = sorted(day_files | set(manifest_df[manifest_df["date"].isin(replace_dates)]["file"]))
+
+    logger.info(f"{len(new_files)} new / modified day files, {len(closed_files)} day files with new closing prices")
+
+    return {"full update": False, "day files": day_files}
+
+
+def update_by_year(complete_df, incomplete_df, errors_df, replace_dates, manifest_df,
+                   price_calendar, hist_closing_df, ticker, store, logger):
+    """
+    Update saved year partitions with (re)processed date options, without rewriting unaffected years.
+        1. Saved incomplete options that can be completed now (exp date has a closing price) are re-attached
+           with dividends & end of day prices
+        2. Saved options of reprocessed dates are replaced
+        3. Affected years are written to disk, partitions that no longer have options are removed
+
+    :param complete_df: (re)processed complete options (DataFrame)
+    :param incomplete_df: (re)processed incomplete options (DataFrame)
+    :param errors_df: (re)processed error options (DataFrame)
+    :param replace_dates: data dates that were (re)processed, saved options of these dates are dropped (list)
+    :param manifest_df: processed-files manifest, see `load_manifest` (DataFrame)
+    :param price_calendar: end of day prices & priced-in dividends (PriceCalendar)
+    :param hist_closing_df: historical end of day prices (DataFrame)
+    :param ticker: ticker symbol (str)
+    :param store: ticker adjusted options tables, see `save_by_year` (TableStore)
+    :param logger: logger to record system outputs
+    :return: {incomplete df: incomplete options in affected years (DataFrame),
+              years: affected years that were rewritten (set)} (dict)
+    """
+    # Housekeeping variables
+    replace_dates = set(replace_dates)
+    start_time = time.time()
+
+    # Years with saved incomplete options that can be completed now
+    resolve_df = manifest_df[(pd.to_datetime(manifest_df["next exp date"]) <=
+                              pd.to_datetime(np.max(hist_closing_df["date"]))) &
+                             ~manifest_df["date"].isin(replace_dates)]
+    resolve_years = set([n.year for n in resolve_df["date"]])
+
+    years = resolve_years | set([n.year for n in replace_dates])
+
+    if len(years) == 0:
+        logger.info("Saved options are up to date")
+        return {"incomplete df": incomplete_df.iloc[0:0], "years": years}
+
+    output_dict = dict()
+    saved_dict = load_saved_options(ticker=ticker, store=store, years=years)
+
+    for n in ["complete", "incomplete", "errors"]:
+        saved_df = saved_dict[n]
+
+        # Options of reprocessed dates are replaced
+        keep_filter = ~saved_df["date"].isin(replace_dates)
+
+        # Incomplete options of resolved years are re-attached below
+        if n == "incomplete":
+            keep_filter &= ~pd.to_datetime(saved_df["date"]).dt.year.isin(resolve_years)
+
+        output_dict[n] = [saved_df[keep_filter]]
+
+    # Re-attach dividends & end of day prices to incomplete options
+    saved_df = saved_dict["incomplete"]
+    resolve_df = saved_df[pd.to_datetime(saved_df["date"]).dt.year.isin(resolve_years) &
+                          ~saved_df["date"].isin(replace_dates)]
+
+    if resolve_df.shape[0] > 0:
+        logger.info(f"Completing saved incomplete options of years: {sorted(resolve_years)}")
+
+        resolve_dict = enrich_options(options_df=resolve_df.drop(columns=["date div", "exp date div", "date close"]),
+                                      price_calendar=price_calendar,
+                                      logger=logger,
+                                      split_adjust=False)
+
+        output_dict["complete"].append(resolve_dict["complete df"])
+        output_dict["incomplete"].append(resolve_dict["incomplete df"])
+        output_dict["errors"].append(resolve_dict["errors df"])
+
+    # Add (re)processed options
+    output_dict["complete"].append(complete_df)
+    output_dict["incomplete"].append(incomplete_df)
+    output_dict["errors"].append(errors_df)
+
+    for n in ["complete", "incomplete", "errors"]:
+        output_dict[n] = concat_by_date(output_dict[n])
+
+        # Remove partitions that no longer have options
+        output_years = set(pd.to_datetime(output_dict[n]["date"]).dt.year)
+
+        for year in years - output_years:
+            store.remove(os.path.join(str(year), f"{ticker}_{year}_{n}"))
+
+    save_by_year(complete_df=output_dict["complete"],
+                 incomplete_df=output_dict["incomplete"],
+                 errors_df=output_dict["errors"],
+                 ticker=ticker,
+                 store=store,
+                 logger=logger)
+
+    logger.info(f"Updated years: {sorted(years)} - {round(time.time() - start_time, 2)} seconds")
+
+    return {"incomplete df": output_dict["incomplete"], "years": years}
+
+
+def concat_by_date(df_list):
+    """
+    Concatenate option tables into one, sorted by data date. Empty tables are skipped.
+
+    :param df_list: option tables, at least one (list of DataFrame)
+    :return: options_df: (DataFrame)
+    """
+
+    non_empty_list = [n for n in df_list if n.shape[0] > 0]
+
+    if len(non_empty_list) == 0:
+        return df_list[0].iloc[0:0]
+
+    return pd.concat(non_empty_list, ignore_index=True).sort_values(by="date", kind="stable", ignore_index=True)
+
+
+def load_saved_options(ticker, store, years):
+    """
+    Load saved year partitions of complete, incomplete, and error options into one table each,
+    cast to the compact option schema (see `option_schema`).
+
+    :param ticker: ticker symbol (str)
+    :param store: ticker adjusted options tables, see `save_by_year` (TableStore)
+    :param years: years to load (iterable)
+    :return: {complete (DataFrame), incomplete (DataFrame), errors (DataFrame)} (dict)
+    """
+
+    output_dict = dict()
+
+    for n in ["complete", "incomplete", "errors"]:
+        year_list = [pd.DataFrame(columns=["date", "expiration date"])]
+
+        for year in years:
+            table_name = os.path.join(str(year), f"{ticker}_{year}_{n}")
+
+            if not store.exists(table_name):
+                continue
+
+            year_df = store.read(table_name)
+
+            # Convert columns to correct format (error options are not split adjusted)
+            year_df = set_option_dtypes(year_df, adjusted=(n != "errors"))
+
+            year_list.append(year_df)
+
+        output_dict[n] = concat_by_date(year_list)
+
+    return output_dict
+
+
+def save_manifest(manifest_df, sections_df, day_files_df, files_dict, sections_dict, incomplete_df,
+                  hist_closing_df, save_dir, years=None):
+    """
+    Record (re)processed day files in manifest, update split sections, and write both to disk.
+
+    :param manifest_df: processed-files manifest, see `load_manifest` (DataFrame)
+    :param sections_df: split sections, see `load_manifest` (DataFrame)
+    :param day_files_df: current raw day files, see `scan_day_files` (DataFrame)
+    :param files_dict: (re)processed day files {day file: data date} (dict)
+    :param sections_dict: {pre-split date: complete date} of (re)processed split sections (dict)
+    :param incomplete_df: all incomplete options of `years` (DataFrame)
+    :param hist_closing_df: historical end of day prices (DataFrame)
+    :param save_dir: path to save manifest (str)
+    :param years: years whose options were rewritten, see `update_by_year`. "next exp date" of all their dates
+                  is updated (NaN if no incomplete options can still be completed). All years if None (set)
+    :return: None
+    """
+
+    last_close_date = np.max(hist_closing_df["date"])
+
+    # Earliest exp date that can still be completed, per data date
+    future_exp_df = incomplete_df[incomplete_df["expiration date"] > last_close_date]
+    next_exp_series = future_exp_df.groupby("date")["expiration date"].min()
+
+    # (Re)processed day files
+    new_manifest_df = day_files_df[day_files_df["file"].isin(files_dict.keys())].copy()
+    new_manifest_df["date"] = new_manifest_df["file"].map(files_dict)
+    new_manifest_df = new_manifest_df.merge(hist_closing_df[["date", "adjustment factor"]], how="left", on="date")
+
+    manifest_df = pd.concat([manifest_df[~manifest_df["file"].isin(files_dict.keys())], new_manifest_df],
+                            ignore_index=True)
+
+    # Update next exp date of all dates of rewritten years, including dates whose incomplete options were all
+    # completed (no longer in `incomplete_df`)
+    date_filter = manifest_df["file"].isin(files_dict.keys())
+
+    if years is None:
+        date_filter[:] = True
+    else:
+        date_filter |= pd.to_datetime(manifest_df["date"]).dt.year.isin(years)
+    manifest_df["next exp date"] = manifest_df["next exp date"].where(~date_filter,
+                                                                      manifest_df["date"].map(next_exp_series))
+
+    # Update split sections
+    sections_df = sections_df[~sections_df["pre-split date"].isin(sections_dict.keys())]
+    sections_df = pd.concat([sections_df,
+                             pd.DataFrame(list(sections_dict.items()), columns=["pre-split date", "complete date"])],
+                            ignore_index=True)
+
+    manifest_df.sort_values(by=["date", "file"], inplace=True, ignore_index=True)
+    sections_df.sort_values(by="pre-split date", inplace=True, ignore_index=True)
+
+    manifest_df.to_csv(os.path.join(save_dir, "manifest.csv"), index=False)
+    sections_df.to_csv(os.path.join(save_dir, "split_sections.csv"), index=False)
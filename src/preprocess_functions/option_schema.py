@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+# Compact column types of option rows. Applied when raw day files are ingested (P3-0), and kept through
+# formatting, preprocessing and the saved year files (P3), up to the model feature inputs (P4).
+#   - Dates: datetime64[ns] in memory (the only resolution of pandas 1.x Series), compared and differenced as arrays
+#     instead of Python objects. Day resolution (date32) is only used in storage (columnar option store)
+#   - Tag: call / put categorical (1 byte per row)
+#   - Bid / last price: float32. Strike and ask price stay float64: strike is an exact join key (split adjusted
+#     strike matching, open interest merges), ask price is finite differenced across strikes (Delta, Gamma)
+#   - Sizes & open interest: int32. Once split adjusted they can be fractional (e.g. 3:2 split), float32
+#   - End of day prices & dividends: float64, as looked up in the price calendar
+
+# Option type flag
+tag_dtype = pd.CategoricalDtype(categories=["call", "put"])
+
+# Raw (day file) column names of formatted options
+raw_option_columns = {"datadate": "date",
+                      "expirationdate": "expiration date",
+                      "putcall": "tag",
+                      "strikeprice": "strike price",
+                      "askprice": "ask price",
+                      "asksize": "ask size",
+                      "bidprice": "bid price",
+                      "bidsize": "bid size",
+                      "lastprice": "last price",
+                      "volume": "volume",
+                      "openinterest": "open interest"}
+
+# Formatted options, see `format_options`
+option_dtypes = {"date": "datetime64[ns]",
+                 "expiration date": "datetime64[ns]",
+                 "tag": tag_dtype,
+                 "strike price": np.float64,
+                 "ask price": np.float64,
+                 "ask size": np.int32,
+                 "bid price": np.float32,
+                 "bid size": np.int32,
+                 "last price": np.float32,
+                 "volume": np.int32,
+                 "open interest": np.int32}
+
+# Split adjusted options with dividends & end of day prices attached, see `enrich_options`
+adjusted_option_dtypes = {**option_dtypes,
+                          "ask size": np.float32,
+                          "bid size": np.float32,
+                          "volume": np.float32,
+                          "open interest": np.float32,
+                          "date div": np.float64,
+                          "exp date div": np.float64,
+                          "date close": np.float64,
+                          "exp date close": np.float64}
+
+# Columns of formatted options
+option_columns = list(option_dtypes.keys())
+
+# Columnar option store (raw column names), see `ingest_options`. As formatted options, but integer columns are
+# nullable & option type is kept as is: rows of all tickers are stored, missing values & unknown option types are
+# handled per ticker when options are formatted (see `format_options`)
+store_option_dtypes = {raw: pd.Int32Dtype() if option_dtypes[col] == np.int32 else
+                       object if col == "tag" else option_dtypes[col]
+                       for raw, col in raw_option_columns.items()}
+
+
+def set_option_dtypes(options_df, adjusted=False):
+    """
+    Cast option columns to the compact schema. Columns that are not present are skipped, others are kept as is.
+
+    :param options_df: options (DataFrame)
+    :param adjusted: options are split adjusted, see `adjusted_option_dtypes` (bool)
+    :return: options_df: (DataFrame)
+    """
+
+    dtypes = adjusted_option_dtypes if adjusted else option_dtypes
+
+    return options_df.astype({col: dtype for col, dtype in dtypes.items() if col in options_df.columns})
@@ -1,91 +1,172 @@
 import datetime
-import multiprocessing
-from multiprocessing.pool import Pool
 import numpy as np
 import os
+import pandas as pd
+from parallel import Executor
 from pathlib import Path
-from .preprocess_funs_multithread import read_and_format_multi, remove_split_error_options_multi
+from .option_schema import option_columns, set_option_dtypes
+from .preprocess_funs_multithread import ingest_options_multi, read_and_format_multi, \
+    remove_split_error_options_multi, date_offsets
 import time
 
 
-def read_and_format(ticker, option_data_path, logger):
+def ingest_options(option_data_path, option_store_path, logger, row_group_size=2 ** 15):
     """
-    Read raw options file, filter for ticker, and format option features as necessary. (multithread)
-    Append date options DataFrame into a single dictionary.
+    Convert raw (full market) day files into a columnar option store. (multithread)
+    The store mirrors the raw layout: `<store>/<year>/<month>/<day>.parquet`, each file sorted by symbol.
 
-    :param ticker: ticker symbol (string)
-    :param option_data_path: path where option data files are stored (string)
+    Incremental: only day files that are new, or have been modified since they were ingested, are converted.
+
+    :param option_data_path: path where raw option data files are stored (string)
+    :param option_store_path: path of the columnar option store (string)
     :param logger: logger to record system outputs
-    :return: options_dict: dictionary with all date options
+    :param row_group_size: max number of rows per Parquet row group (int)
+    :return: None
     """
 
     # Bookkeeping variables
     input_list = []
-    my_pool = Pool(multiprocessing.cpu_count())
-    options_dict = dict()
     start_time = time.time()
 
+    # Get all raw date files that are not ingested yet (or were modified since)
+    for year in os.listdir(option_data_path):
+        for month in os.listdir(os.path.join(option_data_path, year)):
+            Path(os.path.join(option_store_path, year, month)).mkdir(parents=True, exist_ok=True)
+
+            for day in os.listdir(os.path.join(option_data_path, year, month)):
+                raw_path = os.path.join(option_data_path, year, month, day)
+                store_path = os.path.join(option_store_path, year, month, f"{os.path.splitext(day)[0]}.parquet")
+
+                if (not os.path.isfile(store_path)) or (os.path.getmtime(store_path) < os.path.getmtime(raw_path)):
+                    input_list.append({"raw_path": raw_path, "store_path": store_path,
+                                       "row_group_size": row_group_size})
+
+    if len(input_list) == 0:
+        logger.info("Option store is up to date")
+        return
+
+    logger.info(f"Ingesting {len(input_list)} raw option files into {option_store_path}")
+
+    # Multithread ingestion
+    with Executor() as executor:
+        ingested_list = executor.map(ingest_options_multi, input_list)
+        executor.log_timing(logger)
+
+    for n in ingested_list:
+        # Log message if any
+        [logger.info(my_message) for my_message in n["messages"]]
+
+    logger.info(f"Ingesting options - {round(time.time() - start_time, 2)} seconds")
+
+
+def read_and_format(tickers, option_data_path, logger, option_store_path=None, day_files=None):
+    """
+    Read options files, filter for tickers, and format option features as necessary. (multithread)
+    Each day file is read exactly once, regardless of the number of tickers.
+    Concatenate date options into a single table per ticker, sorted by data date.
+
+    If `option_store_path` is provided, the (ingested) columnar store is read instead of the raw files,
+    only the row groups containing the tickers are loaded.
+
+    :param tickers: ticker symbols (list)
+    :param option_data_path: path where raw option data files are stored (string)
+    :param logger: logger to record system outputs
+    :param option_store_path: path of the columnar option store, see `ingest_options` (string)
+    :param day_files: raw day files to read, relative to `option_data_path` (list). Read all if None
+    :return: {options df ({ticker: all date options, sorted by date (DataFrame)}),
+              files dict ({ticker: {day file: data date}})} (dict)
+    """
+
+    # Bookkeeping variables
+    input_list = []
+    ticker_options_dict = {ticker: [] for ticker in tickers}
+    ticker_files_dict = {ticker: dict() for ticker in tickers}
+    start_time = time.time()
+
+    # Read from columnar store if available
+    from_store = option_store_path is not None
+    data_path = option_store_path if from_store else option_data_path
+
     # Get all date files we need to read
-    my_years = os.listdir(option_data_path)
-    for year in my_years:
-        logger.info(f"Reading {year}")
-        my_months = os.listdir(os.path.join(option_data_path, year))
-        for month in my_months:
-            my_days = os.listdir(os.path.join(option_data_path, year, month))
-            for day in my_days:
-                input_list.append({"ticker": ticker, "data_path": option_data_path,
-                                   "ymd": [year, month, day]})
+    if day_files is None:
+        day_files = []
+        my_years = next(os.walk(option_data_path))[1]
+        for year in my_years:
+            my_months = os.listdir(os.path.join(option_data_path, year))
+            for month in my_months:
+                my_days = os.listdir(os.path.join(option_data_path, year, month))
+                for day in my_days:
+                    day_files.append(os.path.join(year, month, day))
+
+    logger.info(f"Reading {len(day_files)} day files")
+
+    for day_file in day_files:
+        [year, month, day] = day_file.split(os.sep)
+
+        # Columnar store mirrors the raw layout
+        if from_store:
+            day = f"{os.path.splitext(day)[0]}.parquet"
+
+        input_list.append({"tickers": tickers, "data_path": data_path, "file": day_file,
+                           "ymd": [year, month, day], "from_store": from_store})
 
     # Multithread read and format options
-    ticker_options_list = my_pool.map(read_and_format_multi, input_list)
+    with Executor() as executor:
+        day_options_list = executor.map(read_and_format_multi, input_list)
+        executor.log_timing(logger)
 
-    for n in ticker_options_list:
+    for n in day_options_list:
         # Log message if any
         [logger.info(my_message) for my_message in n["messages"]]
 
-        # Aggregate options into dictionary
-        if n["date"] not in options_dict.keys():
-            options_dict[n["date"]] = n["df"]
-        else:
-            options_dict[n["date"]] = options_dict[n["date"]].append(n["df"], ignore_index=True)
+        # Collect date options of each ticker (dates with no options are dropped)
+        for ticker, m in n["dict"].items():
+            ticker_files_dict[ticker][n["file"]] = m["date"]
 
-    # Remove dates with no options
-    option_data_dates = list(options_dict.keys())
+            if m["df"].shape[0] > 0:
+                ticker_options_dict[ticker].append(m["df"])
 
-    for date in option_data_dates:
-        if options_dict[date].shape[0] == 0:
-            options_dict.pop(date)
+    # Concatenate once into a contiguous table per ticker, date options stay in file order
+    ticker_options_df = dict()
+    for ticker, options_list in ticker_options_dict.items():
+        if len(options_list) == 0:
+            ticker_options_df[ticker] = set_option_dtypes(pd.DataFrame(columns=option_columns))
+            continue
+
+        ticker_options_df[ticker] = pd.concat(options_list, ignore_index=True).sort_values(
+            by="date", kind="stable", ignore_index=True)
 
     logger.info(f"Reading and formatting - {round(time.time() - start_time, 2)} seconds")
 
-    return options_dict
+    return {"options df": ticker_options_df, "files dict": ticker_files_dict}
 
 
-def remove_split_error_options(options_dict, hist_closing_df, logger):
+def remove_split_error_options(options_df, hist_closing_df, logger):
     """
     Identify pre-split and split dates (if any). Calculate the split factor of each split.
     Take snapshot of option spreads on the pre-split dates. Adjust strikes by split factor.
     Group date options by which split "section" they belong in. Pass on each section to have
-    error options removed, and append cleaned date options into dict.
+    error options removed, and concatenate cleaned options back into one table.
 
-    Assumes that data date is continuous in options dict. (Aka. not just a few months from
+    Assumes that data date is continuous in options df. (Aka. not just a few months from
     various years)
 
+    :param options_df: options sorted by data date (DataFrame)
     :param hist_closing_df: historical end of day prices (DataFrame)
-    :param options_dict: dictionary of date options (dict)
     :param logger: logger to record system outputs
-    :return: clean_options_dict: dictionary of cleaned date options (dict)
+    :return: {clean_options_df (cleaned options sorted by data date, DataFrame),
+              sections_dict ({pre-split date: date all error options were removed (None if not yet)}, dict)}
     """
 
     # Bookkeeping variables
-    clean_options_dict = dict()
     input_list = []
     presplit_options_dict = dict()
-    split_agg_dict = dict()
+    sections_dict = dict()
     start_time = time.time()
 
     # Option data dates
-    option_dates = sorted(options_dict.keys())
+    offsets = date_offsets(options_df)
+    option_dates = offsets["dates"]
     min_date = np.min(option_dates)
     max_date = np.max(option_dates)
 
@@ -113,21 +194,25 @@ def remove_split_error_options(options_dict, hist_closing_df, logger):
 
     # If no split occurred, return raw options. (Could lead to flaws if split occurs just before "first date")
     if split_df.shape[0] == 0:
-        logger.info(f"No stock splits detected in [{min_date}, {max_date})")
-        clean_options_dict = options_dict
-        return clean_options_dict
+        logger.info(f"No stock splits detected in [{min_date:%Y-%m-%d}, {max_date:%Y-%m-%d})")
+        return {"clean df": options_df, "sections dict": sections_dict}
     else:
-        logger.info(f"Detected split dates: {list(split_df['date'])}")
+        logger.info(f"Detected split dates: {list(split_df['date'].dt.strftime('%Y-%m-%d'))}")
 
     # Create split ratios df, use pre-split dates to adjust presplit spreads
     split_ratios_df = presplit_df[["adjustment factor"]] / split_df[["adjustment factor"]]
     split_ratios_df["date"] = presplit_df["date"]
     split_ratios_df.rename(columns={"adjustment factor": "split ratio"}, inplace=True)
 
+    # Row offsets of each data date
+    date_index_dict = {date: i for i, date in enumerate(option_dates)}
+
     # Capture pre split date spreads into dict
     for my_date in presplit_df["date"]:
         # Get presplit option spread
-        presplit_options = options_dict[my_date][["expiration date", "tag", "strike price"]].copy()
+        i = date_index_dict[my_date]
+        presplit_options = options_df.iloc[offsets["starts"][i]:offsets["stops"][i]][
+            ["expiration date", "tag", "strike price"]].copy()
         split_ratio = float(split_ratios_df[split_ratios_df["date"] == my_date]["split ratio"])
 
         # Add expected strike prices after adjustment
@@ -137,243 +222,158 @@ def remove_split_error_options(options_dict, hist_closing_df, logger):
         # Add to dict
         presplit_options_dict[my_date] = presplit_options
 
-    # Bin option data by split dates
-    for my_date in option_dates:
-        # Drop split date options - too inconsistent to use
-        if my_date not in list(split_df["date"]):
-            # Get the most recent pre-split date
-            presplit_date = np.max(split_ratios_df[split_ratios_df["date"] < my_date]["date"])
-
-            # If no pre-split date, return original
-            if not isinstance(presplit_date, datetime.date):
-                clean_options_dict[my_date] = options_dict[my_date]
-            # If pre-split date found, add {date: options_df} dictionary to pre-split dictionary
-            else:
-                if presplit_date in split_agg_dict.keys():
-                    split_agg_dict[presplit_date].update({my_date: options_dict[my_date]})
-                else:
-                    split_agg_dict[presplit_date] = {my_date: options_dict[my_date]}
-
-    # Convert pre-split dictionary into list for each section to be processed in parallel
-    for my_date in split_agg_dict.keys():
-        input_list.append({"options dict": split_agg_dict[my_date],
-                           "pre-split date": my_date,
-                           "pre-split df": presplit_options_dict[my_date]})
-
-    # Create as many threads as splits
-    my_pool = Pool(len(split_agg_dict.keys()))
-
-    # Multithread options cleaning
-    clean_options_dict_list = my_pool.map(remove_split_error_options_multi, input_list)
-
-    for n in clean_options_dict_list:
-        # Log message if any
-        [logger.info(my_message) for my_message in n["messages"]]
+    # Drop split date options - too inconsistent to use
+    options_df = options_df[~options_df["date"].isin(split_df["date"])]
 
-        # Aggregate "sections" into one dictionary
-        clean_options_dict.update(n["dict"])
+    # Bin option data by split dates, index of the most recent pre-split date (-1 if none)
+    presplit_dates = pd.DatetimeIndex(split_ratios_df["date"])
+    section_index = presplit_dates.searchsorted(options_df["date"].values, side="left") - 1
 
-    logger.info(f"Removing error options - {round(time.time() - start_time, 2)} seconds")
+    # If no pre-split date, return original
+    clean_list = [options_df[section_index == -1]]
 
-    return clean_options_dict
+    # Each section to be processed in parallel
+    for i, my_date in enumerate(presplit_dates):
+        section_df = options_df[section_index == i]
 
+        if section_df.shape[0] > 0:
+            input_list.append({"options df": section_df,
+                               "pre-split date": my_date,
+                               "pre-split df": presplit_options_dict[my_date]})
 
-def adjust_options(options_dict, hist_closing_df, logger):
-    """
-    Remove data dates without historical closing prices. Check if sum
-    of volume is 0 on any data date. Adjust option features based on
-    cumulative split factor.
+    # Multithread options cleaning, at most one worker per split section
+    with Executor(num_workers=max(min(len(input_list), Executor.default_num_workers()), 1)) as executor:
+        clean_options_list = executor.map(remove_split_error_options_multi, input_list, chunk_size=1)
+        executor.log_timing(logger)
 
-    :param options_dict: dictionary of date options (dict)
-    :param hist_closing_df: historical end of day prices (DataFrame)
-    :param logger: logger to record system outputs
-    :return: {options_dict (valid date options, dict), errors_dict (invalid date options, dict)}
-    """
-
-    # Housekeeping variables
-    errors_dict = dict()
-    start_time = time.time()
-
-    # All dates
-    data_dates = options_dict.keys()
-    hist_closing_dates = list(hist_closing_df["date"])
-
-    error_dates = [n for n in data_dates if n not in hist_closing_dates]
-
-    for date in error_dates:
-        logger.info(f"Data date {date} is not in historical closing! Saving to errors")
-
-        # Add to errors
-        errors_dict[date] = options_dict[date]
-
-        # Remove key-value pair from dict
-        options_dict.pop(date)
-
-    for date in options_dict.keys():
-        # Sanity check
-        if options_dict[date]["volume"].sum() == 0:
-            logger.warning(f"Cumulative sum of volume on {date} is 0!")
-
-        cumulative_adj_ratio = float(hist_closing_df[hist_closing_df["date"] == date]["adjustment factor"])
+    for n in clean_options_list:
+        # Log message if any
+        [logger.info(my_message) for my_message in n["messages"]]
 
-        options_dict[date][["strike price", "ask price", "bid price", "last price"]] = \
-            options_dict[date][["strike price", "ask price", "bid price", "last price"]] / cumulative_adj_ratio
+        clean_list.append(n["df"])
+        sections_dict[n["pre-split date"]] = n["complete date"]
 
-        options_dict[date][["ask size", "bid size", "volume", "open interest"]] = \
-            options_dict[date][["ask size", "bid size", "volume", "open interest"]] * cumulative_adj_ratio
+    # Aggregate "sections" into one table
+    clean_options_df = pd.concat(clean_list, ignore_index=True).sort_values(
+        by="date", kind="stable", ignore_index=True)
 
-    logger.info(f"Applying split adjustment factor - {round(time.time() - start_time, 2)} seconds")
+    logger.info(f"Removing error options - {round(time.time() - start_time, 2)} seconds")
 
-    return {"adj dict": options_dict, "errors dict": errors_dict}
+    return {"clean df": clean_options_df, "sections dict": sections_dict}
 
 
-def attach_dividends(options_dict, dividends_df, logger):
+def enrich_options(options_df, price_calendar, logger, split_adjust=True):
     """
-    Fix options with error expiry dates. Attach amount of priced-in dividends
-    on data & expiration dates for all options.
-
-    :param options_dict: dictionary of date options (dict)
-    :param dividends_df: historical and future enf of day priced-in dividends (DataFrame)
+    Enrich options with split adjustments, dividends and end of day prices in a few whole-table joins.
+        1. Remove data dates without historical closing prices (saved to errors). Check if sum
+           of volume is 0 on any data date. Adjust option features based on cumulative split factor.
+        2. Fix options with error expiry dates. Attach amount of priced-in dividends
+           on data & expiration dates for all options.
+        3. Attach end of day closing prices of data & expiration dates. Split options into those
+           which are complete (expiration date has passed), and those who are incomplete
+           (expiration date is in the future).
+
+    :param options_df: options sorted by data date (DataFrame)
+    :param price_calendar: end of day prices & priced-in dividends (PriceCalendar)
     :param logger: logger to record system outputs
-    :return: options_dict: dictionary of date options (dict)
+    :param split_adjust: apply cumulative split factor, False if options are already adjusted (bool)
+    :return: {complete_df (complete options, DataFrame), incomplete_df (ongoing options, DataFrame),
+              errors_df (invalid date options, DataFrame)}
     """
 
     # Housekeeping variables
     start_time = time.time()
 
-    for date in options_dict.keys():
-
-        date_options = options_dict[date].copy()
+    # 1. Cumulative split factor of each option (NaN if data date has no closing price)
+    cumulative_adj_ratio = pd.Series(price_calendar.adjustment_factor(options_df["date"]), index=options_df.index)
 
-        exp_dates = set(date_options["expiration date"])
+    error_filter = cumulative_adj_ratio.isna()
 
-        error_exp_dates = [n for n in exp_dates if (n not in list(dividends_df["date"]))]
+    for date in pd.DatetimeIndex(np.unique(options_df[error_filter]["date"])):
+        logger.info(f"Data date {date:%Y-%m-%d} is not in historical closing! Saving to errors")
 
-        # Fix error exp dates
-        for exp_date in error_exp_dates:
-            logger.info(f"Exp date {exp_date} is not in historical closing! Trying the day before...")
-            new_exp_date = exp_date + datetime.timedelta(days=-1)
-            # Sanity check
-            assert (new_exp_date in list(dividends_df["date"])), f"{new_exp_date} still does not have closing price!"
-            # replace exp date in options
-            date_options.loc[date_options["expiration date"] == exp_date, "expiration date"] = new_exp_date
+    # Move to errors
+    errors_df = options_df[error_filter].reset_index(drop=True)
+    options_df = options_df[~error_filter].reset_index(drop=True)
+    cumulative_adj_ratio = cumulative_adj_ratio[~error_filter].reset_index(drop=True)
 
-        # Add data date dividends
-        date_options = date_options.merge(dividends_df, how="left",
-                                          on="date")
+    # Sanity check
+    volume_sum = options_df.groupby("date")["volume"].sum()
+    for date in volume_sum[volume_sum == 0].index:
+        logger.warning(f"Cumulative sum of volume on {date:%Y-%m-%d} is 0!")
 
-        date_options.rename(columns={"dividend": "date div"}, inplace=True)
+    if split_adjust:
+        options_df[["strike price", "ask price", "bid price", "last price"]] = \
+            options_df[["strike price", "ask price", "bid price", "last price"]].div(cumulative_adj_ratio, axis=0)
 
-        # Add exp date dividends
-        date_options = date_options.merge(dividends_df, how="left",
-                                          left_on="expiration date", right_on="date")
+        options_df[["ask size", "bid size", "volume", "open interest"]] = \
+            options_df[["ask size", "bid size", "volume", "open interest"]].mul(cumulative_adj_ratio, axis=0)
 
-        # Drop extra column from merge
-        date_options.drop(columns="date_y", inplace=True)
+    options_df = set_option_dtypes(options_df, adjusted=True)
 
-        date_options.rename(columns={"dividend": "exp date div",
-                                     "date_x": "date"}, inplace=True)
+    # 2. Fix error exp dates
+    exp_dates = pd.DatetimeIndex(np.unique(options_df["expiration date"]))
+    error_exp_dates = exp_dates[~price_calendar.contains("dividend", exp_dates)]
 
+    for exp_date in error_exp_dates:
+        logger.info(f"Exp date {exp_date:%Y-%m-%d} is not in historical closing! Trying the day before...")
+        new_exp_date = exp_date + datetime.timedelta(days=-1)
         # Sanity check
-        assert not (date_options.isna().any(axis=1)).any(), f"Some data / exp dates in {date} don't have dividends!"
-
-        # Cast back into dictionary
-        options_dict[date] = date_options
-
-    logger.info(f"Attaching dividends - {round(time.time() - start_time, 2)} seconds")
+        assert price_calendar.contains("dividend", new_exp_date), \
+            f"{new_exp_date:%Y-%m-%d} still does not have closing price!"
+        # replace exp date in options
+        options_df.loc[options_df["expiration date"] == exp_date, "expiration date"] = new_exp_date
 
-    return options_dict
+    # Add data & exp date dividends
+    options_df["date div"] = price_calendar.dividend(options_df["date"])
+    options_df["exp date div"] = price_calendar.dividend(options_df["expiration date"])
 
+    # Sanity check
+    na_filter = options_df.isna().any(axis=1)
+    assert not na_filter.any(), \
+        f"Some data / exp dates in {list(np.unique(options_df[na_filter]['date']))} don't have dividends!"
 
-def attach_eod_prices(options_dict, hist_closing_df, logger):
-    """
-    Split options into those which are complete (expiration date has passed),
-    and those who are incomplete (expiration date is in the future).
-    Attach end of day closing prices as appropriate.
-
-    :param options_dict: dictionary of date options (dict)
-    :param hist_closing_df: historical end of day prices (DataFrame)
-    :param logger: logger to record system outputs
-    :return: {complete_dict (complete options, dict), incomplete_dict (ongoing options, dict)}
-    """
-
-    # Housekeeping variables
-    complete_dict = dict()
-    incomplete_dict = dict()
-    start_time = time.time()
-
-    for date in options_dict.keys():
-        date_options = options_dict[date].copy()
+    # 3. Add data & exp date close
+    options_df["date close"] = price_calendar.close(options_df["date"])
+    options_df["exp date close"] = price_calendar.close(options_df["expiration date"])
 
-        # Add date close
-        date_options["date close"] = float(hist_closing_df[hist_closing_df["date"] == date]["close"])
+    na_filter = options_df.isna().any(axis=1)
 
-        # Add exp date close
-        date_options = date_options.merge(hist_closing_df[["date", "close"]], how="left",
-                                          left_on="expiration date", right_on="date",
-                                          validate="m:1")
+    complete_df = options_df[~na_filter].reset_index(drop=True)
 
-        # Drop extra column from merge
-        date_options.drop(columns="date_y", inplace=True)
+    incomplete_df = options_df[na_filter].drop(columns=["exp date close"]).reset_index(drop=True)
 
-        date_options.rename(columns={"close": "exp date close",
-                                     "date_x": "date"}, inplace=True)
+    logger.info(f"Enriching options - {round(time.time() - start_time, 2)} seconds")
 
-        na_filter = date_options.isna().any(axis=1)
+    return {"complete df": complete_df, "incomplete df": incomplete_df, "errors df": errors_df}
 
-        complete_df = date_options[~na_filter]
 
-        incomplete_df = date_options[na_filter].drop(columns=["exp date close"])
-
-        # Sanity check
-        assert complete_df.shape[0] + incomplete_df.shape[0] == date_options.shape[0]
-
-        if complete_df.shape[0] > 0:
-            complete_dict[date] = complete_df
-
-        if incomplete_df.shape[0] > 0:
-            incomplete_dict[date] = incomplete_df
-
-    logger.info(f"Attaching end of day prices - {round(time.time() - start_time, 2)} seconds")
-
-    return {"complete dict": complete_dict, "incomplete dict": incomplete_dict}
-
-
-def save_by_year(complete_dict, incomplete_dict, errors_dict, ticker, save_dir, logger):
+def save_by_year(complete_df, incomplete_df, errors_df, ticker, store, logger):
     """
     For each of "complete", "incomplete", and "error" options, aggregate by
-    year and save to appropriate directory.
+    year and save as table "<year>/<ticker>_<year>_<type>".
 
-    :param complete_dict: dictionary of complete options (dict)
-    :param incomplete_dict: dictionary of incomplete options (dict)
-    :param errors_dict: dictionary of error options (dict)
+    :param complete_df: complete options (DataFrame)
+    :param incomplete_df: incomplete options (DataFrame)
+    :param errors_df: error options (DataFrame)
     :param ticker: ticker symbol (str)
-    :param save_dir: path to save aggregated DataFrame (str)
+    :param store: ticker adjusted options tables (TableStore)
     :param logger: logger to record system outputs
     :return: None
     """
     # Housekeeping variables
     start_time = time.time()
 
-    for n in [{"data": complete_dict, "type": "complete"},
-              {"data": incomplete_dict, "type": "incomplete"},
-              {"data": errors_dict, "type": "errors"}]:
-
-        year_dict = dict()
+    for n in [{"data": complete_df, "type": "complete"},
+              {"data": incomplete_df, "type": "incomplete"},
+              {"data": errors_df, "type": "errors"}]:
 
-        for date in n["data"].keys():
-            year = str(date.year)
-            if year not in year_dict.keys():
-                year_dict[year] = n["data"][date]
-            else:
-                year_dict[year] = year_dict[year].append(n["data"][date], ignore_index=True)
+        data_years = pd.to_datetime(n["data"]["date"]).dt.year
 
-        for year in year_dict.keys():
-            year_dict[year].sort_values(by=["date", "expiration date", "strike price"], inplace=True)
+        for year, year_df in n["data"].groupby(data_years):
+            year = str(year)
+            year_df = year_df.sort_values(by=["date", "expiration date", "strike price"])
 
-            Path(os.path.join(save_dir, year)).mkdir(exist_ok=True)
-            year_dict[year].to_csv(
-                path_or_buf=os.path.join(save_dir, year, f"{ticker}_{year}_{n['type']}.csv"),
-                index=False)
+            store.write(year_df, os.path.join(year, f"{ticker}_{year}_{n['type']}"))
 
     logger.info(f"Aggregating and saving data - {round(time.time() - start_time, 2)} seconds")
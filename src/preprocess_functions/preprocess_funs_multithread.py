@@ -1,40 +1,151 @@
 import numpy as np
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .option_schema import raw_option_columns, option_dtypes, store_option_dtypes, option_columns, tag_dtype, \
+    set_option_dtypes
+
+
+def ingest_options_multi(input_dict):
+    """
+    Convert a raw (full market) day file into the columnar option store.
+        1. Keep only the columns used downstream, cast to the compact option schema (see `option_schema`).
+           Missing values & unknown option types are kept, they are handled per ticker (see `format_options`)
+        2. Uppercase symbols and sort by symbol, so each row group covers a narrow range of tickers
+        3. Write to Parquet, dates as day numbers (row group statistics let readers skip other tickers' rows)
+
+    :param input_dict: {raw_path, store_path, row_group_size} (dict)
+    :return: {path, rows, messages} (dict)
+    """
+    # Unpack
+    raw_path = input_dict["raw_path"]
+    store_path = input_dict["store_path"]
+    row_group_size = input_dict["row_group_size"]
+
+    output_msg = []
+
+    # Load file
+    day_options_df = pd.read_csv(os.path.abspath(raw_path),
+                                 usecols=["symbol", "datadate", "expirationdate", "putcall", "strikeprice",
+                                          "askprice", "asksize", "bidprice", "bidsize", "lastprice", "volume",
+                                          "openinterest", "optionkey", "underlyingprice"])
+
+    # Typed columns
+    day_options_df["symbol"] = day_options_df["symbol"].str.upper()
+    day_options_df["putcall"] = day_options_df["putcall"].str.lower()
+    day_options_df["datadate"] = pd.to_datetime(day_options_df["datadate"])
+    day_options_df["expirationdate"] = pd.to_datetime(day_options_df["expirationdate"])
+    day_options_df = day_options_df.astype({**store_option_dtypes, "underlyingprice": float})
+
+    # Sort by symbol (file order is kept within each symbol)
+    day_options_df.sort_values(by="symbol", kind="stable", ignore_index=True, inplace=True)
+
+    if day_options_df.empty:
+        output_msg.append(f"No option data found in {raw_path}!")
+
+    # Write to temporary file first, a partially written file is never mistaken as ingested
+    day_options_table = pa.Table.from_pandas(day_options_df, preserve_index=False)
+    store_schema = day_options_table.schema
+    for col in ["datadate", "expirationdate"]:
+        store_schema = store_schema.set(store_schema.get_field_index(col), pa.field(col, pa.date32()))
+
+    temp_path = f"{store_path}.tmp"
+    pq.write_table(day_options_table.cast(store_schema), temp_path,
+                   row_group_size=row_group_size, compression="snappy")
+    os.replace(temp_path, store_path)
+
+    return {"path": raw_path, "rows": day_options_df.shape[0], "messages": output_msg}
 
 
 def read_and_format_multi(input_dict):
     """
+    Read day file once, and for every ticker of interest:
     1. Filter for ticker options in raw data
     2. Reformat columns
     3. Remove true duplicates & fix error duplicates
     4. Select and rename columns
 
-    :param input_dict: {stock_of_interest, data_path, [year, month, day]} (dict)
-    :return: {options_df, date, messages} (dict)
+    :param input_dict: {tickers, data_path, file, [year, month, day], from_store} (dict)
+    :return: {file, {ticker: {options_df, date}}, messages} (dict)
     """
     # Unpack
     option_data_path = input_dict["data_path"]
-    ticker = input_dict["ticker"]
+    tickers = input_dict["tickers"]
     ymd = input_dict["ymd"]
+    from_store = input_dict["from_store"]
 
+    output_dict = dict()
     output_msg = []
 
-    # Load file
-    day_options_df = pd.read_csv(os.path.abspath(os.path.join(option_data_path, ymd[0], ymd[1], ymd[2])))
+    # Load file. From the columnar store, only row groups that can contain the tickers are read
+    day_path = os.path.abspath(os.path.join(option_data_path, ymd[0], ymd[1], ymd[2]))
+    if from_store:
+        day_options_df = pq.read_table(day_path, filters=[("symbol", "in", tickers)]).to_pandas(date_as_object=False)
+    else:
+        day_options_df = pd.read_csv(day_path)
+
+    # Fan out rows by ticker
+    day_symbols = day_options_df["symbol"].str.upper()
+    ticker_groups = dict(list(day_options_df[day_symbols.isin(tickers)].groupby(day_symbols)))
+
+    for ticker in tickers:
+        # Filter for ticker
+        options_df = ticker_groups.get(ticker, day_options_df.iloc[0:0]).copy()
+
+        options_df = format_options(options_df=options_df, ticker=ticker, day=ymd[2], output_msg=output_msg)
+
+        # Check if data date is unique & get data date
+        data_date_list = np.unique(options_df["date"])
+        if len(data_date_list) == 0:
+            output_msg.append(f"No {ticker} option data found in {ymd[2]}!")
+            # Get data date using options from other tickers in that file
+            if from_store and day_options_df.empty:
+                day_options_df = pq.read_table(day_path, columns=["datadate"]).to_pandas(date_as_object=False)
+            all_dates = pd.to_datetime(day_options_df["datadate"])
+            data_date_list = np.unique(all_dates)
+
+        # Sanity check
+        if len(data_date_list) != 1:
+            raise SystemExit(f"Data dates: {data_date_list}. Should be unique!")
+        else:
+            data_date = pd.Timestamp(data_date_list[0])
+
+        output_dict[ticker] = {"df": options_df, "date": data_date}
 
-    # Filter for ticker
-    options_df = day_options_df[day_options_df["symbol"].str.upper() == ticker].copy()
+    return {"file": input_dict["file"], "dict": output_dict, "messages": output_msg}
+
+
+def format_options(options_df, ticker, day, output_msg):
+    """
+    Format options of a single ticker from a single day file. Remove true duplicates & fix error duplicates.
 
+    :param options_df: raw options of ticker (DataFrame)
+    :param ticker: ticker symbol (str)
+    :param day: day file name, used in messages (str)
+    :param output_msg: list to append messages to (list)
+    :return: options_df: formatted options (DataFrame)
+    """
     # Format ticker to uppercase
     options_df["symbol"] = options_df["symbol"].str.upper()
 
     # Change to datetime, option type to lowercase, negative volume to positive
-    options_df["datadate"] = pd.to_datetime(options_df["datadate"]).dt.date
-    options_df["expirationdate"] = pd.to_datetime(options_df["expirationdate"]).dt.date
+    options_df["datadate"] = pd.to_datetime(options_df["datadate"])
+    options_df["expirationdate"] = pd.to_datetime(options_df["expirationdate"])
     options_df["putcall"] = options_df["putcall"].str.lower()
     options_df["volume"] = np.abs(options_df["volume"])
 
+    # Drop options that do not fit the compact schema: unknown option type, missing sizes or open interest
+    size_cols = [raw for raw, col in raw_option_columns.items() if option_dtypes[col] == np.int32]
+    unknown_tag_filter = ~options_df["putcall"].isin(tag_dtype.categories).values
+    invalid_filter = unknown_tag_filter | options_df[size_cols].isna().any(axis=1).values
+
+    if invalid_filter.any():
+        unknown_tags = sorted(set(options_df["putcall"][unknown_tag_filter].astype(str)))
+        output_msg.append(f"Dropped {invalid_filter.sum()} {ticker} options with unknown option type "
+                          f"{unknown_tags} or missing sizes / volume / open interest in {day}!")
+        options_df = options_df[~invalid_filter]
+
     # Remove true duplicates (Normally, if `split adjusted strike`==`error raw strike`, open interest shouldn't be same)
     options_df.drop_duplicates(subset=["optionkey", "openinterest"], keep="first",
                                ignore_index=True, inplace=True)
@@ -45,76 +156,66 @@ def read_and_format_multi(input_dict):
 
     # Decide which of the duplicates to keep
     if dup_options_filter.any():
-        output_msg.append(f"Duplicate {ticker} option data found in {ymd[2]}!")
+        output_msg.append(f"Duplicate {ticker} option data found in {day}!")
         nodup_options = options_df[~dup_options_filter]
-        dup_options = options_df[dup_options_filter]
-        kept_dup = pd.DataFrame()
+        dup_options = options_df[dup_options_filter & options_df["optionkey"].notna()]
+        dup_keys = dup_options["optionkey"]
 
-        for option_key in list(set(dup_options["optionkey"])):
-            temp_dup = dup_options[dup_options["optionkey"] == option_key].copy()
-            if (temp_dup["putcall"] == "call").all():
-                temp_dup["moneyness"] = temp_dup["underlyingprice"] - temp_dup["askprice"] - temp_dup["strikeprice"]
-            else:
-                temp_dup["moneyness"] = temp_dup["strikeprice"] - temp_dup["askprice"] - temp_dup["underlyingprice"]
+        # Moneyness of calls if all options of key are calls, otherwise of puts
+        is_call = (dup_options["putcall"] == "call").groupby(dup_keys, sort=False).transform("all")
+        moneyness = pd.Series(np.where(is_call,
+                                       dup_options["underlyingprice"] - dup_options["askprice"] -
+                                       dup_options["strikeprice"],
+                                       dup_options["strikeprice"] - dup_options["askprice"] -
+                                       dup_options["underlyingprice"]),
+                              index=dup_options.index)
 
-            # Keep the option with less "moneyness"
-            kept_dup = kept_dup.append(
-                temp_dup[temp_dup["moneyness"] == temp_dup["moneyness"].min()].drop(columns="moneyness"))
+        # Keep the option(s) with less "moneyness" per key
+        kept_dup = dup_options[moneyness == moneyness.groupby(dup_keys, sort=False).transform("min")]
 
         # Add "selected" dup to non-dups
-        options_df = nodup_options.append(kept_dup)
+        options_df = pd.concat([nodup_options, kept_dup])
 
     # Drop erroneous options where "data date" > "expiration date"
     options_df = options_df[options_df["datadate"] <= options_df["expirationdate"]]
 
     # Drop columns
-    options_df.drop(columns=["optionkey", "symbol", "underlyingprice"], inplace=True)
+    options_df = options_df.drop(columns=["optionkey", "symbol", "underlyingprice"])
 
     # Rename columns
-    options_df.rename(columns={"datadate": "date",
-                               "expirationdate": "expiration date",
-                               "putcall": "tag",
-                               "strikeprice": "strike price",
-                               "askprice": "ask price",
-                               "asksize": "ask size",
-                               "bidprice": "bid price",
-                               "bidsize": "bid size",
-                               "lastprice": "last price",
-                               "openinterest": "open interest"},
-                      inplace=True)
-
-    # Reorder columns
-    options_df = options_df[["date", "expiration date", "tag", "strike price", "ask price", "ask size", "bid price",
-                             "bid size", "last price", "volume", "open interest"]]
+    options_df = options_df.rename(columns=raw_option_columns)
+
+    # Reorder columns, compact schema
+    options_df = set_option_dtypes(options_df[option_columns])
 
     # Sort
-    options_df.sort_values(by=["expiration date", "strike price", "tag"], ignore_index=True, inplace=True)
-
-    # Check if data date is unique & get data date
-    data_date_list = np.unique(options_df["date"])
-    if len(data_date_list) == 0:
-        output_msg.append(f"No {ticker} option data found in {ymd[2]}!")
-        # Get data date using options from other tickers in that file
-        all_dates = pd.to_datetime(day_options_df["datadate"]).dt.date
-        data_date_list = np.unique(all_dates)
-
-    # Sanity check
-    if len(data_date_list) != 1:
-        raise SystemExit(f"Data dates: {data_date_list}. Should be unique!")
-    else:
-        data_date = data_date_list[0]
+    options_df = options_df.sort_values(by=["expiration date", "strike price", "tag"], ignore_index=True)
+
+    return options_df
+
 
-    return {"df": options_df, "date": data_date, "messages": output_msg}
+def date_offsets(options_df):
+    """
+    Row offsets of each data date in a date-sorted options table.
+    Options of `dates[i]` are rows [starts[i], stops[i]).
+
+    :param options_df: options sorted by data date (DataFrame)
+    :return: {dates (DatetimeIndex), starts (np.array), stops (np.array)} (dict)
+    """
+    dates, starts = np.unique(options_df["date"].values, return_index=True)
+    stops = np.append(starts[1:], options_df.shape[0])
+
+    return {"dates": pd.DatetimeIndex(dates), "starts": starts, "stops": stops}
 
 
 def remove_split_error_options_multi(input_dict):
     """
-    For every "date" in "batch" options_df_list, we have:
+    Classify every option in "section" options_df at once:
 
     Options filter process
         1. Filter for options that overlap in expiry dates as those in the presplit
             - KEEP options with "new" expiry dates (assume no errors)
-        2. For the remaining, merge current date strikes with adjusted presplit strikes (correctly adjusted options)
+        2. For the remaining, merge strikes with adjusted presplit strikes (correctly adjusted options)
             - KEEP options with successful merges
         3. For the remaining, merge with min/max raw and adjusted strikes per exp date
             - Define the following:
@@ -124,26 +225,27 @@ def remove_split_error_options_multi(input_dict):
                 - unnatural: option strike is closer to raw min/max strike than adj min/max strike
             - KEEP active OR natural options
 
-    Track exp dates of error options (inactive AND unnatural), check that it is monotonically decreasing
+    Error options are those inactive AND unnatural. The first date without error options is the "complete" date,
+    the filter is applied up to (and including) it, while options of later dates are passed on as is.
 
-    Only when a date yields no error options, will we stop checking in future dates (straight pipe to output
-    via `is_complete`).
+    Track exp dates of error options, check that they are a subset of the previous date's.
 
-    :param input_dict: {options_dict, presplit_date, presplit_df} (dict)
-    :return: {clean_options_dict, messages} (dict)
+    :param input_dict: {options_df (sorted by date), presplit_date, presplit_df} (dict)
+    :return: {clean_options_df, presplit_date, complete_date (None if errors remain), messages} (dict)
     """
     # Unpack
-    options_dict = input_dict["options dict"]
+    options_df = input_dict["options df"].reset_index(drop=True)
     presplit_date = input_dict["pre-split date"]
     presplit_df = input_dict["pre-split df"].copy()
 
     # Bookkeeping variables
-    clean_options_dict = dict()
-    is_complete = False
+    complete_date = None
     output_msg = []
 
-    # Sorted data dates (for sequential processing)
-    sorted_data_dates = sorted(options_dict.keys())
+    # Data date offsets, and date position of every option
+    offsets = date_offsets(options_df)
+    num_dates = offsets["dates"].shape[0]
+    date_position = np.repeat(np.arange(num_dates), offsets["stops"] - offsets["starts"])
 
     # Get max and min raw/adj strike prices per expiration date
     presplit_max_min_strikes_df = presplit_df.groupby(by=["expiration date"]).agg(
@@ -155,100 +257,104 @@ def remove_split_error_options_multi(input_dict):
     presplit_max_min_strikes_df.reset_index(inplace=True)
 
     # Exp dates on presplit date
-    presplit_exp_dates = list(np.unique(presplit_df["expiration date"]))
-
-    # Exp dates that still contain erroneous options, bookkeeping
-    error_exp_dates = presplit_exp_dates
-
-    # Sequential processing of date options
-    for data_date in sorted_data_dates:
-        date_options_df = options_dict[data_date]
-
-        # See if all error options have been removed already
-        if is_complete:
-            clean_options_dict[data_date] = date_options_df
-            continue
-
-        # To store all options to be kept in date, bookkeeping
-        clean_df = pd.DataFrame()
-        # columns to be kept
-        base_cols = date_options_df.columns
-
-        # Options with new exp dates, add to kept options (REF #1)
-        overlap_filter = date_options_df["expiration date"].isin(presplit_exp_dates)
-        exp_no_overlap_options_df = date_options_df[~overlap_filter].copy()
-        clean_df = clean_df.append(exp_no_overlap_options_df[base_cols])
-
-        # Otherwise, keep going
-        exp_overlap_options_df = date_options_df[overlap_filter].copy()
-
-        # Sanity check. There should be some overlap in expiry dates (here, `is_complete` == False still)
-        assert exp_overlap_options_df.shape[0] > 0, \
-            f"Data date: {data_date}, Pre-split date: {presplit_date} \n" \
-            f"No overlap in exp dates occurred before all error options were removed! \n" \
-            f"Likely incorrect identification of error options."
-
-        # Merge strike and adj strike
-        adj_merge_df = exp_overlap_options_df.merge(
-            presplit_df[["expiration date", "tag", "adj strike price"]], how="left",
-            left_on=["expiration date", "tag", "strike price"],
-            right_on=["expiration date", "tag", "adj strike price"],
-            validate="1:1")
-
-        # Successful match, add to kept options (REF #2)
-        adj_merge_filter = adj_merge_df.isna().any(axis=1)
-        complete_adj_merge_df = adj_merge_df[~adj_merge_filter].copy()
-        clean_df = clean_df.append(complete_adj_merge_df[base_cols])
-
-        # Otherwise, keep going
-        incomplete_adj_merge_df = adj_merge_df[adj_merge_filter].copy()
-        incomplete_adj_merge_df = incomplete_adj_merge_df[base_cols]
-
-        # Add on min/max adj/raw strikes
-        max_min_strike_merge = incomplete_adj_merge_df.merge(presplit_max_min_strikes_df, how="left",
-                                                             on="expiration date",
-                                                             validate="m:1")
-
-        # Feature to identify if option is natural
-        max_min_strike_merge["raw strikes dist"] = np.minimum(
-            np.abs(max_min_strike_merge["strike price"] - max_min_strike_merge["raw_strike_min"]),
-            np.abs(max_min_strike_merge["strike price"] - max_min_strike_merge["raw_strike_max"])
-        )
-
-        max_min_strike_merge["adj strikes dist"] = np.minimum(
-            np.abs(max_min_strike_merge["strike price"] - max_min_strike_merge["adj_strike_min"]),
-            np.abs(max_min_strike_merge["strike price"] - max_min_strike_merge["adj_strike_max"])
-        )
-
-        # Filter for "active" AND/OR "natural" options, add to kept options (REF #3)
-        new_df = max_min_strike_merge[
-            (max_min_strike_merge["raw strikes dist"] > max_min_strike_merge["adj strikes dist"]) |
-            (max_min_strike_merge[["volume", "ask size", "bid size"]].sum(axis=1) > 0)]
-        clean_df = clean_df.append(new_df[base_cols])
-
-        # Filter for "inactive" AND "unnatural" options
-        errors_df = max_min_strike_merge[
-            (max_min_strike_merge["raw strikes dist"] <= max_min_strike_merge["adj strikes dist"]) &
-            (max_min_strike_merge[["volume", "ask size", "bid size"]].sum(axis=1) == 0)]
-
-        # Check how many error options remain in the data
-        if errors_df.shape[0] == 0:
-            # All error options have now been removed
-            is_complete = True
-            output_msg.append(f"Error options from pre-split {presplit_date} were completely removed on {data_date}!")
-        # Keep track of how many error dates left (not sure if needed, #???)
-        else:
-            new_error_exp_dates = list(np.unique(errors_df["expiration date"]))
+    presplit_exp_dates = np.unique(presplit_df["expiration date"])
+
+    # columns to be kept
+    base_cols = options_df.columns
+
+    # Options with new exp dates are kept (REF #1), otherwise keep going
+    overlap_filter = options_df["expiration date"].isin(presplit_exp_dates).values
+    exp_overlap_options_df = options_df[overlap_filter]
+
+    # Sanity check. Strikes should be unique per data date (one-to-one merge with presplit)
+    if exp_overlap_options_df.duplicated(subset=["date", "expiration date", "tag", "strike price"]).any():
+        raise pd.errors.MergeError("Merge keys are not unique in left dataset; not a one-to-one merge")
+
+    # Merge strike and adj strike
+    adj_merge_df = exp_overlap_options_df.merge(
+        presplit_df[["expiration date", "tag", "adj strike price"]], how="left",
+        left_on=["expiration date", "tag", "strike price"],
+        right_on=["expiration date", "tag", "adj strike price"],
+        validate="m:1")
+
+    # Successful match are kept (REF #2), otherwise keep going
+    adj_merge_filter = adj_merge_df.isna().any(axis=1).values
+
+    # Add on min/max adj/raw strikes
+    max_min_strike_merge = exp_overlap_options_df[["expiration date", "strike price"]].merge(
+        presplit_max_min_strikes_df, how="left", on="expiration date", validate="m:1")
+
+    # Feature to identify if option is natural
+    raw_strikes_dist = np.minimum(
+        np.abs(max_min_strike_merge["strike price"] - max_min_strike_merge["raw_strike_min"]),
+        np.abs(max_min_strike_merge["strike price"] - max_min_strike_merge["raw_strike_max"])
+    ).values
+
+    adj_strikes_dist = np.minimum(
+        np.abs(max_min_strike_merge["strike price"] - max_min_strike_merge["adj_strike_min"]),
+        np.abs(max_min_strike_merge["strike price"] - max_min_strike_merge["adj_strike_max"])
+    ).values
+
+    activity = exp_overlap_options_df[["volume", "ask size", "bid size"]].sum(axis=1).values
+
+    # "active" AND/OR "natural" options are kept (REF #3)
+    overlap_keep_filter = ~adj_merge_filter | (raw_strikes_dist > adj_strikes_dist) | (activity > 0)
+
+    # "inactive" AND "unnatural" options
+    overlap_error_filter = adj_merge_filter & (raw_strikes_dist <= adj_strikes_dist) & (activity == 0)
+
+    keep_filter = ~overlap_filter
+    keep_filter[overlap_filter] = overlap_keep_filter
+
+    error_filter = np.zeros(options_df.shape[0], dtype=bool)
+    error_filter[overlap_filter] = overlap_error_filter
+
+    # Number of overlapping / error options per data date
+    date_overlap_count = np.bincount(date_position, weights=overlap_filter, minlength=num_dates)
+    date_error_count = np.bincount(date_position, weights=error_filter, minlength=num_dates)
+
+    # First date without error options, all dates before it are filtered
+    no_error_dates = np.flatnonzero(date_error_count == 0)
+
+    if no_error_dates.shape[0] > 0:
+        num_filter_dates = no_error_dates[0] + 1
+        complete_date = offsets["dates"][no_error_dates[0]]
+    else:
+        num_filter_dates = num_dates
+
+    # Sanity check. There should be some overlap in expiry dates until all error options are removed
+    no_overlap_dates = np.flatnonzero(date_overlap_count[:num_filter_dates] == 0)
+    assert no_overlap_dates.shape[0] == 0, \
+        f"Data date: {offsets['dates'][no_overlap_dates[0]]:%Y-%m-%d}, Pre-split date: {presplit_date:%Y-%m-%d} \n" \
+        f"No overlap in exp dates occurred before all error options were removed! \n" \
+        f"Likely incorrect identification of error options."
+
+    # Check that error exp dates are a subset of the previous date's (first date: those on presplit date)
+    error_exp_df = pd.DataFrame({"date position": date_position[error_filter],
+                                 "expiration date": options_df["expiration date"].values[error_filter]})
+    error_exp_df = error_exp_df[error_exp_df["date position"] < num_filter_dates].drop_duplicates()
+
+    previous_error_exp_df = error_exp_df.assign(**{"date position": error_exp_df["date position"] + 1})
+
+    error_exp_df = error_exp_df.merge(previous_error_exp_df, how="left", indicator=True)
+
+    new_error_exp_positions = np.unique(error_exp_df[(error_exp_df["_merge"] == "left_only") &
+                                                     (error_exp_df["date position"] > 0)]["date position"])
+
+    for n in new_error_exp_positions:
+        output_msg.append(f"Error options with new exp dates appeared on {offsets['dates'][n]:%Y-%m-%d}! (Should NOT happen)")
+
+    if complete_date is not None:
+        output_msg.append(f"Error options from pre-split {presplit_date:%Y-%m-%d} were completely removed on "
+                          f"{complete_date:%Y-%m-%d}!")
 
-            # Check that new error exp dates are a subset of the old ones
-            if not all([n in error_exp_dates for n in new_error_exp_dates]):
-                output_msg.append(f"Error options with new exp dates appeared on {data_date}! (Should NOT happen)")
+    # Filter options up to complete date, pass on the rest
+    num_filter_rows = offsets["stops"][num_filter_dates - 1] if num_dates > 0 else 0
 
-            # update outstanding error exp dates
-            error_exp_dates = new_error_exp_dates
+    clean_df = options_df.iloc[:num_filter_rows][keep_filter[:num_filter_rows]][base_cols]
+    clean_df = clean_df.sort_values(by=["date", "expiration date", "strike price"], kind="stable")
 
-        # Sort cleaned options and add to dict
-        clean_df.sort_values(by=["expiration date", "strike price"], inplace=True, ignore_index=True)
-        clean_options_dict[data_date] = clean_df
+    clean_options_df = pd.concat([clean_df, options_df.iloc[num_filter_rows:]], ignore_index=True)
 
-    return {"dict": clean_options_dict, "messages": output_msg}
+    return {"df": clean_options_df, "pre-split date": presplit_date, "complete date": complete_date,
+            "messages": output_msg}
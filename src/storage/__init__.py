@@ -0,0 +1,3 @@
+from .table_store import TableStore, table_formats, is_date_column
+from .shared_tables import SharedTables, SharedTask, TableHandle, publish_table, attach_table, \
+    release_table
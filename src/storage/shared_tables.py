@@ -0,0 +1,147 @@
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import tempfile
+import uuid
+import weakref
+
+
+class TableHandle:
+    def __init__(self, path, columns, num_rows):
+        """
+        Reference to a table published as memory-mapped column arrays (see `publish_table`). Handles are small,
+        they are passed to / returned from pool workers instead of the table itself.
+
+        :param path: directory of column arrays (str)
+        :param columns: [[column, array file, categories (None if not categorical)], ...] (list)
+        :param num_rows: number of rows (int)
+        """
+        self.path = path
+        self.columns = columns
+        self.num_rows = num_rows
+
+
+def publish_table(df, directory, name=None):
+    """
+    Write table as one `.npy` array per column, to be memory-mapped by any process (see `attach_table`).
+    Categorical and object columns are stored as category codes.
+
+    :param df: table (DataFrame)
+    :param directory: directory of published tables (str)
+    :param name: table name, unique if None (str)
+    :return: TableHandle
+    """
+
+    if name is None:
+        name = f"{os.getpid()}_{uuid.uuid4().hex}"
+
+    path = os.path.join(directory, name)
+    os.mkdir(path)
+
+    columns = []
+
+    for n, col in enumerate(df.columns):
+        values = df[col]
+        categories = None
+
+        if (values.dtype == object) or isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype("category")
+            categories = list(values.cat.categories)
+            values = values.cat.codes
+
+        file_name = f"{n}.npy"
+        np.save(os.path.join(path, file_name), values.values)
+        columns.append([col, file_name, categories])
+
+    return TableHandle(path=path, columns=columns, num_rows=df.shape[0])
+
+
+def attach_table(handle):
+    """
+    Map published table into memory. Column arrays are shared between processes (copy on write),
+    nothing is copied or unpickled.
+
+    :param handle: see `publish_table` (TableHandle)
+    :return: table (DataFrame)
+    """
+
+    columns_dict = dict()
+
+    for [col, file_name, categories] in handle.columns:
+        values = np.load(os.path.join(handle.path, file_name), mmap_mode="c")
+
+        if categories is not None:
+            values = pd.Categorical.from_codes(values, categories=categories)
+
+        columns_dict[col] = values
+
+    return pd.DataFrame(columns_dict, index=pd.RangeIndex(handle.num_rows), copy=False)
+
+
+def release_table(handle):
+    """
+    Remove published table. Memory is freed once no process has the table attached.
+
+    :param handle: see `publish_table` (TableHandle)
+    :return: None
+    """
+    shutil.rmtree(handle.path, ignore_errors=True)
+
+
+def _remove_directory(path, owner_pid):
+    # Only the creating process removes published tables (not forked pool workers)
+    if os.getpid() == owner_pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class SharedTables:
+    def __init__(self, root_dir=None):
+        """
+        Temporary directory of published tables, removed on `close` (or when the creating process exits).
+        Uses shared memory backed /dev/shm if available.
+
+        :param root_dir: parent directory, see `tempfile.mkdtemp` (str)
+        """
+
+        if (root_dir is None) and os.path.isdir("/dev/shm"):
+            root_dir = "/dev/shm"
+
+        self.path = tempfile.mkdtemp(prefix="shared_tables_", dir=root_dir)
+        self._finalizer = weakref.finalize(self, _remove_directory, self.path, os.getpid())
+
+    def publish(self, df, name=None):
+        """See `publish_table`"""
+        return publish_table(df, directory=self.path, name=name)
+
+    def release(self, handle):
+        """See `release_table`"""
+        release_table(handle)
+
+    def close(self):
+        self._finalizer()
+
+
+class SharedTask:
+    def __init__(self, function, directory):
+        """
+        Pool task exchanging tables through shared memory. Input dict values that are handles are attached
+        before calling `function`, output dict tables (also of nested output dicts, e.g. Gamma of `CalcDelta`)
+        are published to `directory` and returned as handles.
+
+        :param function: task, input dict -> output dict (callable)
+        :param directory: directory to publish output tables, see `SharedTables` (str)
+        """
+        self.function = function
+        self.directory = directory
+
+    def __call__(self, input_dict):
+        input_dict = {key: attach_table(value) if isinstance(value, TableHandle) else value
+                      for key, value in input_dict.items()}
+
+        return self._publish(self.function(input_dict))
+
+    def _publish(self, output_dict):
+        return {key: publish_table(value, directory=self.directory) if isinstance(value, pd.DataFrame) else
+                self._publish(value) if isinstance(value, dict) else value
+                for key, value in output_dict.items()}
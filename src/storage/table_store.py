@@ -0,0 +1,196 @@
+import os
+import pandas as pd
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def is_date_column(column):
+    """
+    Date columns are named "date" or "<...> date" (e.g. "expiration date", "pre-split date").
+
+    :param column: column name (str)
+    :return: bool
+    """
+    return (column == "date") or str(column).endswith(" date")
+
+
+class ParquetFormat:
+    """
+    Compressed columnar tables. Dates are stored as day numbers, column types (categorical, float32, etc.)
+    are kept. Reads only load the projected columns, and skip row groups outside of the date range.
+    """
+    extension = ".parquet"
+
+    def __init__(self, compression="snappy"):
+        self.compression = compression
+
+    def write(self, df, path):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        schema = table.schema
+        for n, field in enumerate(schema):
+            if is_date_column(field.name) and pa.types.is_timestamp(field.type):
+                schema = schema.set(n, pa.field(field.name, pa.date32()))
+
+        pq.write_table(table.cast(schema), path, compression=self.compression)
+
+    def read(self, path, columns=None, date_range=None):
+        filters = None
+
+        if date_range is not None:
+            filters = [("date", operator, pd.Timestamp(date).date())
+                       for operator, date in zip([">=", "<="], date_range) if date is not None]
+
+        return pq.read_table(path, columns=columns, filters=filters or None).to_pandas(date_as_object=False)
+
+
+class CsvFormat:
+    """
+    Plain text tables (export format). Column types other than dates are inferred when read.
+    """
+    extension = ".csv"
+
+    def write(self, df, path):
+        df.to_csv(path_or_buf=path, index=False)
+
+    def read(self, path, columns=None, date_range=None):
+        # Date range is filtered on data date, which has to be read
+        usecols = columns
+        if (columns is not None) and (date_range is not None) and ("date" not in columns):
+            usecols = columns + ["date"]
+
+        df = pd.read_csv(path, usecols=usecols)
+
+        for col in df.columns:
+            if is_date_column(col):
+                df[col] = pd.to_datetime(df[col])
+
+        if date_range is not None:
+            [start_date, end_date] = date_range
+            if start_date is not None:
+                df = df[df["date"] >= pd.Timestamp(start_date)]
+            if end_date is not None:
+                df = df[df["date"] <= pd.Timestamp(end_date)]
+
+        if columns is not None:
+            df = df[columns]
+
+        return df.reset_index(drop=True)
+
+
+# Supported table formats
+table_formats = {"parquet": ParquetFormat(),
+                 "csv": CsvFormat()}
+
+
+class TableStore:
+    def __init__(self, root, file_format="parquet"):
+        """
+        Named tables under a root directory, e.g. "2020/AAPL_2020_complete" -> "<root>/2020/AAPL_2020_complete.parquet".
+
+        Tables are written in `file_format`. Reads find a table in any supported format (`file_format` first),
+        so tables saved in another format (e.g. CSV of earlier runs) stay readable.
+
+        :param root: root directory of tables (str)
+        :param file_format: format tables are written in, see `table_formats` (str)
+        """
+
+        assert file_format in table_formats.keys(), \
+            f"Unknown table format: {file_format}! Choose from {list(table_formats.keys())}"
+
+        self.root = root
+        self.file_format = file_format
+
+        # Formats in lookup order
+        self.formats = [table_formats[file_format]] + \
+                       [fmt for name, fmt in table_formats.items() if name != file_format]
+
+    def find(self, name):
+        """
+        :param name: table name, relative to root (str)
+        :return: (path, format) of saved table, (None, None) if not present (tuple)
+        """
+
+        for fmt in self.formats:
+            path = os.path.join(self.root, f"{name}{fmt.extension}")
+            if os.path.isfile(path):
+                return path, fmt
+
+        return None, None
+
+    def exists(self, name):
+        return self.find(name)[0] is not None
+
+    def names(self, directory=""):
+        """
+        :param directory: directory relative to root (str)
+        :return: names of tables in directory, relative to root (sorted list)
+        """
+
+        if not os.path.isdir(os.path.join(self.root, directory)):
+            return []
+
+        extensions = {fmt.extension for fmt in self.formats}
+        names = set()
+
+        for file in os.listdir(os.path.join(self.root, directory)):
+            [file_name, extension] = os.path.splitext(file)
+            if extension in extensions:
+                names.add(os.path.join(directory, file_name))
+
+        return sorted(names)
+
+    def write(self, df, name):
+        """
+        Write table, copies of the table in other formats are removed.
+
+        :param df: table (DataFrame)
+        :param name: table name, relative to root (str)
+        :return: None
+        """
+
+        fmt = table_formats[self.file_format]
+        path = os.path.join(self.root, f"{name}{fmt.extension}")
+
+        Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
+
+        # Write to temporary file first, a partially written table is never read
+        temp_path = f"{path}.tmp"
+        fmt.write(df, temp_path)
+        os.replace(temp_path, path)
+
+        for other_fmt in self.formats[1:]:
+            other_path = os.path.join(self.root, f"{name}{other_fmt.extension}")
+            if os.path.isfile(other_path):
+                os.remove(other_path)
+
+    def read(self, name, columns=None, date_range=None):
+        """
+        Read table.
+
+        :param name: table name, relative to root (str)
+        :param columns: columns to load, all if None (list)
+        :param date_range: [start date, end date] (inclusive) of data dates to load, None for open ends (list)
+        :return: table (DataFrame)
+        """
+
+        path, fmt = self.find(name)
+
+        if path is None:
+            raise FileNotFoundError(f"Table {name} not found in {self.root}!")
+
+        return fmt.read(path, columns=columns, date_range=date_range)
+
+    def remove(self, name):
+        """
+        Remove table (all formats) if present.
+
+        :param name: table name, relative to root (str)
+        :return: None
+        """
+
+        for fmt in self.formats:
+            path = os.path.join(self.root, f"{name}{fmt.extension}")
+            if os.path.isfile(path):
+                os.remove(path)
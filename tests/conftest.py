@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Packages of src/ are imported top-level, as by the scripts in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
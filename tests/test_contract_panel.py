@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+from custom_features import delta_open_interest
+from greeks import lag_join
+
+contract_cols = ["expiration date", "tag", "strike price"]
+
+# [date, expiration date, tag, strike price, ask price, open interest] per option
+options_df = pd.DataFrame([
+    ["2020-01-02", "2020-01-03", "call", 100.0, 1.5, 10],
+    ["2020-01-02", "2020-02-21", "call", 100.0, 4.0, 20],
+    ["2020-01-02", "2020-02-21", "call", 105.0, 2.0, 30],
+    # Missing on next data date
+    ["2020-01-02", "2020-02-21", "put", 95.0, 1.0, 5],
+    ["2020-01-02", "2020-02-21", "put", 100.0, 2.5, 7],
+    ["2020-01-03", "2020-01-03", "call", 100.0, 1.2, 10],
+    ["2020-01-03", "2020-02-21", "call", 100.0, 4.2, 20],
+    ["2020-01-03", "2020-02-21", "call", 105.0, 2.1, 35],
+    ["2020-01-03", "2020-02-21", "put", 100.0, 2.4, 9],
+    # Duplicate contract
+    ["2020-01-03", "2020-02-21", "put", 100.0, 2.6, 9],
+    # New on 2020-01-03
+    ["2020-01-03", "2020-02-21", "put", 90.0, 0.5, 3],
+    ["2020-01-06", "2020-02-21", "call", 100.0, 4.1, 22],
+    ["2020-01-06", "2020-02-21", "call", 105.0, 2.2, 35],
+    ["2020-01-06", "2020-02-21", "put", 95.0, 0.9, 4],
+    ["2020-01-06", "2020-02-21", "put", 100.0, 2.3, 8],
+], columns=["date"] + contract_cols + ["ask price", "open interest"])
+
+options_df["date"] = pd.to_datetime(options_df["date"])
+options_df["expiration date"] = pd.to_datetime(options_df["expiration date"])
+
+
+def merge_dates(df, lag, how, latter_cols, fill_value):
+    """`pd.merge` of every data date with the data date `lag` trading dates later, one date pair at a time"""
+
+    dates = sorted(df["date"].unique())
+    latter_names = {col: f"latter {col}" for col in latter_cols}
+    output_list = []
+
+    for n in range(len(dates) - lag):
+        [t_0, t_1] = [dates[n], dates[n + lag]]
+
+        df_0 = df[(df["date"] == t_0) & (df["expiration date"] >= t_1)]
+        df_1 = df[df["date"] == t_1][contract_cols + list(latter_cols)].rename(columns=latter_names)
+
+        pair_df = df_0.merge(df_1, on=contract_cols, how=how, indicator=(how == "outer"))
+        pair_df["date"] = t_0
+        pair_df["latter date"] = t_1
+        pair_df["lag"] = lag
+
+        if how == "outer":
+            is_left_only = (pair_df["_merge"] == "left_only").values
+            pair_df.loc[is_left_only, list(latter_names.values())] = fill_value
+
+        output_list.append(pair_df)
+
+    return pd.concat(output_list, ignore_index=True)
+
+
+def sort_rows(df, columns):
+    sort_cols = ["lag", "date"] + contract_cols + [n for n in df.columns if n.startswith("latter ")]
+    return df[columns].sort_values(by=sort_cols, ignore_index=True)
+
+
+@pytest.mark.parametrize("how", ["inner", "outer"])
+@pytest.mark.parametrize("lags", [[1], [1, 2]])
+def test_lag_join_matches_merge(how, lags):
+    output_df = lag_join(options_df, lags=lags, how=how, latter_cols=["ask price", "open interest"])
+    expected_df = pd.concat([merge_dates(options_df, lag=lag, how=how, latter_cols=["ask price", "open interest"],
+                                         fill_value=np.nan) for lag in lags], ignore_index=True)
+
+    assert output_df.shape[0] == expected_df.shape[0]
+    pd.testing.assert_frame_equal(sort_rows(output_df, list(output_df.columns)),
+                                  sort_rows(expected_df, list(output_df.columns)), check_dtype=False)
+
+    # Sorted by lag & data date
+    pd.testing.assert_frame_equal(output_df, output_df.sort_values(by=["lag", "date"], kind="stable"))
+
+
+def test_lag_join_missing_contract():
+    output_df = lag_join(options_df, lags=[1], how="outer")
+    missing_df = output_df[(output_df["date"] == "2020-01-02") & (output_df["tag"] == "put") &
+                           (output_df["strike price"] == 95.0)]
+
+    assert missing_df["_merge"].tolist() == ["left_only"]
+    assert np.isnan(missing_df["latter ask price"]).all()
+
+    # Dropped by inner join, expired contracts are not joined
+    inner_df = lag_join(options_df, lags=[1], how="inner")
+    assert not ((inner_df["tag"] == "put") & (inner_df["strike price"] == 95.0)).any()
+    assert not (inner_df["expiration date"] < inner_df["latter date"]).any()
+
+
+def test_delta_open_interest_matches_merge():
+    output_df = delta_open_interest(options_df, lags=[1], how="outer")
+    expected_df = merge_dates(options_df, lag=1, how="outer", latter_cols=["open interest"], fill_value=0)
+    expected_df["open interest"] = expected_df["open interest"].fillna(0)
+    expected_df["delta interest"] = expected_df["latter open interest"] - expected_df["open interest"]
+    expected_df["oi sign"] = np.sign(expected_df["delta interest"])
+
+    pd.testing.assert_frame_equal(sort_rows(output_df, list(output_df.columns)),
+                                  sort_rows(expected_df, list(output_df.columns)), check_dtype=False)
+
+    # Missing on next data date: all open interest is closed
+    missing_df = output_df[output_df["_merge"] == "left_only"]
+    assert (missing_df["latter open interest"] == 0).all()
+    assert (missing_df["delta interest"] == -missing_df["open interest"]).all()
+
+    # Unchanged open interest has no sign
+    assert (output_df.loc[output_df["delta interest"] == 0, "oi sign"] == 0).all()
+    assert (output_df["delta interest"] == 0).any()
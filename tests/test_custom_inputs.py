@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from custom_features import CalcCustomInputs, delta_open_interest
+from custom_features.custom_inputs import weighted_least_squares
+from sklearn import linear_model
+
+# Baseline fit of every model: [name, signed target, sample weights]
+models = [["baseline", False, lambda df: None],
+          ["sign", True, lambda df: None],
+          ["doi", True, lambda df: np.abs(df["delta interest"])],
+          ["volume", True, lambda df: df["volume"]],
+          ["price", True, lambda df: df["ask price"]],
+          ["doi*price", True, lambda df: np.abs(df["delta interest"] * df["ask price"])],
+          ["volume*price", True, lambda df: df["volume"] * df["ask price"]]]
+
+
+def sklearn_params(df, t_0, t_1):
+    """Per date pair & tag `LinearRegression` fits, as before closed-form `weighted_least_squares`"""
+
+    df_0 = df[(df["date"] == t_0) & (df["expiration date"] >= t_1)]
+    df_1 = df[df["date"] == t_1][["expiration date", "tag", "strike price", "open interest"]]
+    df = df_0.merge(df_1, on=["expiration date", "tag", "strike price"], suffixes=("", " 1"))
+    df["delta interest"] = df["open interest 1"] - df["open interest"]
+
+    output_list = []
+
+    for tag in ["call", "put"]:
+        df_model = df[(df["tag"] == tag) & ((df["delta interest"] != 0) | (df["volume"] != 0))]
+        params = []
+
+        for [_, signed, weights] in models:
+            # No activity, or signed target without change in open interest
+            if df_model.empty or (signed and all(df_model["delta interest"] == 0)):
+                params.extend([np.nan, np.nan])
+                continue
+
+            target = df_model["adj moneyness ratio"]
+            if signed:
+                target = target * np.sign(df_model["delta interest"])
+
+            model = linear_model.LinearRegression().fit(X=df_model[["years to exp"]], y=target,
+                                                        sample_weight=weights(df_model))
+            params.extend([float(model.coef_[0]), float(model.intercept_)])
+
+        output_list.append(params)
+
+    return np.array(output_list)
+
+
+def test_weighted_least_squares_matches_sklearn():
+    x = np.array([0.1, 0.2, 0.4, 0.8, 0.05, 0.3, 0.3, 0.6, 1.2])
+    y = np.array([0.02, -0.01, 0.05, 0.11, -0.2, 0.1, 0.15, 0.4, 0.3])
+    weights = np.array([1.0, 3.0, 0.5, 2.0, 4.0, 1.0, 0.0, 2.5, 1.5])
+    group_index = np.array([0, 0, 0, 0, 1, 1, 1, 1, 1])
+
+    [slope, intercept] = weighted_least_squares(x=x, y=y, weights=weights, group_index=group_index, num_groups=2)
+
+    for n in range(2):
+        group_filter = group_index == n
+        model = linear_model.LinearRegression().fit(X=x[group_filter, None], y=y[group_filter],
+                                                    sample_weight=weights[group_filter])
+
+        np.testing.assert_allclose([slope[n], intercept[n]], [model.coef_[0], model.intercept_], rtol=1e-10)
+
+
+def test_weighted_least_squares_edge_cases():
+    # Group 0: weights sum to 0, group 1: constant feature, group 2: no samples
+    x = np.array([0.1, 0.2, 0.5, 0.5, 0.5])
+    y = np.array([1.0, 2.0, 1.0, 2.0, 4.0])
+    weights = np.array([0.0, 0.0, 1.0, 1.0, 2.0])
+    group_index = np.array([0, 0, 1, 1, 1])
+
+    [slope, intercept] = weighted_least_squares(x=x, y=y, weights=weights, group_index=group_index, num_groups=3)
+
+    np.testing.assert_array_equal(slope, [np.nan, 0, np.nan])
+    np.testing.assert_allclose(intercept, [np.nan, 2.75, np.nan])
+
+
+def test_run_matches_sklearn_fits():
+    dates = pd.to_datetime(["2020-01-02", "2020-01-03", "2020-01-06"])
+    [exp_0, exp_1] = pd.to_datetime(["2020-01-03", "2020-02-21"])
+
+    # [date, expiration date, tag, strike price, ask price, open interest, volume] per option
+    df = pd.DataFrame([
+        # 1st pair: calls are active, puts have volume only (all-zero change in open interest)
+        [dates[0], exp_0, "call", 95.0, 5.2, 10, 0],
+        [dates[0], exp_1, "call", 95.0, 7.1, 40, 5],
+        [dates[0], exp_1, "call", 100.0, 3.3, 25, 0],
+        [dates[0], exp_1, "call", 105.0, 1.4, 12, 7],
+        [dates[0], pd.Timestamp("2020-03-20"), "call", 100.0, 4.6, 30, 2],
+        # Missing on next data date
+        [dates[0], pd.Timestamp("2020-03-20"), "call", 110.0, 0.9, 8, 1],
+        [dates[0], exp_1, "put", 95.0, 1.2, 20, 3],
+        [dates[0], exp_1, "put", 100.0, 2.9, 15, 0],
+        [dates[0], pd.Timestamp("2020-03-20"), "put", 100.0, 3.8, 6, 4],
+        # 2nd pair: no activity at all (no volume, open interest unchanged on 3rd date)
+        [dates[1], exp_0, "call", 95.0, 5.0, 10, 0],
+        [dates[1], exp_1, "call", 95.0, 7.3, 45, 0],
+        [dates[1], exp_1, "call", 100.0, 3.1, 20, 0],
+        [dates[1], exp_1, "call", 105.0, 1.6, 12, 0],
+        [dates[1], pd.Timestamp("2020-03-20"), "call", 100.0, 4.4, 33, 0],
+        [dates[1], exp_1, "put", 95.0, 1.1, 20, 0],
+        [dates[1], exp_1, "put", 100.0, 3.0, 15, 0],
+        [dates[1], pd.Timestamp("2020-03-20"), "put", 100.0, 3.9, 6, 0],
+        [dates[2], exp_1, "call", 95.0, 7.0, 45, 0],
+        [dates[2], exp_1, "call", 100.0, 3.0, 20, 0],
+        [dates[2], exp_1, "call", 105.0, 1.5, 12, 0],
+        [dates[2], pd.Timestamp("2020-03-20"), "call", 100.0, 4.5, 33, 0],
+        [dates[2], exp_1, "put", 95.0, 1.0, 20, 0],
+        [dates[2], exp_1, "put", 100.0, 3.1, 15, 0],
+        [dates[2], pd.Timestamp("2020-03-20"), "put", 100.0, 4.0, 6, 0],
+    ], columns=["date", "expiration date", "tag", "strike price", "ask price", "open interest", "volume"])
+
+    df["years to exp"] = (df["expiration date"] - df["date"]).dt.days / 365
+    df["adj moneyness ratio"] = np.where(df["tag"] == "call", 1, -1) * (100 - df["strike price"]) / 100
+
+    calc = CalcCustomInputs()
+    delta_df = delta_open_interest(df[calc.cols_input], lags=[1], how="outer")
+    output_list = [calc.run(pair_dict) for pair_dict in calc.date_pairs(delta_df)]
+
+    assert len(output_list) == 2
+
+    for n, output_dict in enumerate(output_list):
+        expected = sklearn_params(df, dates[n], dates[n + 1])
+
+        assert output_dict["df"]["tag"].tolist() == ["call", "put"]
+        np.testing.assert_allclose(output_dict["df"][calc.param_names].values.astype(float), expected,
+                                   rtol=0, atol=2e-6)
+
+    # Puts of 1st pair only have the baseline model, 2nd pair has no models
+    assert ~np.isnan(output_list[0]["df"].loc[1, ["baseline_slope", "baseline_intercept"]].astype(float)).any()
+    assert np.isnan(output_list[0]["df"].loc[1, calc.param_names[2:]].astype(float)).all()
+    assert np.isnan(output_list[1]["df"][calc.param_names].astype(float)).all(axis=None)
+
+    assert any("No options with 'delta interest' != 0" in msg for msg in output_list[0]["output_msg"])
+    assert any("No options with 'delta interest' or 'volume' != 0" in msg for msg in output_list[1]["output_msg"])
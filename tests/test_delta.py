@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from greeks.delta import threshold_moneyness_ratios
+
+
+def spread_moneyness_ratios(df, threshold):
+    """Per spread candidate search, as before `threshold_moneyness_ratios` (NaN if threshold is not bracketed)"""
+
+    df = df.sort_values(by="moneyness ratio", ignore_index=True)
+    [min_moneyness, max_moneyness] = [df["moneyness ratio"].min(), df["moneyness ratio"].max()]
+
+    def next_candidate(cand_type, low, high):
+        cand = df[(df["moneyness ratio"] > low) & (df["moneyness ratio"] < high)]
+
+        if cand_type == "pre":
+            cand = cand[cand["Delta"] <= threshold]
+            return None if cand.empty else cand.iloc[-1]
+
+        cand = cand[cand["Delta"] > threshold]
+        return None if cand.empty else cand.iloc[0]
+
+    def is_valid(cand):
+        n_0 = df[df["moneyness ratio"] < cand["moneyness ratio"]].iloc[-1]
+        n_1 = df[df["moneyness ratio"] > cand["moneyness ratio"]].iloc[0]
+        return (cand["Delta"] >= n_0["Delta"]) & (n_1["Delta"] >= cand["Delta"])
+
+    cand_0 = next_candidate("pre", min_moneyness, max_moneyness)
+    while (cand_0 is not None) and not is_valid(cand_0):
+        cand_0 = next_candidate("pre", min_moneyness, cand_0["moneyness ratio"])
+
+    cand_1 = next_candidate("post", min_moneyness, max_moneyness)
+    while (cand_1 is not None) and not is_valid(cand_1):
+        cand_1 = next_candidate("post", cand_1["moneyness ratio"], max_moneyness)
+
+    if (cand_0 is None) or (cand_1 is None):
+        return np.nan
+
+    [delta_0, moneyness_0] = [cand_0["Delta"], cand_0["moneyness ratio"]]
+    [delta_1, moneyness_1] = [cand_1["Delta"], cand_1["moneyness ratio"]]
+
+    return round((moneyness_1 * (threshold - delta_0) + moneyness_0 * (delta_1 - threshold)) / (delta_1 - delta_0), 8)
+
+
+# Delta curves (flipped for puts), one after another, not sorted by moneyness ratio within spread
+chains = [
+    # Smooth curve
+    [[-0.2, 0.1], [-0.1, 0.3], [0.0, 0.5], [0.1, 0.7], [0.2, 0.9], [0.3, 0.95]],
+    # Unsorted, with a bump that is not monotonically increasing around 0.4
+    [[0.15, 0.8], [-0.15, 0.2], [0.05, 0.35], [-0.05, 0.45], [0.25, 0.9], [-0.25, 0.05], [0.1, 0.6]],
+    # Too narrow: only one option that is not on the edges
+    [[-0.1, 0.2], [0.0, 0.5], [0.1, 0.8]],
+    # All Delta above thresholds (no pre candidate)
+    [[-0.3, 0.85], [-0.2, 0.9], [-0.1, 0.92], [0.0, 0.95], [0.1, 0.97]],
+]
+thresholds = [0.25, 0.4, 0.5, 0.75]
+
+
+def test_threshold_moneyness_ratios_match_spread_search():
+    moneyness_ratio = np.array([n[0] for chain in chains for n in chain])
+    delta = np.array([n[1] for chain in chains for n in chain])
+    chain_start = np.cumsum([0] + [len(chain) for chain in chains[:-1]])
+
+    [threshold_moneyness, found] = threshold_moneyness_ratios(moneyness_ratio=moneyness_ratio, delta=delta,
+                                                              chain_start=chain_start, thresholds=thresholds)
+
+    expected = np.array([[spread_moneyness_ratios(pd.DataFrame(chain, columns=["moneyness ratio", "Delta"]), i)
+                          for i in thresholds] for chain in chains])
+
+    np.testing.assert_allclose(threshold_moneyness, expected, rtol=0, atol=1e-12, equal_nan=True)
+    np.testing.assert_array_equal(found, ~np.isnan(expected))
+
+    # Documented edge cases are actually exercised
+    assert np.isnan(expected[2]).all() & np.isnan(expected[3]).all()
+    assert ~np.isnan(expected[1]).any()
+
+
+def test_threshold_moneyness_ratios_no_options():
+    [threshold_moneyness, found] = threshold_moneyness_ratios(moneyness_ratio=np.array([]), delta=np.array([]),
+                                                              chain_start=np.array([], dtype=np.int64),
+                                                              thresholds=thresholds)
+
+    assert threshold_moneyness.shape == (0, len(thresholds))
+    assert found.shape == (0, len(thresholds))
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from greeks import CalcGamma
+from greeks.gamma import peak_parameters
+
+
+def spread_gamma(full_delta_df, cols_output_full):
+    """Per spread shift of Delta, as before `calc_full_gamma`"""
+
+    gamma_list = []
+
+    for _, df in full_delta_df.groupby(["date", "expiration date", "tag"]):
+        df = df.copy()
+        df["Gamma"] = ((df["Delta"] - df["Delta"].shift(periods=1)) /
+                       -(df["strike midpoint"] - df["strike midpoint"].shift(periods=1))).round(6)
+
+        for metric in ["strike midpoint", "moneyness", "moneyness ratio", "adj moneyness"]:
+            df[metric] = ((df[metric] + df[metric].shift(periods=1)) / 2).round(6)
+
+        gamma_list.append(df.dropna()[cols_output_full])
+
+    return pd.concat(gamma_list).sort_values(by=["date", "expiration date", "strike midpoint", "tag"],
+                                             ignore_index=True)
+
+
+def chain_peak(moneyness_ratio, gamma):
+    """Gamma peak of one chain, point by point"""
+
+    finite_filter = np.isfinite(gamma)
+    [moneyness_ratio, gamma] = [moneyness_ratio[finite_filter], gamma[finite_filter]]
+
+    if (gamma.shape[0] == 0) or (gamma.max() <= 0):
+        return [np.nan, np.nan, np.nan]
+
+    peak = int(np.argmax(gamma))
+    half = gamma[peak] / 2
+    [point, height, width] = [round(moneyness_ratio[peak], 8), round(gamma[peak], 6), np.nan]
+
+    before = [n for n in range(peak) if gamma[n] <= half]
+    after = [n for n in range(peak + 1, gamma.shape[0]) if gamma[n] <= half]
+
+    if before and after:
+        [b, a] = [before[-1], after[0]]
+        cross_before = np.interp(half, [gamma[b], gamma[b + 1]], [moneyness_ratio[b], moneyness_ratio[b + 1]])
+        cross_after = np.interp(half, [gamma[a], gamma[a - 1]], [moneyness_ratio[a], moneyness_ratio[a - 1]])
+        width = round(abs(cross_after - cross_before), 8)
+
+    return [point, height, width]
+
+
+def test_peak_parameters_match_chain_loop():
+    chains = [
+        # Single peak
+        [[-0.2, 0.01], [-0.1, 0.04], [0.0, 0.1], [0.1, 0.05], [0.2, 0.02]],
+        # Tied max (first is the peak), not finite values are skipped
+        [[-0.3, 0.0], [-0.2, 0.08], [-0.1, np.inf], [0.0, 0.08], [0.1, np.nan], [0.2, 0.03]],
+        # Peak on the edge, half maximum is not bracketed
+        [[-0.1, 0.09], [0.0, 0.06], [0.1, 0.02]],
+        # No positive Gamma
+        [[-0.1, 0.0], [0.0, -0.01]],
+        # No rows
+        [],
+        # Half maximum is hit exactly
+        [[-0.2, 0.05], [-0.1, 0.07], [0.0, 0.1], [0.1, 0.05]],
+    ]
+
+    moneyness_ratio = np.array([n[0] for chain in chains for n in chain])
+    gamma = np.array([n[1] for chain in chains for n in chain])
+    chain_index = np.repeat(np.arange(len(chains)), [len(chain) for chain in chains])
+
+    [peak_values, found] = peak_parameters(moneyness_ratio=moneyness_ratio, gamma=gamma, chain_index=chain_index,
+                                           num_chains=len(chains))
+
+    expected = np.array([chain_peak(np.array([n[0] for n in chain]), np.array([n[1] for n in chain], dtype=float))
+                         for chain in chains])
+
+    np.testing.assert_allclose(peak_values, expected, rtol=0, atol=1e-12, equal_nan=True)
+    np.testing.assert_array_equal(found, ~np.isnan(expected[:, 2]))
+    np.testing.assert_array_equal(found, [True, True, False, False, False, True])
+
+
+def test_full_gamma_matches_spread_shift():
+    # [date, expiration date, tag, strike midpoint, Delta] per Delta row, sorted as Delta full df
+    full_delta_df = pd.DataFrame([
+        ["2020-01-02", "2020-01-17", "call", 97.5, 0.8],
+        ["2020-01-02", "2020-01-17", "put", 97.5, -0.25],
+        ["2020-01-02", "2020-01-17", "call", 102.5, 0.45],
+        ["2020-01-02", "2020-01-17", "put", 102.5, -0.55],
+        ["2020-01-02", "2020-01-17", "call", 107.5, 0.15],
+        ["2020-01-02", "2020-01-17", "put", 107.5, -0.85],
+        ["2020-01-02", "2020-02-21", "call", 95.0, 0.7],
+        ["2020-01-02", "2020-02-21", "call", 105.0, 0.35],
+        # Only one Delta row: no Gamma
+        ["2020-01-02", "2020-02-21", "put", 105.0, -0.6],
+        ["2020-01-03", "2020-01-17", "call", 97.5, 0.82],
+        # Incomplete row, next row has no previous strike either
+        ["2020-01-03", "2020-01-17", "call", 102.5, np.nan],
+        ["2020-01-03", "2020-01-17", "call", 107.5, 0.12],
+        ["2020-01-03", "2020-01-17", "call", 112.5, 0.03],
+    ], columns=["date", "expiration date", "tag", "strike midpoint", "Delta"])
+
+    full_delta_df["date"] = pd.to_datetime(full_delta_df["date"])
+    full_delta_df["expiration date"] = pd.to_datetime(full_delta_df["expiration date"])
+    full_delta_df["years to exp"] = (full_delta_df["expiration date"] - full_delta_df["date"]).dt.days / 365
+    full_delta_df["moneyness"] = 100 - full_delta_df["strike midpoint"]
+    full_delta_df["moneyness ratio"] = full_delta_df["moneyness"] / 100
+    full_delta_df["adj moneyness"] = full_delta_df["moneyness"] - 0.5
+
+    calc = CalcGamma(input_dict={"parameters": []})
+    output_dict = calc.run({"full df": full_delta_df, "year": 2020})
+
+    pd.testing.assert_frame_equal(output_dict["full df"], spread_gamma(full_delta_df, calc.cols_output_full),
+                                  check_dtype=False)
+    assert "param df" not in output_dict
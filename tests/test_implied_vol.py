@@ -0,0 +1,104 @@
+import numpy as np
+from greeks import black_scholes, implied_volatility
+from greeks.implied_vol import smile_parameters
+from scipy.optimize import brentq
+
+# [spot, strike, years to exp, interest rate, call] per contract, in / at / out of the money
+contracts = np.array([
+    [100.0, 80.0, 0.05, 0.01, True],
+    [100.0, 100.0, 0.05, 0.01, True],
+    [100.0, 120.0, 0.5, 0.02, True],
+    [100.0, 150.0, 2.0, 0.0, True],
+    [100.0, 80.0, 0.5, 0.02, False],
+    [100.0, 100.0, 1.0, 0.03, False],
+    [100.0, 130.0, 0.25, 0.01, False],
+    [50.0, 45.0, 0.1, 0.05, False],
+])
+[spot, strike, years, rate] = [contracts[:, n] for n in range(4)]
+is_call = contracts[:, 4].astype(bool)
+vols = np.array([0.6, 0.2, 0.35, 0.8, 0.25, 0.15, 0.5, 1.5])
+
+
+def test_implied_volatility_matches_brentq():
+    price = black_scholes(spot=spot, strike=strike, years=years, rate=rate, vol=vols, is_call=is_call)["price"]
+
+    [iv, converged] = implied_volatility(price=price, spot=spot, strike=strike, years=years, rate=rate,
+                                         is_call=is_call)
+
+    expected = [brentq(lambda x: black_scholes(spot=spot[[n]], strike=strike[[n]], years=years[[n]],
+                                               rate=rate[[n]], vol=np.array([x]), is_call=is_call[[n]])["price"][0] -
+                       price[n], 1e-4, 10.0, xtol=1e-12) for n in range(price.shape[0])]
+
+    assert converged.all()
+    np.testing.assert_allclose(iv, expected, rtol=0, atol=1e-5)
+    np.testing.assert_allclose(iv, vols, rtol=0, atol=1e-5)
+
+
+def test_implied_volatility_outside_no_arbitrage_bounds():
+    # Call below intrinsic value, put above discounted strike, at intrinsic value, expired, no price
+    price = np.array([5.0, 101.0, 20.0, 2.0, np.nan])
+    [iv, converged] = implied_volatility(price=price, spot=np.array([100.0, 100.0, 120.0, 100.0, 100.0]),
+                                         strike=np.array([90.0, 100.0, 100.0, 100.0, 100.0]),
+                                         years=np.array([0.5, 0.5, 1e-3, 0.0, 0.5]),
+                                         rate=np.full(5, 0.01),
+                                         is_call=np.array([True, False, True, True, True]))
+
+    assert np.isnan(iv).all()
+    assert not converged.any()
+
+
+def test_black_scholes_greeks_match_finite_differences():
+    greeks = ["Delta", "Gamma", "Vega", "Theta"]
+    bs_dict = black_scholes(spot=spot, strike=strike, years=years, rate=rate, vol=vols, is_call=is_call,
+                            greeks=greeks)
+
+    def price(**kwargs):
+        inputs = {"spot": spot, "strike": strike, "years": years, "rate": rate, "vol": vols, "is_call": is_call}
+        inputs.update(kwargs)
+        return black_scholes(**inputs)["price"]
+
+    # Central differences, wider spot step for the 2nd difference (rounding)
+    [h, h_spot] = [1e-4, 1e-2]
+    finite_dict = {"Delta": (price(spot=spot + h) - price(spot=spot - h)) / (2 * h),
+                   "Gamma": (price(spot=spot + h_spot) - 2 * price() + price(spot=spot - h_spot)) / h_spot ** 2,
+                   "Vega": (price(vol=vols + h) - price(vol=vols - h)) / (2 * h),
+                   "Theta": -(price(years=years + h) - price(years=years - h)) / (2 * h)}
+
+    for greek in greeks:
+        np.testing.assert_allclose(bs_dict[greek], finite_dict[greek], rtol=1e-4, atol=1e-6, err_msg=greek)
+
+    # Put-call parity
+    put_price = price(is_call=np.zeros(spot.shape[0], dtype=bool))
+    call_price = price(is_call=np.ones(spot.shape[0], dtype=bool))
+    np.testing.assert_allclose(call_price - put_price, spot - strike * np.exp(-rate * years), rtol=0, atol=1e-10)
+
+
+def test_smile_parameters_match_polyfit():
+    chains = [
+        # [log moneyness, iv, weight] per option
+        [[-0.2, 0.32, 1.0], [-0.1, 0.27, 2.0], [0.0, 0.25, 3.0], [0.1, 0.26, 2.5], [0.2, 0.3, 0.5]],
+        # Options without weight are ignored
+        [[-0.15, 0.5, 0.0], [-0.05, 0.41, 1.0], [0.05, 0.39, 1.5], [0.1, 0.4, 0.7], [0.3, 0.9, 0.0]],
+        # Only 2 strikes with weight (one strike twice)
+        [[-0.1, 0.3, 1.0], [-0.1, 0.31, 1.0], [0.1, 0.28, 1.0], [0.2, 0.35, 0.0]],
+        # Too few strikes
+        [[0.0, 0.2, 1.0], [0.1, 0.22, 1.0]],
+    ]
+
+    log_moneyness = np.array([n[0] for chain in chains for n in chain])
+    iv = np.array([n[1] for chain in chains for n in chain])
+    weights = np.array([n[2] for chain in chains for n in chain])
+    chain_start = np.cumsum([0] + [len(chain) for chain in chains[:-1]])
+
+    [smile_values, found] = smile_parameters(log_moneyness=log_moneyness, iv=iv, weights=weights,
+                                             chain_start=chain_start)
+
+    np.testing.assert_array_equal(found, [True, True, False, False])
+    assert np.isnan(smile_values[~found]).all()
+
+    for n in np.flatnonzero(found):
+        chain = np.array(chains[n])
+        # Weights of polyfit multiply unsquared residuals
+        [curvature, skew, atm] = np.polyfit(chain[:, 0], chain[:, 1], deg=2, w=np.sqrt(chain[:, 2]))
+
+        np.testing.assert_allclose(smile_values[n], [atm, skew, curvature], rtol=0, atol=1e-6)
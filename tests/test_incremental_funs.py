@@ -0,0 +1,115 @@
+import logging
+import os
+import pandas as pd
+import pytest
+from market_data import PriceCalendar
+from preprocess_functions import (enrich_options, load_manifest, plan_update, save_by_year, save_manifest,
+                                  scan_day_files, set_option_dtypes, update_by_year)
+from storage import TableStore
+
+logger = logging.getLogger("test_incremental_funs")
+
+# Raw day files & the options in them, [date, expiration date, strike price] per option
+day_options = {os.path.join("2020", "01", "a.csv"): ["2020-01-02", [["2020-01-10", 100], ["2020-02-21", 100]]],
+               os.path.join("2020", "01", "b.csv"): ["2020-01-03", [["2020-01-10", 105], ["2020-02-21", 105]]],
+               # All options of this date are completed by the second close
+               os.path.join("2020", "01", "c.csv"): ["2020-01-06", [["2020-01-10", 110]]]}
+
+
+def closing_prices(last_close):
+    """Business days up to last close, no splits"""
+    dates = pd.bdate_range("2019-12-30", last_close)
+    return pd.DataFrame({"date": dates, "close": 100.0, "adjustment factor": 1.0})
+
+
+def run_p3(option_data_path, save_dir, last_close, written):
+    """Steps 3 & 4 of P3 for one ticker (no split sections), tables written are appended to `written`"""
+
+    hist_closing_df = closing_prices(last_close)
+    dividends_df = pd.DataFrame({"date": pd.date_range("2019-12-30", "2020-03-31"), "dividend": 0.1})
+    price_calendar = PriceCalendar(hist_closing_df=hist_closing_df, dividends_df=dividends_df)
+
+    store = TableStore(root=save_dir)
+    store_write = store.write
+    store.write = lambda df, name: [written.append(name), store_write(df, name)]
+
+    manifest_dict = load_manifest(save_dir)
+    [manifest_df, sections_df] = [manifest_dict["manifest df"], manifest_dict["sections df"]]
+    day_files_df = scan_day_files(option_data_path)
+
+    plan_dict = plan_update(manifest_df=manifest_df, sections_df=sections_df, day_files_df=day_files_df,
+                            hist_closing_df=hist_closing_df, logger=logger)
+
+    files_dict = {file: pd.Timestamp(day_options[file][0]) for file in plan_dict["day files"]}
+    replace_dates = set(files_dict.values())
+
+    options_df = pd.DataFrame([[date, exp_date, tag, strike, 1.0, 1, 0.9, 1, 1.0, 1, 10]
+                               for file in sorted(files_dict.keys())
+                               for date in [day_options[file][0]]
+                               for [exp_date, strike] in day_options[file][1]
+                               for tag in ["call", "put"]],
+                              columns=["date", "expiration date", "tag", "strike price", "ask price", "ask size",
+                                       "bid price", "bid size", "last price", "volume", "open interest"])
+    options_df[["date", "expiration date"]] = options_df[["date", "expiration date"]].apply(pd.to_datetime)
+    options_df = set_option_dtypes(options_df)
+
+    enrich_dict = enrich_options(options_df=options_df, price_calendar=price_calendar, logger=logger)
+
+    if plan_dict["full update"]:
+        save_by_year(complete_df=enrich_dict["complete df"], incomplete_df=enrich_dict["incomplete df"],
+                     errors_df=enrich_dict["errors df"], ticker="AAA", store=store, logger=logger)
+        update_dict = {"incomplete df": enrich_dict["incomplete df"], "years": None}
+    else:
+        update_dict = update_by_year(complete_df=enrich_dict["complete df"],
+                                     incomplete_df=enrich_dict["incomplete df"],
+                                     errors_df=enrich_dict["errors df"], replace_dates=replace_dates,
+                                     manifest_df=manifest_df, price_calendar=price_calendar,
+                                     hist_closing_df=hist_closing_df, ticker="AAA", store=store, logger=logger)
+
+    save_manifest(manifest_df=manifest_df, sections_df=sections_df, day_files_df=day_files_df,
+                  files_dict=files_dict, sections_dict=dict(), incomplete_df=update_dict["incomplete df"],
+                  hist_closing_df=hist_closing_df, save_dir=save_dir, years=update_dict["years"])
+
+    return store
+
+
+@pytest.fixture
+def option_data_path(tmp_path):
+    for file in day_options.keys():
+        os.makedirs(os.path.dirname(tmp_path / "raw" / file), exist_ok=True)
+        (tmp_path / "raw" / file).write_text(file)
+
+    return str(tmp_path / "raw")
+
+
+def test_same_day_files_write_nothing(option_data_path, tmp_path):
+    save_dir = str(tmp_path / "adj_options")
+
+    written = []
+    run_p3(option_data_path, save_dir, last_close="2020-01-07", written=written)
+    assert written == [os.path.join("2020", "AAA_2020_incomplete")]
+
+    written = []
+    run_p3(option_data_path, save_dir, last_close="2020-01-07", written=written)
+    assert written == []
+
+
+def test_completed_dates_are_not_resolved_again(option_data_path, tmp_path):
+    save_dir = str(tmp_path / "adj_options")
+
+    run_p3(option_data_path, save_dir, last_close="2020-01-07", written=[])
+
+    # Options expiring 2020-01-10 are completed, 2020-01-06 has no incomplete options left
+    written = []
+    store = run_p3(option_data_path, save_dir, last_close="2020-01-13", written=written)
+    assert sorted(written) == [os.path.join("2020", f"AAA_2020_{n}") for n in ["complete", "incomplete"]]
+    assert store.read(os.path.join("2020", "AAA_2020_complete")).shape[0] == 6
+
+    manifest_df = load_manifest(save_dir)["manifest df"].set_index("date")
+    assert manifest_df.loc["2020-01-02", "next exp date"] == pd.Timestamp("2020-02-21")
+    assert pd.isna(manifest_df.loc["2020-01-06", "next exp date"])
+
+    # Same day files & closing prices
+    written = []
+    run_p3(option_data_path, save_dir, last_close="2020-01-13", written=written)
+    assert written == []
@@ -0,0 +1,203 @@
+import logging
+import numpy as np
+import os
+import pandas as pd
+import pytest
+from preprocess_functions import ingest_options, option_dtypes, read_and_format, set_option_dtypes
+
+logger = logging.getLogger("test_preprocess_funs")
+
+raw_columns = ["symbol", "underlyingprice", "exchange", "optionkey", "putcall", "expirationdate", "datadate",
+               "strikeprice", "lastprice", "bidprice", "bidsize", "askprice", "asksize", "volume", "openinterest"]
+
+# Raw (full market) day files
+day_files = {
+    os.path.join("2020", "01", "options_20200102.csv"): [
+        ["BBB", 50.2, "*", "BBB200117C00050.00", "call", "01/17/2020", "01/02/2020", 50.0, 1.1, 1.05, 3, 1.15, 4,
+         12, 340],
+        ["AAA", 101.5, "*", "AAA200221P00100.00", "put", "02/21/2020", "01/02/2020", 100.0, 3.9, 3.85, 10, 3.95,
+         12, 5, 800],
+        ["AAA", 101.5, "*", "AAA200117C00100.00", "call", "01/17/2020", "01/02/2020", 100.0, 2.7, 2.65, 7, 2.75, 9,
+         -30, 1500],
+        # Lowercase symbol & tag
+        ["aaa", 101.5, "*", "AAA200117C00105.00", "CALL", "01/17/2020", "01/02/2020", 105.0, 0.8, 0.75, 2, 0.85, 5,
+         0, 20],
+        # True duplicate
+        ["AAA", 101.5, "*", "AAA200117C00105.00", "call", "01/17/2020", "01/02/2020", 105.0, 0.8, 0.75, 2, 0.85, 5,
+         0, 20],
+        # Error duplicates, the one with less moneyness is kept
+        ["AAA", 101.5, "*", "AAA200221C00110.00", "call", "02/21/2020", "01/02/2020", 110.0, 1.3, 1.25, 1, 1.35, 1,
+         2, 75],
+        ["AAA", 101.5, "*", "AAA200221C00110.00", "call", "02/21/2020", "01/02/2020", 110.0, 9.3, 9.25, 1, 9.35, 1,
+         2, 70],
+        # Expired before data date
+        ["AAA", 101.5, "*", "AAA191227C00100.00", "call", "12/27/2019", "01/02/2020", 100.0, 1.5, 1.45, 1, 1.55, 1,
+         0, 10],
+    ],
+    # No AAA options
+    os.path.join("2020", "01", "options_20200103.csv"): [
+        ["BBB", 50.6, "*", "BBB200117C00050.00", "call", "01/17/2020", "01/03/2020", 50.0, 1.3, 1.25, 6, 1.35, 2,
+         40, 352],
+    ],
+    os.path.join("2020", "01", "options_20200106.csv"): [
+        ["AAA", 99.8, "*", "AAA200117C00100.00", "call", "01/17/2020", "01/06/2020", 100.0, 1.9, 1.85, 4, 1.95, 8,
+         51, 1480],
+        ["AAA", 99.8, "*", "AAA200117P00100.00", "put", "01/17/2020", "01/06/2020", 100.0, 2.1, 2.05, 3, 2.15, 6,
+         17, 260],
+        ["BBB", 50.1, "*", "BBB200117C00050.00", "call", "01/17/2020", "01/06/2020", 50.0, 1.0, 0.95, 6, 1.05, 2,
+         9, 380],
+    ],
+}
+
+
+def baseline_options(option_data_path, ticker):
+    """Options of ticker formatted with default (64 bit / object) column types, as before the compact schema"""
+
+    options_list = []
+
+    for day_file in sorted(day_files.keys()):
+        df = pd.read_csv(os.path.join(option_data_path, day_file))
+        df = df[df["symbol"].str.upper() == ticker].copy()
+
+        df["datadate"] = pd.to_datetime(df["datadate"])
+        df["expirationdate"] = pd.to_datetime(df["expirationdate"])
+        df["putcall"] = df["putcall"].str.lower()
+        df["volume"] = np.abs(df["volume"])
+        df = df.drop_duplicates(subset=["optionkey", "openinterest"])
+
+        # Error duplicates: keep less moneyness (all calls here)
+        df["moneyness"] = df["underlyingprice"] - df["askprice"] - df["strikeprice"]
+        df = df[df["moneyness"] == df.groupby("optionkey")["moneyness"].transform("min")]
+        df = df[df["datadate"] <= df["expirationdate"]]
+
+        df = df.rename(columns={"datadate": "date", "expirationdate": "expiration date", "putcall": "tag",
+                                "strikeprice": "strike price", "askprice": "ask price", "asksize": "ask size",
+                                "bidprice": "bid price", "bidsize": "bid size", "lastprice": "last price",
+                                "openinterest": "open interest"})
+
+        options_list.append(df[list(option_dtypes.keys())].sort_values(by=["expiration date", "strike price", "tag"]))
+
+    return pd.concat(options_list, ignore_index=True)
+
+
+@pytest.fixture
+def option_data_path(tmp_path):
+    for day_file, rows in day_files.items():
+        os.makedirs(os.path.dirname(tmp_path / "options_data" / day_file), exist_ok=True)
+        pd.DataFrame(rows, columns=raw_columns).to_csv(tmp_path / "options_data" / day_file, index=False)
+
+    return str(tmp_path / "options_data")
+
+
+def test_store_matches_raw_files(option_data_path, tmp_path):
+    option_store_path = str(tmp_path / "options_store")
+    tickers = ["AAA", "BBB"]
+
+    ingest_options(option_data_path=option_data_path, option_store_path=option_store_path, logger=logger)
+
+    raw_dict = read_and_format(tickers=tickers, option_data_path=option_data_path, logger=logger,
+                               day_files=sorted(day_files.keys()))
+    store_dict = read_and_format(tickers=tickers, option_data_path=option_data_path, logger=logger,
+                                 option_store_path=option_store_path, day_files=sorted(day_files.keys()))
+
+    for ticker in tickers:
+        pd.testing.assert_frame_equal(store_dict["options df"][ticker], raw_dict["options df"][ticker])
+
+    assert store_dict["files dict"] == raw_dict["files dict"]
+
+    # Day without AAA options keeps its data date
+    assert raw_dict["files dict"]["AAA"][os.path.join("2020", "01", "options_20200103.csv")] == \
+        pd.Timestamp("2020-01-03")
+
+    # Duplicates & expired options are removed
+    aaa_df = raw_dict["options df"]["AAA"]
+    assert aaa_df.shape[0] == 6
+    assert aaa_df.loc[aaa_df["strike price"] == 110.0, "ask price"].tolist() == [9.35]
+
+
+def test_ingest_only_new_files(option_data_path, tmp_path):
+    option_store_path = str(tmp_path / "options_store")
+    store_file = os.path.join(option_store_path, "2020", "01", "options_20200102.parquet")
+
+    ingest_options(option_data_path=option_data_path, option_store_path=option_store_path, logger=logger)
+    ingested_time = os.path.getmtime(store_file)
+
+    ingest_options(option_data_path=option_data_path, option_store_path=option_store_path, logger=logger)
+    assert os.path.getmtime(store_file) == ingested_time
+
+    # Modified raw file is ingested again
+    raw_file = os.path.join(option_data_path, "2020", "01", "options_20200102.csv")
+    os.utime(raw_file, (ingested_time + 10, ingested_time + 10))
+
+    ingest_options(option_data_path=option_data_path, option_store_path=option_store_path, logger=logger)
+    assert os.path.getmtime(store_file) > ingested_time
+
+
+def test_compact_schema_keeps_values(option_data_path, tmp_path):
+    option_store_path = str(tmp_path / "options_store")
+    ingest_options(option_data_path=option_data_path, option_store_path=option_store_path, logger=logger)
+
+    store_dict = read_and_format(tickers=["AAA"], option_data_path=option_data_path, logger=logger,
+                                 option_store_path=option_store_path, day_files=sorted(day_files.keys()))
+    options_df = store_dict["options df"]["AAA"]
+
+    assert options_df.dtypes.to_dict() == {col: pd.api.types.pandas_dtype(dtype)
+                                           for col, dtype in option_dtypes.items()}
+
+    # 32 bit prices are exact to float32 precision, other columns are exact
+    expected_df = baseline_options(option_data_path, ticker="AAA")
+    pd.testing.assert_frame_equal(options_df.astype({"tag": object}), expected_df, check_dtype=False, rtol=1e-7)
+    np.testing.assert_array_equal(options_df["bid price"], expected_df["bid price"].astype(np.float32))
+
+
+def test_adjusted_schema_keeps_fractional_sizes():
+    # Sizes & open interest after a 3:2 split
+    options_df = pd.DataFrame({"tag": ["call", "put"], "strike price": [66.666667, 70.0], "ask size": [1.5, 3.0],
+                               "open interest": [22.5, 30.0], "date close": [68.2, 68.2]})
+
+    adjusted_df = set_option_dtypes(options_df, adjusted=True)
+
+    assert adjusted_df["tag"].cat.categories.tolist() == ["call", "put"]
+    assert adjusted_df["open interest"].dtype == np.float32
+    np.testing.assert_array_equal(adjusted_df["open interest"], [22.5, 30.0])
+    np.testing.assert_array_equal(adjusted_df["ask size"], [1.5, 3.0])
+    assert adjusted_df["strike price"].tolist() == options_df["strike price"].tolist()
+
+
+def test_missing_values_of_other_tickers(tmp_path, caplog):
+    option_data_path = str(tmp_path / "options_data")
+    option_store_path = str(tmp_path / "options_store")
+    day_file = os.path.join("2020", "01", "options_20200102.csv")
+
+    os.makedirs(os.path.join(option_data_path, "2020", "01"))
+    pd.DataFrame([
+        ["AAA", 101.5, "*", "AAA200117C00100.00", "call", "01/17/2020", "01/02/2020", 100.0, 2.7, 2.65, 7, 2.75, 9,
+         30, 1500],
+        # Blank volume of another ticker
+        ["ZZZ", 20.1, "*", "ZZZ200117C00020.00", "call", "01/17/2020", "01/02/2020", 20.0, 0.9, 0.85, 1, 0.95, 2,
+         None, 40],
+        # Unknown option type & blank open interest of ticker
+        ["AAA", 101.5, "*", "AAA200117X00105.00", "x", "01/17/2020", "01/02/2020", 105.0, 0.8, 0.75, 2, 0.85, 5,
+         0, 20],
+        ["AAA", 101.5, "*", "AAA200117P00100.00", "put", "01/17/2020", "01/02/2020", 100.0, 1.9, 1.85, 4, 1.95, 8,
+         3, None],
+    ], columns=raw_columns).to_csv(os.path.join(option_data_path, day_file), index=False)
+
+    ingest_options(option_data_path=option_data_path, option_store_path=option_store_path, logger=logger)
+
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        raw_dict = read_and_format(tickers=["AAA", "ZZZ"], option_data_path=option_data_path, logger=logger,
+                                   day_files=[day_file])
+        store_dict = read_and_format(tickers=["AAA", "ZZZ"], option_data_path=option_data_path, logger=logger,
+                                     option_store_path=option_store_path, day_files=[day_file])
+
+    for ticker in ["AAA", "ZZZ"]:
+        pd.testing.assert_frame_equal(store_dict["options df"][ticker], raw_dict["options df"][ticker])
+
+    assert store_dict["options df"]["AAA"]["strike price"].tolist() == [100.0]
+    assert store_dict["options df"]["ZZZ"].empty
+    assert store_dict["options df"]["AAA"].dtypes.to_dict() == {col: pd.api.types.pandas_dtype(dtype)
+                                                                for col, dtype in option_dtypes.items()}
+
+    assert sum("Dropped 2 AAA options with unknown option type ['x']" in msg for msg in caplog.messages) == 2
+    assert sum("Dropped 1 ZZZ options" in msg for msg in caplog.messages) == 2
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from greeks import CalcTheta
+from greeks.theta import atm_values
+
+# [date, expiration date, tag, strike price, ask price, date close] per option
+year_df = pd.DataFrame([
+    ["2020-12-30", "2021-01-15", "call", 95.0, 6.1, 100.0],
+    ["2020-12-30", "2021-01-15", "call", 100.0, 2.6, 100.0],
+    ["2020-12-30", "2021-01-15", "call", 105.0, 0.8, 100.0],
+    ["2020-12-30", "2021-01-15", "put", 95.0, 0.7, 100.0],
+    ["2020-12-30", "2021-01-15", "put", 100.0, 2.4, 100.0],
+    # Missing on next data date
+    ["2020-12-30", "2021-01-15", "put", 105.0, 5.9, 100.0],
+    ["2020-12-31", "2021-01-15", "call", 95.0, 6.5, 101.0],
+    ["2020-12-31", "2021-01-15", "call", 100.0, 2.8, 101.0],
+    ["2020-12-31", "2021-01-15", "call", 105.0, 0.9, 101.0],
+    ["2020-12-31", "2021-01-15", "put", 95.0, 0.6, 101.0],
+    ["2020-12-31", "2021-01-15", "put", 100.0, 2.0, 101.0],
+    # All strikes in the money, at the money cannot be bracketed
+    ["2020-12-31", "2021-02-19", "put", 110.0, 9.5, 101.0],
+    ["2020-12-31", "2021-02-19", "put", 115.0, 14.2, 101.0],
+], columns=["date", "expiration date", "tag", "strike price", "ask price", "date close"])
+
+# First data date of next year
+next_year_df = pd.DataFrame([
+    ["2021-01-04", "2021-01-15", "call", 95.0, 6.0, 100.5],
+    ["2021-01-04", "2021-01-15", "call", 100.0, 2.2, 100.5],
+    ["2021-01-04", "2021-01-15", "call", 105.0, 0.5, 100.5],
+    ["2021-01-04", "2021-01-15", "put", 95.0, 0.5, 100.5],
+    ["2021-01-04", "2021-01-15", "put", 100.0, 1.9, 100.5],
+    ["2021-01-04", "2021-02-19", "put", 110.0, 9.6, 100.5],
+    ["2021-01-04", "2021-02-19", "put", 115.0, 14.1, 100.5],
+    ["2021-01-05", "2021-01-15", "call", 100.0, 2.0, 100.0],
+], columns=year_df.columns)
+
+for df in [year_df, next_year_df]:
+    df["date"] = pd.to_datetime(df["date"])
+    df["expiration date"] = pd.to_datetime(df["expiration date"])
+    df["years to exp"] = (df["expiration date"] - df["date"]).dt.days / 365
+
+
+def merge_theta(options_df):
+    """Theta of every consecutive data date pair, one `pd.merge` at a time"""
+
+    dates = sorted(options_df["date"].unique())
+    theta_list = []
+
+    for [t_0, t_1] in zip(dates[:-1], dates[1:]):
+        df_0 = options_df[(options_df["date"] == t_0) & (options_df["expiration date"] >= t_1)]
+        df_1 = options_df[options_df["date"] == t_1][["expiration date", "tag", "strike price", "ask price"]]
+        df = df_0.merge(df_1, on=["expiration date", "tag", "strike price"], suffixes=("", " 1"))
+
+        df["Theta"] = ((df["ask price 1"] - df["ask price"]) /
+                       np.busday_count(np.datetime64(t_0, "D"), np.datetime64(t_1, "D"))).round(6)
+        df["moneyness ratio"] = ((df["date close"] - df["strike price"]) / df["date close"] *
+                                 np.where(df["tag"] == "put", -1, 1))
+
+        theta_list.append(df)
+
+    return pd.concat(theta_list).sort_values(by=["date", "expiration date", "strike price", "tag"],
+                                             ignore_index=True)
+
+
+def test_full_theta_matches_merge():
+    calc = CalcTheta()
+    output_dict = calc.run({"df": year_df, "year": 2020, "next df": next_year_df})
+
+    expected_df = merge_theta(pd.concat([year_df, next_year_df[next_year_df["date"] == "2021-01-04"]]))
+
+    pd.testing.assert_frame_equal(output_dict["full df"], expected_df[calc.cols_output_full], check_dtype=False)
+
+    # Contract missing on next data date has no Theta
+    assert not ((output_dict["full df"]["date"] == "2020-12-30") & (output_dict["full df"]["tag"] == "put") &
+                (output_dict["full df"]["strike price"] == 105.0)).any()
+
+    assert any("exp date: 2021-02-19, tag: put) - cannot interpolate at the money" in msg
+               for msg in output_dict["output_msg"])
+
+
+def test_last_date_without_next_year():
+    output_dict = CalcTheta().run({"df": year_df, "year": 2020})
+
+    assert (output_dict["full df"]["date"] == "2020-12-30").all()
+
+
+def test_atm_values_match_chain_loop():
+    chains = [
+        [-0.1, -0.05, 0.0, 0.05, 0.1],
+        # Both sides of the money, none at
+        [-0.08, -0.02, 0.03],
+        # All in the money / out of the money
+        [0.02, 0.04],
+        [-0.04, -0.02, 0.0],
+    ]
+    moneyness_ratio = np.array([n for chain in chains for n in chain])
+    values = np.round(np.sin(np.arange(moneyness_ratio.shape[0])), 3)
+    chain_start = np.cumsum([0] + [len(chain) for chain in chains[:-1]])
+
+    [atm, found] = atm_values(moneyness_ratio=moneyness_ratio, values=values, chain_start=chain_start)
+
+    expected = []
+
+    for [start, chain] in zip(chain_start, chains):
+        ratios = np.array(chain)
+        chain_values = values[start:start + len(chain)]
+        [pre, post] = [np.flatnonzero(ratios <= 0), np.flatnonzero(ratios > 0)]
+
+        if (pre.shape[0] == 0) or (post.shape[0] == 0):
+            expected.append(np.nan)
+        else:
+            expected.append(round(float(np.interp(0, ratios[[pre[-1], post[0]]],
+                                                  chain_values[[pre[-1], post[0]]])), 6))
+
+    np.testing.assert_allclose(atm, expected, rtol=0, atol=1e-12, equal_nan=True)
+    np.testing.assert_array_equal(found, [True, True, False, False])